@@ -0,0 +1,133 @@
+# benchmarks/bench_llm.py
+"""
+Load test of the LLM classification path against the local mock server.
+
+    python benchmarks/bench_llm.py --sizes 1000 10000 100000 --concurrency 64
+    python benchmarks/bench_llm.py --sizes 10000 --batch-size 20 --rate-429 0.05 --rpm 6000 --out llm.json
+
+Starts `python -m recon.mockllm` in a separate process (so the server's
+threads don't share the client's GIL), points recon.llm at it with
+LLM_BASE_URL and classifies break rows from a synthetic reconciliation with
+classify_report (no dedupe, no cache, a budget large enough for every break).
+For each size it reports wall time, breaks/s and requests/s, request latency
+percentiles, the final adaptive concurrency, retries and fallbacks by reason,
+and tokens and estimated cost.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+
+def _breaks(n: int, seed: int) -> pd.DataFrame:
+    """n break rows of a synthetic reconciliation (tiled if the feed has fewer)."""
+    from recon.rules import reconcile
+    from recon.synth import BREAK_TYPES, generate
+
+    nbim, cust = generate(max(1_000, n), seed=seed, break_rates={b: 0.1 for b in BREAK_TYPES})
+    report = reconcile(nbim, cust)
+    breaks = report[report["RECON_STATUS"] != "MATCHED"]
+    reps = -(-n // len(breaks))
+    return pd.concat([breaks] * reps, ignore_index=True).iloc[:n]
+
+
+def _start_server(args) -> tuple:
+    cmd = [
+        sys.executable, "-m", "recon.mockllm", "--port", "0", "--latency", args.latency,
+        "--rate-429", str(args.rate_429), "--error-rate", str(args.error_rate),
+        "--malformed-rate", str(args.malformed_rate), "--fenced-rate", str(args.fenced_rate),
+        "--seed", str(args.seed),
+    ]
+    if args.max_concurrent:
+        cmd += ["--max-concurrent", str(args.max_concurrent)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith("Serving mock LLM on "):
+        proc.kill()
+        raise RuntimeError(f"mock server failed to start: {line!r}")
+    return proc, line.rsplit(" ", 1)[1].strip()
+
+
+def run_size(n: int, args) -> dict:
+    from recon.llm import classify_report
+    from recon.ratelimit import RateLimiter
+
+    breaks = _breaks(n, args.seed)
+    stats = {"calls": 0}
+    limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm, concurrency=args.concurrency)
+    start = time.perf_counter()
+    out = classify_report(
+        breaks, max_calls=n, concurrency=args.concurrency, stats=stats, batch_size=args.batch_size,
+        dedupe=False, limiter=limiter, max_retries=args.max_retries,
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies = np.asarray(stats.get("latencies_ms", []), dtype=float)
+    fallbacks = stats.get("fallbacks", {})
+    return {
+        "breaks": n,
+        "seconds": round(elapsed, 3),
+        "breaks_per_s": round(n / elapsed, 1),
+        "requests": stats["calls"],
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            p: round(float(np.percentile(latencies, q)), 1) if latencies.size else None
+            for p, q in (("p50", 50), ("p90", 90), ("p99", 99))
+        },
+        "classified": int(out["break_code"].notna().sum()),
+        "live": n - sum(fallbacks.values()),
+        "fallbacks": fallbacks,
+        "retries": stats.get("retries", {}),
+        "throttled": stats.get("throttled", 0),
+        "final_concurrency": stats.get("concurrency"),
+        "tokens": stats.get("prompt_tokens", 0) + stats.get("completion_tokens", 0),
+        "cost_usd": round(stats.get("cost_usd", 0.0), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--rpm", type=float, default=None)
+    parser.add_argument("--tpm", type=float, default=None)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--latency", default="lognormal:200,0.5", help="Mock latency spec (see recon.mockllm)")
+    parser.add_argument("--rate-429", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--malformed-rate", type=float, default=0.01)
+    parser.add_argument("--fenced-rate", type=float, default=0.2)
+    parser.add_argument("--max-concurrent", type=int, default=None, help="Mock answers 429 beyond this many in flight")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    proc, url = _start_server(args)
+    os.environ["LLM_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    print(f"mock server: {url}  latency={args.latency} 429={args.rate_429} 5xx={args.error_rate} "
+          f"malformed={args.malformed_rate} fenced={args.fenced_rate} max_concurrent={args.max_concurrent}")
+    results = {}
+    try:
+        for n in args.sizes:
+            r = results[str(n)] = run_size(n, args)
+            print(f"{n:>8,} breaks {r['seconds']:>8.2f}s {r['breaks_per_s']:>9,.0f} breaks/s "
+                  f"{r['requests_per_s']:>7,.0f} req/s  p50={r['latency_ms']['p50']}ms p99={r['latency_ms']['p99']}ms  "
+                  f"conc={r['final_concurrency']}  retries={r['retries']}  fallbacks={r['fallbacks']}  "
+                  f"tokens={r['tokens']:,} ${r['cost_usd']:.4f}")
+    finally:
+        proc.terminate()
+        proc.wait()
+    if args.out:
+        args.out.write_text(json.dumps({"args": vars(args) | {"out": str(args.out)}, "results": results}, indent=2))
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
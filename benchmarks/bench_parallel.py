@@ -0,0 +1,37 @@
+# benchmarks/bench_parallel.py
+"""
+Scaling benchmark for reconcile_parallel.
+
+    python benchmarks/bench_parallel.py --rows 5000000 --workers 1 2 4 8
+
+Builds a synthetic NBIM/custodian pair in memory with recon.synth and
+reports wall time and speedup per worker count against the single-process
+reconcile().
+"""
+import argparse
+import time
+from recon.parallel import reconcile_parallel
+from recon.rules import reconcile
+from recon.synth import generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    nbim, cust = generate(args.rows)
+    print(f"rows={args.rows:,}")
+
+    baseline = None
+    for w in args.workers:
+        start = time.perf_counter()
+        report = reconcile(nbim, cust) if w == 1 else reconcile_parallel(nbim, cust, workers=w)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"workers={w:<3} {elapsed:8.2f}s  speedup={baseline / elapsed:5.2f}x  rows_out={len(report):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_pipeline.py
+"""
+Stage-by-stage benchmark of the reconciliation pipeline on synthetic feeds.
+
+    python benchmarks/bench_pipeline.py --sizes 10000 100000 1000000 10000000 --out benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --sizes 100000 --compare benchmarks/baseline.json
+
+Each size runs in a fresh process so peak RSS is per size. For every stage
+(generate, write_csv, load, normalize, merge, classify, classify_row,
+classify_break) it records wall seconds, rows processed, rows/s and the peak
+RSS reached by the end of that stage. The row-wise _classify_row reference
+and the classify_break fallback path are timed on a capped sample
+(--sample-rows) so large sizes stay practical.
+
+With --compare, stages slower than the baseline by more than --tolerance are
+reported and the exit code is 1.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+
+def _run_size(rows: int, sample_rows: int, seed: int) -> dict:
+    from recon.llm import classify_report
+    from recon.loader import read_custody, read_nbim
+    from recon.metrics import peak_rss_mb
+    from recon.rules import _build_report, _classify_row, _merge_feeds, normalize
+    from recon.synth import generate, write_pair
+
+    stages = {}
+
+    def stage(name, n, fn):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        stages[name] = {
+            "seconds": round(elapsed, 4),
+            "rows": int(n),
+            "rows_per_s": round(n / elapsed, 1) if elapsed > 0 else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        return out
+
+    nbim, cust = stage("generate", rows, lambda: generate(rows, seed=seed))
+    with tempfile.TemporaryDirectory() as tmp:
+        nbim_path, cust_path = stage("write_csv", len(nbim) + len(cust), lambda: write_pair(nbim, cust, Path(tmp)))
+        del nbim, cust
+        nbim, cust = stage("load", rows, lambda: (read_nbim(nbim_path), read_custody(cust_path)))
+
+    nbim_norm, cust_norm = stage("normalize", len(nbim) + len(cust), lambda: normalize(nbim, cust))
+    merged = stage("merge", len(nbim) + len(cust), lambda: _merge_feeds(nbim_norm, cust_norm))
+    report = stage("classify", len(merged), lambda: _build_report(merged))
+
+    sample = merged.iloc[:sample_rows]
+    stage("classify_row", len(sample), lambda: sample.apply(_classify_row, axis=1))
+
+    breaks = report[report["RECON_STATUS"] != "MATCHED"].iloc[:sample_rows]
+    stage("classify_break", len(breaks), lambda: classify_report(breaks, max_calls=len(breaks), dedupe=False))
+    return stages
+
+
+def _worker(rows, sample_rows, seed, queue):
+    queue.put(_run_size(rows, sample_rows, seed))
+
+
+def run(sizes, sample_rows: int, seed: int) -> dict:
+    ctx = mp.get_context("spawn")
+    results = {}
+    for rows in sizes:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_worker, args=(rows, sample_rows, seed, queue))
+        proc.start()
+        results[str(rows)] = queue.get()
+        proc.join()
+        for name, st in results[str(rows)].items():
+            print(f"{rows:>10,} {name:<15} {st['seconds']:>9.3f}s {st['rows_per_s'] or 0:>14,.0f} rows/s {st['peak_rss_mb']:>9.1f} MB")
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "sample_rows": sample_rows,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    for size, stages in current["results"].items():
+        base = baseline.get("results", {}).get(size)
+        if not base:
+            continue
+        for name, st in stages.items():
+            if name not in base or not base[name]["seconds"]:
+                continue
+            ratio = st["seconds"] / base[name]["seconds"]
+            flag = "REGRESSION" if ratio > tolerance else ""
+            ok &= not flag
+            print(f"{int(size):>10,} {name:<15} {ratio:>6.2f}x vs baseline {flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--sample-rows", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="Write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Allowed slowdown ratio per stage")
+    args = parser.parse_args()
+
+    current = run(args.sizes, args.sample_rows, args.seed)
+    if args.out:
+        args.out.write_text(json.dumps(current, indent=2))
+        print(f"Wrote {args.out}")
+    if args.compare and not compare(current, json.loads(args.compare.read_text()), args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,216 @@
-import os
+import hashlib
+import io
+import tempfile
+import time
+from pathlib import Path
 import streamlit as st
 import pandas as pd
-from recon.rules import reconcile
-from recon.llm import classify_break
+from recon.rules import DUPLICATE_POLICIES, DuplicateKeyError, reconcile
+from recon.jobs import ClassifyJob
+from recon.loader import read_custody, read_nbim, write_report
+from recon.metrics import Metrics
+from recon.view import ReportView
+
+# Results kept per cached step (LRU); each entry holds one report
+CACHE_ENTRIES = 4
+PAGE_SIZES = [50, 100, 500, 1000]
+# Seconds between refreshes while an LLM job is running
+POLL_SECONDS = 1.0
 
 st.set_page_config(page_title="Dividend Reconciliation", layout="wide")
 st.title("🏦 Dividend Reconciliation – Rules + LLM (Demo)")
 
-st.markdown("Upload **NBIM** and **Custodian** CSV files (semicolon `;` separated).")
+st.markdown("Upload **NBIM** and **Custodian** files: CSV (semicolon `;` separated), Parquet or Arrow IPC.")
+
+
+def upload_digest(upload) -> str:
+    """Content hash of an upload, computed once per uploaded file (reruns reuse it)."""
+    seen = st.session_state.setdefault("digests", {})
+    file_id = getattr(upload, "file_id", None) or (upload.name, upload.size)
+    if file_id not in seen:
+        seen[file_id] = hashlib.blake2b(upload.getvalue(), digest_size=16).hexdigest()
+    return seen[file_id]
+
+
+# Cached steps take the content hash (and settings) as the key; underscore arguments
+# aren't hashed. cache_resource hands back the same objects without copying them,
+# so callers treat the results as read-only.
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner="Reading upload…")
+def load_feed(digest: str, side: str, _upload) -> pd.DataFrame:
+    src = io.BytesIO(_upload.getvalue())
+    src.name = _upload.name  # the loader picks CSV / Parquet / Arrow from the extension
+    return read_nbim(src) if side == "nbim" else read_custody(src)
+
+
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner="Reconciling…")
+def run_rules(nbim_digest: str, cust_digest: str, duplicates: str, match_orphans: bool, _nbim, _cust) -> dict:
+    metrics = Metrics()
+    diagnostics = {}
+    try:
+        report = reconcile(_nbim, _cust, metrics=metrics, duplicates=duplicates, diagnostics=diagnostics,
+                           match_orphans=match_orphans)
+    except DuplicateKeyError as e:
+        # Cached like a result, so reruns don't reconcile again just to fail
+        return {"error": e}
+    return {"report": report, "metrics": metrics, "diagnostics": diagnostics}
+
+
+def llm_job(job_key: tuple, report: pd.DataFrame) -> ClassifyJob:
+    """
+    The session's LLM job for these rules results and settings, started on first use.
+    Jobs outlive reruns and are kept per key, so uploading the same files again
+    reuses a finished job instead of paying for the calls twice.
+    """
+    jobs = st.session_state.setdefault("llm_jobs", {})
+    job = jobs.get(job_key)
+    if job is None:
+        _, max_calls, concurrency = job_key
+        job = jobs[job_key] = ClassifyJob(report, max_calls=max_calls, concurrency=concurrency).start()
+        # Keep the newest CACHE_ENTRIES; an evicted job stops spending
+        for key in list(jobs)[:-CACHE_ENTRIES]:
+            jobs.pop(key).cancel()
+    return job
+
+
+@st.cache_resource(max_entries=CACHE_ENTRIES)
+def report_view(result_key: tuple, _report) -> ReportView:
+    return ReportView(_report)
+
+
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner="Preparing download…")
+def export(result_key: tuple, fmt: str, _report) -> bytes:
+    if fmt == "csv":
+        return _report.to_csv(index=False).encode("utf-8")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Same writer as the CLI, so column types survive for downstream jobs
+        path = Path(tmp) / "dividend_recon_report.parquet"
+        write_report(_report, path)
+        return path.read_bytes()
+
 
 col1, col2 = st.columns(2)
 with col1:
-    nbim_file = st.file_uploader("NBIM CSV", type=["csv"], key="nbim")
+    nbim_file = st.file_uploader("NBIM feed", type=["csv", "parquet", "arrow", "feather"], key="nbim")
 with col2:
-    cust_file = st.file_uploader("Custodian CSV", type=["csv"], key="cust")
+    cust_file = st.file_uploader("Custodian feed", type=["csv", "parquet", "arrow", "feather"], key="cust")
 
 use_llm = st.checkbox("Classify breaks with LLM", value=True)
 llm_max_calls = st.number_input("Max LLM calls (budget cap)", min_value=1, max_value=1000, value=100)
+llm_concurrency = st.number_input("Concurrent LLM requests", min_value=1, max_value=64, value=8)
+duplicates = st.selectbox(
+    "Duplicate join keys", DUPLICATE_POLICIES,
+    help="fail: stop and list them · aggregate: sum amounts per key · side_table: join the first row, list the rest · allow: many-to-many",
+)
+match_orphans = st.checkbox(
+    "Pair unmatched rows", value=True,
+    help="Second pass over orphans: same ISIN, payment date within a week, close amounts → IDENTIFIER_MISMATCH",
+)
 
-run = st.button("Reconcile")
-if run:
+reconcile_clicked = st.button("Reconcile")
+if reconcile_clicked:
     if not nbim_file or not cust_file:
         st.error("Please upload both files.")
         st.stop()
+    # Remember what was run; later reruns (filters, paging) read the cached results
+    st.session_state["run"] = {
+        "nbim": upload_digest(nbim_file),
+        "cust": upload_digest(cust_file),
+        "duplicates": duplicates, "match_orphans": match_orphans,
+        "use_llm": use_llm, "llm_max_calls": int(llm_max_calls), "llm_concurrency": int(llm_concurrency),
+    }
+
+run = st.session_state.get("run")
+if run is None:
+    st.stop()
+if not nbim_file or not cust_file or (upload_digest(nbim_file), upload_digest(cust_file)) != (run["nbim"], run["cust"]):
+    st.info("Uploads changed since the last run; press Reconcile.")
+    st.stop()
+
+nbim_df = load_feed(run["nbim"], "nbim", nbim_file)
+cust_df = load_feed(run["cust"], "cust", cust_file)
+rules_key = (run["nbim"], run["cust"], run["duplicates"], run["match_orphans"])
+rules = run_rules(*rules_key, nbim_df, cust_df)
+if "error" in rules:
+    e = rules["error"]
+    st.error(f"❌ {e}")
+    st.dataframe(e.keys, use_container_width=True)
+    st.stop()
+
+# Rules-only results render at once; LLM columns fill in as the job classifies breaks
+report, metrics, job, result_key = rules["report"], [rules["metrics"]], None, rules_key
+if run["use_llm"]:
+    job_key = (rules_key, run["llm_max_calls"], run["llm_concurrency"])
+    job = llm_job(job_key, rules["report"])
+    if reconcile_clicked and job.cancelled:
+        job.start()  # resume: only breaks without a result, against the same budget
+    done, total = job.progress()
+    result_key = (job_key, done)
+    report = job.report()
+
+    col1, col2 = st.columns([3, 1])
+    state = "running" if job.running else "stopped" if job.cancelled else "done"
+    col1.progress(done / total if total else 1.0, text=f"LLM classification {state}: {done} / {total} breaks")
+    if job.running and col2.button("Stop LLM"):
+        job.cancel()
+    st.info(f"💰 LLM API calls made: {job.stats['calls']} / {run['llm_max_calls']}"
+            f" · estimated cost ${job.cost():.4f}")
+    if job.cancelled and not job.running:
+        st.caption("Stopped; classified breaks are kept. Press Reconcile to continue.")
+    if job.error is not None:
+        st.error(f"❌ LLM job failed: {job.error}")
+    if not job.running:
+        metrics.append(job.metrics)
+
+view = report_view(result_key, report)
+counts = view.counts()
+st.success(f"✅ Reconciled {counts['rows']} rows.")
+
+# Show summary metrics
+col1, col2, col3 = st.columns(3)
+col1.metric("Total Rows", counts["rows"])
+col2.metric("Breaks Detected", counts["breaks"], delta=f"{counts['matched']} matched", delta_color="inverse")
+col3.metric("Needs Human Review", counts["needs_human"])
+
+diagnostics = rules["diagnostics"]
+if diagnostics:
+    with st.expander(f"⚠️ Duplicate join keys ({run['duplicates']})", expanded=True):
+        st.dataframe(pd.concat(diagnostics["duplicate_keys"]), use_container_width=True)
+        if "side_table" in diagnostics:
+            st.caption("Rows kept out of the join (first row per key was reconciled)")
+            st.dataframe(pd.concat(diagnostics["side_table"]), use_container_width=True)
+
+with st.expander("⏱️ Run metrics"):
+    st.dataframe(pd.DataFrame([row for m in metrics for row in m.table()]), use_container_width=True)
+    if job is not None and not job.running:
+        st.json(job.metrics.llm)
+
+# Filters run over the cached view; only the current page goes to the browser
+col1, col2, col3 = st.columns(3)
+codes = col1.multiselect("Status", view.break_codes())
+custodians = col2.multiselect("Custodian", view.custodians())
+human = col3.selectbox("Needs human review", ["any", "yes", "no"], disabled=job is None)
+rows = view.select(codes, custodians, None if human == "any" else human == "yes")
+
+col1, col2 = st.columns([1, 3])
+page_size = col1.selectbox("Rows per page", PAGE_SIZES, index=1)
+pages = max(1, -(-len(rows) // page_size))
+page = col2.number_input(f"Page (of {pages}, {len(rows)} rows)", min_value=1, max_value=pages, value=1)
+st.dataframe(view.page(rows, page - 1, page_size), use_container_width=True)
+
+# Downloads are built on request, once per result
+col1, col2 = st.columns(2)
+fmt = col1.selectbox("Download format", ["csv", "parquet"])
+if col1.button("Prepare download"):
+    st.session_state["export"] = (result_key, fmt)
+if st.session_state.get("export") == (result_key, fmt):
+    col2.download_button(
+        f"⬇️ Download Report {fmt.upper()}",
+        data=export(result_key, fmt, report),
+        file_name=f"dividend_recon_report.{fmt}",
+        mime="text/csv" if fmt == "csv" else "application/vnd.apache.parquet",
+    )
 
-    nbim_df = pd.read_csv(nbim_file, sep=";")
-    cust_df = pd.read_csv(cust_file, sep=";")
-
-    report = reconcile(nbim_df, cust_df)
-
-    if use_llm:
-        # Track LLM calls for budget control
-        call_counter = {"count": 0}
-        
-        def classify_guarded(row: dict):
-            # Skip MATCHED rows and respect budget cap
-            if row.get("RECON_STATUS") == "MATCHED" or call_counter["count"] >= llm_max_calls:
-                return {}
-            call_counter["count"] += 1
-            out = classify_break(row).model_dump()
-            out["llm_source"] = "live" if os.getenv("OPENAI_API_KEY") else "fallback"
-            return out
-
-        llm_cols = report.apply(
-            lambda r: classify_guarded(r.to_dict()), 
-            axis=1, 
-            result_type="expand"
-        )
-        report = pd.concat([report, llm_cols], axis=1)
-        
-        st.info(f"💰 LLM API calls made: {call_counter['count']} / {llm_max_calls}")
-
-    st.success(f"✅ Reconciled {len(report)} rows.")
-    
-    # Show summary metrics
-    col1, col2, col3 = st.columns(3)
-    breaks = (report["RECON_STATUS"] != "MATCHED").sum() if "RECON_STATUS" in report.columns else 0
-    matched = (report["RECON_STATUS"] == "MATCHED").sum() if "RECON_STATUS" in report.columns else 0
-    needs_human = report["needs_human"].sum() if "needs_human" in report.columns else 0
-    
-    col1.metric("Total Rows", len(report))
-    col2.metric("Breaks Detected", breaks, delta=f"{matched} matched", delta_color="inverse")
-    col3.metric("Needs Human Review", needs_human)
-    
-    # Display report
-    st.dataframe(report, use_container_width=True)
-
-    # Download button
-    csv = report.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        "⬇️ Download Report CSV", 
-        data=csv, 
-        file_name="dividend_recon_report.csv", 
-        mime="text/csv"
-    )
\ No newline at end of file
+if job is not None and job.running:
+    # Poll the job: the next run picks up the breaks classified since this one
+    time.sleep(POLL_SECONDS)
+    st.rerun()
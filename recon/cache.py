@@ -0,0 +1,87 @@
+# recon/cache.py
+"""
+Persistent on-disk cache for LLM classifications.
+
+Breaks stay open for days, so the same slim payload gets classified again on
+every run. Results are stored in a small SQLite file keyed by a hash of the
+payload, the model and the system prompt (see recon.llm.cache_key), with a
+TTL and an LRU cap on the number of entries.
+"""
+from __future__ import annotations
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional, Union
+from .schemas import LLMResult
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "recon" / "llm_cache.sqlite"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+class LLMCache:
+    """SQLite-backed key -> LLMResult store with TTL expiry and LRU eviction."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[LLMResult]:
+        now = time.time()
+        row = self._db.execute(
+            "SELECT value FROM llm_cache WHERE key = ? AND created >= ?",
+            (key, now - self.ttl_seconds),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+        return LLMResult.model_validate_json(row[0])
+
+    def put(self, key: str, result: LLMResult) -> None:
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+            (key, result.model_dump_json(), now, now),
+        )
+        # Each result was paid for: persist it now (with any pending access times), not only at close()
+        self._db.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least-recently-used ones beyond max_entries."""
+        cur = self._db.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_seconds,))
+        removed = cur.rowcount
+        cur = self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        removed += cur.rowcount
+        self._db.commit()
+        return removed
+
+    def close(self) -> None:
+        self.evict()
+        self._db.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
@@ -4,62 +4,254 @@ from typing import Optional
 import pandas as pd
 import typer
 from pathlib import Path
-from .rules import reconcile as run_reconcile
-from .llm import classify_break
+from .rules import DUPLICATE_POLICIES, DuplicateKeyError, pair_orphans, reconcile as run_reconcile
+from .llm import _MODEL, _SYSTEM_HASH, classify_report, estimate_cost
+from .ratelimit import RateLimiter
+from .cache import LLMCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES
+from .fanin import custodian_files, reconcile_fanin
+from .incremental import enrich_incremental
+from .loader import file_format, read_custody, read_nbim, write_report
+from .metrics import Metrics
+from .parallel import reconcile_parallel
+from .snapshot import build_snapshot, load_snapshot, snapshot_info
+from .stream import reconcile_stream
+
+# --partition-by choices → report column
+PARTITION_COLUMNS = {"status": "RECON_STATUS", "custodian": "CUSTODIAN"}
 
 app = typer.Typer(
     add_completion=False,
     help=(
-        "Runs reconciliation and writes a CSV report.\n"
-        "- Reads semicolon-separated CSVs.\n"
+        "Runs reconciliation and writes a report (CSV, Parquet or Arrow IPC).\n"
+        "- Reads semicolon-separated CSVs, or Parquet / Arrow IPC by file extension.\n"
         "- Applies deterministic rules to flag breaks.\n"
         "- Optionally calls the LLM ONLY for break rows, up to llm_max_calls (budget cap)."
     ),
 )
 
+snapshot_app = typer.Typer(help="Memory-mapped snapshots of the normalized NBIM book (used with --nbim-snapshot).")
+app.add_typer(snapshot_app, name="snapshot")
+
 @app.callback(invoke_without_command=True)
 def main(
     ctx: typer.Context,
-    nbim: Optional[Path] = typer.Option(None, exists=True, readable=True, help="NBIM CSV (;)"),
-    cust: Optional[Path] = typer.Option(None, exists=True, readable=True, help="Custodian CSV (;)"),
-    out: Path = typer.Option("recon_out.csv", help="Output CSV"),
+    nbim: Optional[Path] = typer.Option(None, exists=True, readable=True, help="NBIM feed: CSV (;), .parquet or .arrow/.feather"),
+    cust: Optional[Path] = typer.Option(None, exists=True, readable=True, help="Custodian feed: CSV (;), .parquet or .arrow/.feather"),
+    cust_dir: Optional[Path] = typer.Option(
+        None, exists=True, file_okay=False, help="Fan-in: reconcile NBIM once against every custodian file in this directory",
+    ),
+    nbim_snapshot: Optional[Path] = typer.Option(
+        None, help="Normalized NBIM snapshot (recon snapshot build); built from --nbim or rebuilt when its source changed",
+    ),
+    out: Path = typer.Option("recon_out.csv", help="Output report: .csv, .parquet or .arrow/.feather"),
+    partition_by: Optional[str] = typer.Option(
+        None, help="Write --out as a directory of hive partitions: status (RECON_STATUS) | custodian (Parquet/Arrow only)",
+    ),
     use_llm: bool = typer.Option(False, help="Add LLM classification columns"),
     fx_tolerance_bp: int = typer.Option(100, help="FX variance tolerance in basis points (display only)"),
-    llm_max_calls: int = typer.Option(100, help="Max rows to send to LLM (budget cap)"),
+    llm_max_calls: int = typer.Option(100, help="Max LLM requests (budget cap; one row each unless --llm-batch-size)"),
+    stream: bool = typer.Option(False, help="Out-of-core mode: hash-partition inputs to disk and reconcile bucket by bucket"),
+    chunk_rows: int = typer.Option(100_000, min=1, help="Rows per read chunk / target rows per bucket in --stream mode"),
+    workers: int = typer.Option(1, min=1, help="Processes for the rules engine (key-partitioned, in-memory mode)"),
+    llm_concurrency: int = typer.Option(8, min=1, help="Max concurrent LLM requests (halved on 429s, grown back on success)"),
+    llm_rpm: Optional[float] = typer.Option(None, min=1, help="Client-side limit on LLM requests per minute"),
+    llm_tpm: Optional[float] = typer.Option(None, min=1, help="Client-side limit on LLM tokens (prompt + completion) per minute"),
+    llm_token_budget: Optional[int] = typer.Option(None, min=1, help="Stop starting LLM requests once this many tokens are spent"),
+    llm_max_retries: int = typer.Option(3, min=0, help="Retries per LLM request on 429 / 5xx / connection errors"),
+    llm_batch_size: int = typer.Option(1, min=1, help="Breaks packed into one LLM request (budget counts requests)"),
+    llm_dedupe: bool = typer.Option(True, help="Classify one representative per group of breaks with the same signature"),
+    llm_cache: Path = typer.Option(DEFAULT_CACHE_PATH, help="SQLite cache of LLM classifications"),
+    no_llm_cache: bool = typer.Option(False, "--no-llm-cache", help="Always call the LLM, never read/write the cache"),
+    llm_cache_ttl_days: float = typer.Option(7.0, help="Cache entry lifetime in days"),
+    llm_cache_max_entries: int = typer.Option(DEFAULT_MAX_ENTRIES, help="Cache size cap (least recently used evicted)"),
+    metrics: Optional[Path] = typer.Option(None, help="Write per-stage timing/memory/throughput and LLM stats as JSON"),
+    duplicates: str = typer.Option(
+        "fail",
+        help="Join keys with several rows on one side: fail | aggregate (sum amounts, first of the rest) | "
+             "side_table (join the first row, extras to <out>_side_table.csv) | allow (many-to-many merge)",
+    ),
+    orphan_matching: bool = typer.Option(
+        True, help="Pair unmatched rows on ISIN, payment date and amounts; pairs get IDENTIFIER_MISMATCH",
+    ),
+    state: Optional[Path] = typer.Option(
+        None, help="LLM result store (Parquet): report rows unchanged since the last run keep their stored LLM columns (needs --use-llm)",
+    ),
 ):
     """
     Root usage:
       recon --nbim NBIM.csv --cust CUSTODY.csv --out recon_out.csv --use-llm --llm-max-calls 50
+      recon --nbim NBIM.csv --cust CUSTODY.csv --out recon_out.csv --stream --chunk-rows 500000
+      recon --nbim NBIM.csv --cust CUSTODY.csv --metrics metrics.json
+      recon --nbim NBIM.csv --cust CUSTODY.csv --duplicates aggregate
+      recon --nbim NBIM.csv --cust CUSTODY.csv --use-llm --state recon_state.parquet
+      recon --nbim NBIM.parquet --cust CUSTODY.parquet --out recon_out.parquet --partition-by status
+      recon snapshot build --nbim NBIM.csv --out nbim_snapshot.arrow
+      recon --nbim-snapshot nbim_snapshot.arrow --cust CUSTODY.csv
+      recon --nbim NBIM.csv --cust-dir custodians/ --workers 4
     """
+    if ctx.invoked_subcommand is not None:
+        return
     # Show help if required files are missing
-    if nbim is None or cust is None:
+    if (nbim is None and nbim_snapshot is None) or (cust is None and cust_dir is None):
         typer.echo(ctx.get_help())
         raise typer.Exit(code=0)
 
-    # Load CSVs
-    nbim_df = pd.read_csv(nbim, sep=";")
-    cust_df = pd.read_csv(cust, sep=";")
-
-    # Rules engine
-    report = run_reconcile(nbim_df, cust_df)
-
-    # Optional LLM (only for breaks) with hard cap
-    if use_llm:
-        calls = 0
-        def classify_guarded(row: dict):
-            nonlocal calls
-            if row.get("RECON_STATUS") == "MATCHED" or calls >= llm_max_calls:
-                return {}
-            calls += 1
-            out = classify_break(row).model_dump()
-            out["llm_source"] = "live" if os.getenv("OPENAI_API_KEY") else "fallback"
-            return out
-
-        llm_cols = report.apply(lambda r: classify_guarded(r.to_dict()), axis=1, result_type="expand")
-        report = pd.concat([report, llm_cols], axis=1)
-
-    report.to_csv(out, index=False)
+    if duplicates not in DUPLICATE_POLICIES:
+        raise typer.BadParameter(f"must be one of {', '.join(DUPLICATE_POLICIES)}", param_hint="--duplicates")
+    if cust_dir is not None and (cust is not None or stream):
+        raise typer.BadParameter("can't be combined with --cust or --stream", param_hint="--cust-dir")
+    if state is not None and (stream or not use_llm):
+        raise typer.BadParameter("stores LLM results: needs --use-llm, not with --stream", param_hint="--state")
+    if nbim_snapshot is not None and stream:
+        raise typer.BadParameter("can't be combined with --stream", param_hint="--nbim-snapshot")
+    if partition_by is not None:
+        if partition_by not in PARTITION_COLUMNS:
+            raise typer.BadParameter(f"must be one of {', '.join(PARTITION_COLUMNS)}", param_hint="--partition-by")
+        if file_format(out) == "csv":
+            raise typer.BadParameter("needs a .parquet or .arrow --out", param_hint="--partition-by")
+    # Spill buckets work on CSV text
+    if stream and {file_format(nbim), file_format(cust)} != {"csv"}:
+        raise typer.BadParameter("--stream reads CSV feeds only", param_hint="--nbim/--cust")
+    if stream and file_format(out) != "csv":
+        raise typer.BadParameter("--stream appends CSV buckets; use a .csv path", param_hint="--out")
+
+    run_metrics = Metrics(enabled=metrics is not None)
+    diagnostics: dict = {}
+
+    # Optional LLM (only for breaks) with hard cap shared across the whole run
+    llm_stats = {"calls": 0}
+    cache = None
+    if use_llm and not no_llm_cache and os.getenv("OPENAI_API_KEY"):
+        cache = LLMCache(llm_cache, ttl_seconds=llm_cache_ttl_days * 86400, max_entries=llm_cache_max_entries)
+
+    limiter = RateLimiter(rpm=llm_rpm, tpm=llm_tpm, concurrency=llm_concurrency)
+
+    def add_llm(report: pd.DataFrame) -> pd.DataFrame:
+        with run_metrics.stage("llm", len(report)):
+            return classify_report(
+                report, max_calls=llm_max_calls, concurrency=llm_concurrency,
+                cache=cache, stats=llm_stats, batch_size=llm_batch_size, dedupe=llm_dedupe,
+                limiter=limiter, token_budget=llm_token_budget, max_retries=llm_max_retries,
+            )
+
+    def summary():
+        if metrics is not None:
+            if use_llm:
+                run_metrics.record_llm(llm_stats)
+            run_metrics.to_json(metrics)
+            typer.echo(f"Wrote metrics to {metrics}")
+        if use_llm:
+            tokens = llm_stats.get("prompt_tokens", 0) + llm_stats.get("completion_tokens", 0)
+            line = f"LLM requests: {llm_stats['calls']} / {llm_max_calls}; tokens: {tokens}"
+            if llm_token_budget is not None:
+                line += f" / {llm_token_budget}"
+            line += f"; est. cost: ${estimate_cost(llm_stats):.4f}"
+            for name in ("retries", "fallbacks", "skipped"):
+                if llm_stats.get(name):
+                    line += f"; {name}: " + ", ".join(f"{k}={v}" for k, v in sorted(llm_stats[name].items()))
+            if cache is not None:
+                line += f"; cache hits: {cache.hits}, misses: {cache.misses}"
+                cache.close()
+            typer.echo(line)
+
+    def write_diagnostics():
+        for name, frames in diagnostics.items():
+            path = out.with_name(f"{out.stem}_{name}.csv")
+            pd.concat(frames).to_csv(path, index=name == "side_table")
+            typer.echo(f"Wrote {path}")
+
+    try:
+        if stream:
+            reconcile_stream(
+                nbim, cust, out, chunk_rows=chunk_rows,
+                enrich=add_llm if use_llm else None, metrics=run_metrics,
+                duplicates=duplicates, diagnostics=diagnostics, match_orphans=orphan_matching,
+            )
+        else:
+            # Load feeds; a snapshot is already normalized
+            with run_metrics.stage("load") as st:
+                if nbim_snapshot is not None:
+                    snap_stats: dict = {}
+                    try:
+                        nbim_df = load_snapshot(nbim_snapshot, nbim, stats=snap_stats)
+                    except FileNotFoundError as e:
+                        raise typer.BadParameter(str(e), param_hint="--nbim-snapshot")
+                    if snap_stats["rebuilt"]:
+                        typer.echo(f"Rebuilt NBIM snapshot {nbim_snapshot}")
+                else:
+                    nbim_df = read_nbim(nbim)
+                cust_df = read_custody(cust) if cust_dir is None else None
+                st.rows_out = len(nbim_df) + (len(cust_df) if cust_df is not None else 0)
+            normalized = nbim_snapshot is not None
+
+            # Rules engine (per-process stages aren't visible across workers, so time it as one)
+            if cust_dir is not None:
+                files = custodian_files(cust_dir)
+                if not files:
+                    raise typer.BadParameter(f"no .csv/.parquet/.arrow files in {cust_dir}", param_hint="--cust-dir")
+                with run_metrics.stage("reconcile", len(nbim_df)) as st:
+                    report, cust_summary = reconcile_fanin(
+                        nbim_df, files, workers, duplicates=duplicates, diagnostics=diagnostics,
+                        match_orphans=False, nbim_normalized=normalized,
+                    )
+                    st.rows_out = len(report)
+                if orphan_matching:
+                    with run_metrics.stage("orphans", len(report)):
+                        report = pair_orphans(report, stats=run_metrics.join)
+                summary_path = out.with_name(f"{out.stem}_custodians.csv")
+                cust_summary.to_csv(summary_path, index=False)
+                for row in cust_summary.itertuples(index=False):
+                    typer.echo(f"{row.cust_file or '(no custodian)'}: {row.report_rows} rows, "
+                               f"{row.matched} matched, {row.breaks} breaks, {row.unmatched} unmatched")
+                typer.echo(f"Wrote {summary_path}")
+            elif workers == 1:
+                report = run_reconcile(
+                    nbim_df, cust_df, metrics=run_metrics, duplicates=duplicates,
+                    diagnostics=diagnostics, match_orphans=orphan_matching, nbim_normalized=normalized,
+                )
+            else:
+                with run_metrics.stage("reconcile", len(nbim_df) + len(cust_df)) as st:
+                    report = reconcile_parallel(
+                        nbim_df, cust_df, workers, duplicates=duplicates,
+                        diagnostics=diagnostics, match_orphans=False, nbim_normalized=normalized,
+                    )
+                    st.rows_out = len(report)
+                if orphan_matching:
+                    with run_metrics.stage("orphans", len(report)):
+                        report = pair_orphans(report, stats=run_metrics.join)
+
+            if use_llm and state is not None:
+                inc_stats: dict = {}
+                report = enrich_incremental(
+                    report, state, add_llm, config={"model": _MODEL, "prompt": _SYSTEM_HASH},
+                    metrics=run_metrics, stats=inc_stats,
+                )
+                typer.echo(f"LLM results reused from {state}: {inc_stats['enrich_reused']} of {len(report)} rows")
+            elif use_llm:
+                report = add_llm(report)
+
+            with run_metrics.stage("write", len(report)):
+                write_report(report, out, PARTITION_COLUMNS.get(partition_by))
+    except DuplicateKeyError as e:
+        if cache is not None:
+            cache.close()
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+
+    write_diagnostics()
+    summary()
     typer.echo(f"Wrote {out}")
 
+@snapshot_app.command("build")
+def snapshot_build(
+    nbim: Path = typer.Option(..., exists=True, readable=True, help="NBIM feed: CSV (;), .parquet or .arrow/.feather"),
+    out: Path = typer.Option("nbim_snapshot.arrow", help="Snapshot file (uncompressed Arrow IPC)"),
+):
+    """
+    Read and normalize the NBIM feed once and store it for recon --nbim-snapshot.
+    """
+    build_snapshot(nbim, out)
+    typer.echo(f"Wrote {out} (fingerprint {snapshot_info(out)['fingerprint']})")
+
 if __name__ == "__main__":
     app()
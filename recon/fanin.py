@@ -0,0 +1,204 @@
+# recon/fanin.py
+"""
+One NBIM book against many custodian files.
+
+NBIM is normalized once, hashed on the join key and sorted by that hash into
+an Arrow IPC file, which serves as the hash index: every worker memory-maps it
+and binary-searches its custodian's key hashes to take only the NBIM rows that
+custodian could match. Each custodian file is read and reconciled against its
+slice in its own process. NBIM rows no custodian covers are reconciled against
+an empty custodian frame afterwards, so they are the only MISSING rows on the
+NBIM side; orphan pairing then runs once over the combined report, letting a
+custodian's unmatched row pair with an uncovered NBIM row.
+
+A key present in several custodian files is reconciled against each of them,
+so its NBIM row appears once per custodian; the summary counts such keys.
+"""
+from __future__ import annotations
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from .incremental import key_hashes
+from .loader import CUSTODY_SCHEMA, _FORMATS, read_custody
+from .parallel import _read_part, _write_part, feather
+from .rules import JOIN_KEYS, REPORT_COLS, normalize_nbim, pair_orphans, reconcile
+
+_HASH = "__key_hash"
+
+
+def custodian_files(directory: Union[str, Path]) -> List[Path]:
+    """CSV, Parquet and Arrow files in directory, by name."""
+    files = [p for p in Path(directory).iterdir() if p.is_file() and p.suffix.lower() in {".csv", *_FORMATS}]
+    return sorted(files)
+
+
+def _empty_custody() -> pd.DataFrame:
+    schema = {c: t for c, t in CUSTODY_SCHEMA.items() if c != "BANK_ACCOUNT"}
+    return pd.DataFrame({c: pd.Series(dtype=t) for c, t in schema.items()})
+
+
+def _slice(hashes: np.ndarray, wanted: np.ndarray) -> np.ndarray:
+    """Positions in the sorted hashes equal to any of the wanted hashes."""
+    wanted = np.unique(wanted)
+    lo = np.searchsorted(hashes, wanted, side="left")
+    hi = np.searchsorted(hashes, wanted, side="right")
+    counts = hi - lo
+    if not counts.sum():
+        return np.empty(0, dtype=np.int64)
+    # Expand each [lo, hi) run without a Python loop
+    starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+    return starts + np.arange(counts.sum())
+
+
+def _reconcile_slice(cust: pd.DataFrame, hashes: np.ndarray, take, duplicates: str):
+    """Reconcile one custodian frame against the NBIM index rows its keys hash to."""
+    taken = _slice(hashes, key_hashes(cust))
+    diagnostics: dict = {}
+    report = reconcile(
+        take(taken), cust, duplicates=duplicates, diagnostics=diagnostics,
+        match_orphans=False, nbim_normalized=True,
+    )
+    return report, taken, diagnostics
+
+
+def _reconcile_custodian(cust_path: Path, index_path: Path, out_path: Path, duplicates: str) -> dict:
+    """Worker: reconcile one custodian file against the mapped index; returns part paths and the row count."""
+    cust = read_custody(cust_path)
+    if index_path.suffix == ".arrow":
+        # Only the hash column and the taken rows leave Arrow; the rest of the map is never converted
+        table = feather.read_table(index_path, memory_map=True)
+        hashes = table.column(_HASH).to_numpy()
+        take = lambda rows: table.drop_columns([_HASH]).take(rows).to_pandas()
+    else:
+        index = _read_part(index_path)
+        hashes = index[_HASH].to_numpy()
+        take = lambda rows: index.iloc[rows].drop(columns=_HASH).reset_index(drop=True)
+    report, taken, diagnostics = _reconcile_slice(cust, hashes, take, duplicates)
+
+    parts = {
+        "report": _write_part(report, out_path),
+        "taken": out_path.with_name(out_path.name + "_taken.npy"),
+        "cust_rows": len(cust),
+    }
+    np.save(parts["taken"], taken)
+    for name, frames in diagnostics.items():
+        frame = pd.concat(frames).reset_index() if name == "side_table" else pd.concat(frames)
+        parts[name] = _write_part(frame, out_path.with_name(f"{out_path.name}_{name}"))
+    return parts
+
+
+def _reconcile_all(index: pd.DataFrame, cust_paths: List[Path], workers: int, duplicates: str, diagnostics):
+    """(report, taken rows, custodian row count) per file, in file order."""
+    hashes = index[_HASH].to_numpy()
+    if workers <= 1:
+        nbim = index.drop(columns=_HASH)
+        results = []
+        for path in cust_paths:
+            cust = read_custody(path)
+            report, taken, diag = _reconcile_slice(
+                cust, hashes, lambda rows: nbim.iloc[rows].reset_index(drop=True), duplicates,
+            )
+            if diagnostics is not None:
+                for name, frames in diag.items():
+                    diagnostics.setdefault(name, []).extend(frames)
+            results.append((report, taken, len(cust)))
+        return results
+
+    with tempfile.TemporaryDirectory(prefix="recon_fanin_") as tmp:
+        tmp = Path(tmp)
+        index_path = _write_part(index, tmp / "nbim_index")
+        jobs = [(p, index_path, tmp / f"out_{i}", duplicates) for i, p in enumerate(cust_paths)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outs = list(pool.map(_reconcile_custodian, *zip(*jobs)))
+        if diagnostics is not None:
+            for o in outs:
+                if "duplicate_keys" in o:
+                    diagnostics.setdefault("duplicate_keys", []).append(_read_part(o["duplicate_keys"]))
+                if "side_table" in o:
+                    diagnostics.setdefault("side_table", []).append(_read_part(o["side_table"]).set_index(JOIN_KEYS))
+        return [(_read_part(o["report"]), np.load(o["taken"]), o["cust_rows"]) for o in outs]
+
+
+def _summarize(report: pd.DataFrame, cust_file: str, cust_rows: int, nbim_rows: int, shared: int) -> dict:
+    status = report["RECON_STATUS"]
+    return {
+        "cust_file": cust_file,
+        "cust_rows": cust_rows,
+        "nbim_rows": nbim_rows,
+        "report_rows": len(report),
+        "matched": int((status == "MATCHED").sum()),
+        "breaks": int((status != "MATCHED").sum()),
+        "unmatched": int((report["_merge"] != "both").sum()),
+        "shared_keys": shared,
+    }
+
+
+def reconcile_fanin(
+    nbim: pd.DataFrame,
+    cust_paths: List[Union[str, Path]],
+    workers: Optional[int] = None,
+    duplicates: str = "fail",
+    diagnostics: Optional[dict] = None,
+    match_orphans: bool = True,
+    nbim_normalized: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Reconcile one NBIM frame against every custodian file in cust_paths.
+
+    Returns (report, summary):
+    - report: every custodian's rows plus the NBIM rows no custodian covers, with
+      a cust_file column (file name; empty for uncovered NBIM rows), sorted on the
+      join key like reconcile(). Orphans are paired across the whole report.
+    - summary: one row per custodian file (rows on each side, matched, breaks,
+      unmatched, NBIM keys another custodian file also covers) and a last row for
+      the uncovered NBIM rows. Counts are before orphan pairing.
+
+    Custodian files are processed in up to `workers` processes (default: all
+    cores; 1 runs in this process). duplicates / diagnostics apply per file.
+    """
+    if not cust_paths:
+        raise ValueError("no custodian files to reconcile")
+    cust_paths = [Path(p) for p in cust_paths]
+    workers = min(workers or os.cpu_count() or 1, len(cust_paths))
+    nbim_norm = nbim if nbim_normalized else normalize_nbim(nbim)
+
+    hashes = key_hashes(nbim_norm)
+    order = np.argsort(hashes, kind="stable")
+    index = nbim_norm.iloc[order].reset_index(drop=True)
+    index[_HASH] = hashes[order]
+
+    results = _reconcile_all(index, cust_paths, workers, duplicates, diagnostics)
+    taken = [t for _, t, _ in results]
+
+    # Rows of the index each custodian took; rows taken more than once sit under shared keys
+    cover = np.zeros(len(index), dtype=np.int64)
+    for t in taken:
+        cover[t] += 1
+    uncovered = index[cover == 0].drop(columns=_HASH)
+    missing = reconcile(
+        uncovered, _empty_custody(), duplicates=duplicates, diagnostics=diagnostics,
+        match_orphans=False, nbim_normalized=True,
+    )
+
+    rows = []
+    for path, (report, t, cust_rows) in zip(cust_paths, results):
+        shared_keys = int(np.unique(index[_HASH].to_numpy()[t[cover[t] > 1]]).size)
+        rows.append(_summarize(report, path.name, cust_rows, len(t), shared_keys))
+    rows.append(_summarize(missing, "", 0, len(uncovered), 0))
+    summary = pd.DataFrame(rows)
+
+    reports = [r.assign(cust_file=path.name) for path, (r, _, _) in zip(cust_paths, results)]
+    report = pd.concat([*reports, missing.assign(cust_file="")], ignore_index=True)
+    report = report[[c for c in REPORT_COLS if c in report.columns] + ["cust_file"]]
+    try:
+        report = report.sort_values(JOIN_KEYS, kind="stable", ignore_index=True)
+    except TypeError:
+        # Mixed key types aren't orderable; file order is still deterministic
+        pass
+    if match_orphans:
+        report = pair_orphans(report)
+    return report, summary
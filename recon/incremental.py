@@ -0,0 +1,222 @@
+# recon/incremental.py
+"""
+Reuse of the last run's enrich (LLM) columns for unchanged report rows.
+
+Breaks stay open for days, so most rows of a report are identical to a row of
+the previous one. The state store keeps a content hash of every report row
+that was enriched last time (breaks the budget left without a result are not
+kept) next to its enrich columns. On the next run the report is reconciled in
+full as usual, then each row is hashed and only rows without a stored result
+are passed to enrich; the rest get their stored columns back. The report is the
+same as enrich() on the whole report would give.
+
+The store is a Parquet file (row hash plus enrich columns) whose schema
+metadata holds its settings as JSON, replaced atomically after each run. A
+store written with other settings (e.g. another model or prompt) is ignored,
+as is a file that isn't a readable store, so such a change just costs one full
+enrich.
+
+key_hashes hashes each row's join key; recon.fanin, recon.stream and recon.parallel
+partition on it too.
+"""
+from __future__ import annotations
+import json
+import os
+from pathlib import Path
+from typing import Callable, Optional, Union
+import numpy as np
+import pandas as pd
+from .metrics import Metrics
+from .rules import JOIN_KEYS, _is_numeric_key
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = pc = pq = None
+
+STATE_VERSION = 2
+
+_META_KEY = b"recon_state"
+_HASH = "__row_hash"
+
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_NULL = np.uint64(0x5BD1E9955BD1E995)
+
+
+def _hash_text(values: pd.Series) -> Optional[np.ndarray]:
+    """
+    uint64 per string without a Python-level pass: values are NUL-padded to a common
+    width in Arrow and the padded bytes are read as 8-byte words. A value's hash
+    depends only on the value, not on the rest of the column. None when pyarrow is
+    missing or the column isn't plain text (the caller falls back to pandas).
+    """
+    if pa is None:
+        return None
+    try:
+        arr = pa.array(values.array if isinstance(values.dtype, pd.StringDtype) else values.to_numpy(object),
+                       type=pa.large_string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    if arr.type != pa.large_string():
+        arr = arr.cast(pa.large_string())
+    n = len(arr)
+    arr = arr.fill_null("")
+    null = values.isna().to_numpy()
+    lengths = pc.binary_length(arr).to_numpy().astype(np.uint64)
+    # utf8_rpad pads per character, so values with multi-byte characters are hashed on their own
+    wide = lengths != pc.utf8_length(arr).to_numpy().astype(np.uint64)
+    if wide.any():
+        lengths = np.where(wide, np.uint64(0), lengths)
+        arr = pc.if_else(pa.array(wide), "", arr)
+    width = max(8, -(-int(lengths.max(initial=0)) // 8) * 8)
+    padded = pc.utf8_rpad(arr, width=width, padding="\x00")
+    offsets = np.frombuffer(padded.buffers()[1], dtype=np.int64)[padded.offset:padded.offset + n + 1]
+    data = np.frombuffer(padded.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]]
+    words = data.view(np.uint64).reshape(n, width // 8)
+    h = lengths
+    for j in range(words.shape[1]):
+        # Only a value's own words count, so the hash doesn't depend on the column's widest value
+        h = np.where(lengths > 8 * j, h * _MIX ^ words[:, j], h)
+    h = pd.util.hash_array(h)
+    if wide.any():
+        h[wide] = pd.util.hash_array(values.to_numpy(object)[wide])
+    return np.where(null, _NULL, h)
+
+
+def _hash_column(col: pd.Series) -> np.ndarray:
+    """uint64 per value, independent of category codes and row position."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # Hash each category once; codes differ between files, category values don't
+        cats = _hash_column(pd.Series(col.cat.categories))
+        codes = col.cat.codes.to_numpy()
+        return np.where(codes < 0, _NULL, cats[codes])
+    if col.dtype.kind in "biufmM":
+        return pd.util.hash_array(col.to_numpy())
+    h = _hash_text(col)
+    return h if h is not None else pd.util.hash_array(col.to_numpy(object))
+
+
+def _combine(hashes) -> np.ndarray:
+    out = None
+    for h in hashes:
+        out = h if out is None else out * _MIX ^ h
+    return pd.util.hash_array(out)
+
+
+def _hashable_key(col: pd.Series) -> pd.Series:
+    # Integral floats (an int key with NaN elsewhere) hash like the int key they match in a merge
+    if pd.api.types.is_float_dtype(col):
+        valid = col.dropna()
+        if (valid % 1 == 0).all():
+            return col.astype("Int64")
+    return col
+
+
+def key_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    uint64 hash of each row's join key (raw or normalized columns).
+    Keys are hashed as text, so a numeric key matches the text key it is merged with.
+    """
+    # Custodian files carry the account as CUSTODY until normalize() renames it
+    source = {"BANK_ACCOUNT": "CUSTODY" if "CUSTODY" in df.columns else "BANK_ACCOUNT"}
+    keys = [df[source.get(k, k)] for k in JOIN_KEYS]
+    return _combine(_hash_column(_hashable_key(k).astype("str") if _is_numeric_key(k) else k) for k in keys)
+
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Hash of every row's values; the column names are part of the hash."""
+    names = pd.util.hash_array(np.array(["\x1f".join(map(str, df.columns))], dtype=object))
+    return _combine([np.repeat(names, len(df))] + [_hash_column(df[c]) for c in df.columns])
+
+
+def _isin(values: np.ndarray, test: np.ndarray) -> np.ndarray:
+    # Hash-based; np.isin sorts both arrays
+    return pd.Series(values).isin(test).to_numpy()
+
+
+def load_state(path: Union[str, Path], config: dict) -> Optional[pd.DataFrame]:
+    """
+    Stored enrich columns indexed by row hash, or None when there is no store, it
+    was written with a different config or it isn't a readable store.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        schema = pq.read_schema(path)
+        meta = json.loads((schema.metadata or {})[_META_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+        return None
+    if meta != {"version": STATE_VERSION, "config": config}:
+        return None
+    return pq.read_table(path).to_pandas().set_index(_HASH)
+
+
+def save_state(path: Union[str, Path], stored: pd.DataFrame, config: dict) -> None:
+    """Write enrich columns indexed by row hash, with config, atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(stored.rename_axis(_HASH).reset_index(), preserve_index=False)
+    meta = {"version": STATE_VERSION, "config": config}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: json.dumps(meta).encode()})
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def enrich_incremental(
+    report: pd.DataFrame,
+    state_path: Union[str, Path],
+    enrich: Callable[[pd.DataFrame], pd.DataFrame],
+    config: Optional[dict] = None,
+    metrics: Optional[Metrics] = None,
+    stats: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    enrich(report), reusing the stored enrich columns of rows identical to a row
+    enriched in an earlier run, and storing this run's results at state_path.
+
+    config (JSON-serializable) describes what the results depend on beyond the
+    row, e.g. the model and prompt; a store written with another config is not
+    used. stats, if given, gets "enrich_reused".
+    """
+    if pa is None:
+        raise ImportError("the state store needs pyarrow (pip install pyarrow)")
+    metrics = metrics or Metrics(enabled=False)
+    config = config or {}
+    with metrics.stage("state_read", len(report)):
+        stored = load_state(state_path, config)
+        hashes = _row_hashes(report)
+        reuse = np.zeros(len(report), dtype=bool)
+        if stored is not None:
+            stored = stored[~stored.index.duplicated()]
+            reuse = _isin(hashes, stored.index.to_numpy())
+
+    rules_cols = list(report.columns)
+    todo = report[~reuse]
+    parts = []
+    if len(todo) or not reuse.any():
+        parts.append(enrich(todo))
+    if reuse.any():
+        reused = report[reuse].copy()
+        for col in stored.columns:
+            reused[col] = stored[col].reindex(hashes[reuse]).to_numpy()
+        parts.append(reused)
+    enriched = pd.concat(parts).loc[report.index]
+
+    if stats is not None:
+        stats["enrich_reused"] = int(reuse.sum())
+
+    with metrics.stage("state_write", len(enriched)):
+        enrich_cols = [c for c in enriched.columns if c not in rules_cols]
+        # Breaks that got no result (budget cap) are retried next time
+        done = np.ones(len(enriched), dtype=bool)
+        if "break_code" in enrich_cols:
+            done = (enriched["RECON_STATUS"] == "MATCHED").to_numpy() | enriched["break_code"].notna().to_numpy()
+        save_state(state_path, enriched.loc[done, enrich_cols].set_axis(hashes[done]), config)
+    return enriched
@@ -0,0 +1,120 @@
+# recon/jobs.py
+"""
+LLM classification as a background job.
+
+ClassifyJob runs the steps of classify_report on a worker thread (the async
+client's request pool lives there) and keeps every break's result as it comes
+in, so a UI can show the rules-only report at once, fill the LLM columns in on
+each refresh and show progress and spend while requests are in flight.
+cancel() stops new requests and keeps what is done; start() on a cancelled job
+resumes with only the breaks that are still unclassified, against the same
+budget.
+"""
+from __future__ import annotations
+import threading
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from .cache import LLMCache
+from .llm import _attach, _plan, classify_breaks, close_thread_clients, estimate_cost
+from .metrics import Metrics
+from .ratelimit import RateLimiter
+
+
+class ClassifyJob:
+    def __init__(
+        self,
+        report: pd.DataFrame,
+        max_calls: int,
+        concurrency: int = 8,
+        cache: Optional[LLMCache] = None,
+        batch_size: int = 1,
+        dedupe: bool = True,
+        limiter: Optional[RateLimiter] = None,
+        token_budget: Optional[int] = None,
+        max_retries: int = 3,
+    ):
+        """Same arguments as classify_report; a cache must be usable from the worker thread."""
+        self.stats = {"calls": 0}
+        self.error: Optional[BaseException] = None
+        self.metrics = Metrics()
+        self._report = report
+        self._max_calls = max_calls
+        self._kwargs = {
+            "concurrency": concurrency, "cache": cache, "batch_size": batch_size,
+            "limiter": limiter, "token_budget": token_budget, "max_retries": max_retries,
+        }
+        self._targets, self._priority, self._groups = _plan(report, max_calls, self.stats, cache, batch_size, dedupe)
+        self._rows = report.loc[self._targets].to_dict("records")
+        self._results = [None] * len(self._targets)
+        self._done = 0
+        self._last: Optional[Tuple[int, pd.DataFrame]] = None
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ClassifyJob":
+        """Start (or resume after cancel) classifying the breaks without a result."""
+        if self.running:
+            return self
+        self._cancel.clear()
+        todo = [i for i, r in enumerate(self._results) if r is None]
+        self._thread = threading.Thread(target=self._run, args=(todo,), name="recon-llm-job", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self, todo: list) -> None:
+        def store(i: int, result) -> None:
+            # One list slot per target, written once from this thread
+            self._results[todo[i]] = result
+            self._done += 1
+
+        try:
+            with self.metrics.stage("llm", len(todo)):
+                classify_breaks(
+                    [self._rows[i] for i in todo], max_calls=self._max_calls, stats=self.stats,
+                    priority=self._priority[np.asarray(todo, dtype=np.int64)],
+                    on_result=store, cancel=self._cancel, **self._kwargs,
+                )
+        except Exception as e:  # surfaced to the UI; results so far are kept
+            self.error = e
+        finally:
+            # Each run has its own thread, so its loop and connection pool go with it
+            close_thread_clients()
+        self.metrics.record_llm(self.stats)
+
+    def cancel(self) -> None:
+        """Stop starting requests; in-flight ones still land."""
+        self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        """Ran to the end: every break it could afford has a result."""
+        return self._thread is not None and not self.running and not self.cancelled and self.error is None
+
+    def progress(self) -> Tuple[int, int]:
+        """(breaks classified, breaks planned); planned is capped by the budget up front."""
+        return self._done, len(self._targets)
+
+    def cost(self) -> float:
+        return estimate_cost(self.stats)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the worker stops; True if it did."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.running
+
+    def report(self) -> pd.DataFrame:
+        """The report with the LLM columns of every break classified so far (rebuilt only after progress)."""
+        done = self._done
+        if self._last is None or self._last[0] != done:
+            self._last = (done, _attach(self._report, self._targets, list(self._results), self._groups))
+        return self._last[1]
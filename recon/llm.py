@@ -1,15 +1,29 @@
 # recon/llm.py
-import os, json
-from typing import Dict, Any
+import os, json, time, asyncio, contextlib, functools, hashlib, heapq, threading
+from typing import Callable, Dict, Any, List, Iterable, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
 from pydantic import ValidationError
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from .schemas import LLMResult
+from .cache import LLMCache
+from .ratelimit import RETRYABLE, RateLimiter, backoff_delay, estimate_tokens, failure_reason, retry_after
 
 # Use a small, cheap model. You can override with env var LLM_MODEL if needed.
 _MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
 
+def _base_url() -> Optional[str]:
+    """LLM_BASE_URL: an OpenAI-compatible endpoint, e.g. python -m recon.mockllm (None: the SDK default)."""
+    return os.getenv("LLM_BASE_URL") or None
+
+# USD per million tokens for cost estimates (defaults: gpt-4o-mini list prices)
+_PRICE_INPUT = float(os.getenv("LLM_PRICE_INPUT_PER_M", "0.15"))
+_PRICE_OUTPUT = float(os.getenv("LLM_PRICE_OUTPUT_PER_M", "0.60"))
+
 # Deterministic fallback if no key / error, so app never breaks
 _FALLBACK = {
+    "IDENTIFIER_MISMATCH": ("IDENTIFIER_MISMATCH", 0.70, "Unmatched rows paired on ISIN, payment date and amounts; event key or account differs.",
+                            "Confirm the pairing; correct the event key / account mapping.", True),
     "DATE_MISMATCH": ("DATE_MISMATCH", 0.85, "Payment/Ex-date mismatch beyond tolerance.",
                       "Confirm issuer timetable; adjust event dates; re-run accrual.", True),
     "GROSS_MISMATCH": ("GROSS_MISMATCH", 0.80, "Gross differs in same currency; likely rounding or stale figure.",
@@ -52,23 +66,199 @@ _SYSTEM = (
     "needs_human: true if requires manual review, false if auto-fixable."
 )
 
+# Batched mode: several breaks per request, one JSON array back
+_SYSTEM_BATCH = _SYSTEM.replace(
+    "Return ONLY valid JSON with keys:",
+    "You receive a JSON array of breaks, each with an integer id. "
+    "Return ONLY a JSON array with one object per input break, each with keys: id (copied from the input),",
+)
+
+# _fb for MATCHED and for statuses no _FALLBACK key matches
+_FB_MATCHED = ("MATCHED", 1.0, "No discrepancies.", "None", False)
+_FB_OTHER = ("OTHER", 0.6, "Unclear break; needs review.", "Escalate to ops with evidence.", True)
+
+@functools.lru_cache(maxsize=1024)
 def _fb(status: str) -> LLMResult:
-    """Fallback classification when LLM is unavailable"""
+    """Fallback classification when LLM is unavailable (one shared instance per status; don't mutate)"""
     if status == "MATCHED":
-        return LLMResult(break_code="MATCHED", confidence=1.0,
-                         explanation_one_liner="No discrepancies.",
-                         proposed_action="None", needs_human=False)
-    
-    # Find first matching break type in status
-    for k, v in _FALLBACK.items():
-        if k in status:
-            code, conf, expl, action, need = v
-            return LLMResult(break_code=code, confidence=conf,
-                             explanation_one_liner=expl, proposed_action=action, needs_human=need)
-    
-    return LLMResult(break_code="OTHER", confidence=0.6,
-                     explanation_one_liner="Unclear break; needs review.",
-                     proposed_action="Escalate to ops with evidence.", needs_human=True)
+        v = _FB_MATCHED
+    else:
+        # First matching break type in status
+        v = next((v for k, v in _FALLBACK.items() if k in status), _FB_OTHER)
+    code, conf, expl, action, need = v
+    return LLMResult(break_code=code, confidence=conf,
+                     explanation_one_liner=expl, proposed_action=action, needs_human=need)
+
+def fallback_columns(status: pd.Series) -> pd.DataFrame:
+    """
+    _fb for a whole RECON_STATUS column, as LLMResult field columns on status's index.
+
+    Statuses are factorized; the distinct values are matched against the _FALLBACK keys
+    with vectorized substring checks, in reverse so the first matching key wins as in
+    _fb, and every column is gathered from a small lookup table by integer codes.
+    No per-row dicts or LLMResult objects are built.
+    """
+    codes, uniques = pd.factorize(status.astype(str))
+    uniques = pd.Series(uniques, dtype=object)
+    table = [_FB_MATCHED, *_FALLBACK.values(), _FB_OTHER]
+    pick = np.full(len(uniques), len(table) - 1, dtype=np.intp)
+    for j in range(len(_FALLBACK), 0, -1):
+        pick[uniques.str.contains(list(_FALLBACK)[j - 1], regex=False).to_numpy(bool)] = j
+    pick[(uniques == "MATCHED").to_numpy(bool)] = 0
+    rows = pick[codes]
+    return pd.DataFrame(
+        {name: np.asarray([t[f] for t in table], dtype=dtype)[rows]
+         for f, (name, dtype) in enumerate(zip(LLMResult.model_fields, (object, float, object, object, bool)))},
+        index=status.index,
+    )
+
+# Columns added to a report by classify_report
+LLM_COLUMNS = [*LLMResult.model_fields, "llm_source", "llm_group"]
+
+# One pooled keep-alive client per API key and endpoint, reused across calls
+_CLIENTS: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+
+def _client(api_key: str) -> OpenAI:
+    key = (api_key, _base_url())
+    if key not in _CLIENTS:
+        _CLIENTS[key] = OpenAI(api_key=api_key, base_url=key[1])
+    return _CLIENTS[key]
+
+# Async clients are bound to the event loop that opened their connections, so the
+# pool is per thread: one long-lived loop (for classify_breaks) and one client per
+# API key and endpoint on it, kept open across calls until close_thread_clients().
+_ASYNC = threading.local()
+
+def _loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_ASYNC, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _ASYNC.loop = asyncio.new_event_loop()
+        _ASYNC.clients = {}
+    return loop
+
+def _new_async_client(api_key: str) -> AsyncOpenAI:
+    # The SDK's own retries are off: the limiter has to see every 429 to adapt
+    return AsyncOpenAI(api_key=api_key, base_url=_base_url(), max_retries=0)
+
+@contextlib.asynccontextmanager
+async def _async_client(api_key: str):
+    """
+    This thread's pooled client when running on its _loop(); on any other loop
+    (a caller's own asyncio.run) a client scoped to the call.
+    """
+    if getattr(_ASYNC, "loop", None) is not asyncio.get_running_loop():
+        async with _new_async_client(api_key) as client:
+            yield client
+        return
+    key = (api_key, _base_url())
+    client = _ASYNC.clients.get(key)
+    if not isinstance(client, AsyncOpenAI):
+        if client is not None:
+            await client.__aexit__(None, None, None)
+        client = _ASYNC.clients[key] = _new_async_client(api_key)
+    yield client
+
+def close_thread_clients() -> None:
+    """Close this thread's pooled async clients and its event loop; call before a worker thread ends."""
+    loop = getattr(_ASYNC, "loop", None)
+    if loop is not None and not loop.is_closed():
+        for client in _ASYNC.clients.values():
+            loop.run_until_complete(client.__aexit__(None, None, None))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+    _ASYNC.__dict__.clear()
+
+def _slim(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Only the essentials go to the LLM
+    return {k: row.get(k) for k in _KEYS_TO_SEND if k in row}
+
+_SYSTEM_HASH = hashlib.sha256(_SYSTEM.encode()).hexdigest()
+
+def cache_key(row: Dict[str, Any]) -> str:
+    """Cache key: slim payload + model + system prompt, so prompt/model changes invalidate entries."""
+    payload = json.dumps(_slim(row), default=str, sort_keys=True)
+    return hashlib.sha256(f"{_MODEL}\x00{_SYSTEM_HASH}\x00{payload}".encode()).hexdigest()
+
+def _messages(row: Dict[str, Any]) -> List[Dict[str, str]]:
+    slim = _slim(row)
+    prompt_user = (
+        "Classify this reconciliation break and propose one next action.\n"
+        "Focus on the most critical issue if multiple breaks exist.\n"
+        "Data:\n" + json.dumps(slim, default=str, indent=2)
+    )
+    return [
+        {"role": "system", "content": _SYSTEM},
+        {"role": "user", "content": prompt_user}
+    ]
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+
+    # Handle markdown code blocks
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[4:].strip()
+    return text
+
+def _parse(text: str) -> LLMResult:
+    data = json.loads(_strip_fences(text))
+
+    # Validate and construct result
+    try:
+        return LLMResult(**data)
+    except ValidationError:
+        # Map fields manually if validation fails
+        mapped = {
+            "break_code": data.get("break_code", "OTHER"),
+            "confidence": float(data.get("confidence", 0.6)),
+            "explanation_one_liner": data.get("explanation_one_liner", "Unclear break; needs review."),
+            "proposed_action": data.get("proposed_action", "Escalate to ops with evidence."),
+            "needs_human": bool(data.get("needs_human", True)),
+        }
+        return LLMResult(**mapped)
+
+def _batch_messages(rows: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    items = [{"id": i, **_slim(row)} for i, row in enumerate(rows)]
+    prompt_user = (
+        "Classify each reconciliation break and propose one next action per break.\n"
+        "Focus on the most critical issue if multiple breaks exist.\n"
+        "Data:\n" + json.dumps(items, default=str)
+    )
+    return [
+        {"role": "system", "content": _SYSTEM_BATCH},
+        {"role": "user", "content": prompt_user}
+    ]
+
+def _parse_batch(text: str, n: int) -> List[Optional[LLMResult]]:
+    """
+    Parse a JSON-array batch response into n slots (by id).
+    Each element is validated strictly on its own; bad, missing or duplicate ids stay None.
+    """
+    out: List[Optional[LLMResult]] = [None] * n
+    try:
+        data = json.loads(_strip_fences(text))
+    except ValueError:
+        return out
+    if isinstance(data, dict):
+        # Some models wrap the array, e.g. {"results": [...]}
+        data = next((v for v in data.values() if isinstance(v, list)), [])
+    if not isinstance(data, list):
+        return out
+
+    seen = set()
+    for el in data:
+        if not isinstance(el, dict):
+            continue
+        idx = el.get("id")
+        if not isinstance(idx, int) or isinstance(idx, bool) or not 0 <= idx < n or idx in seen:
+            continue
+        seen.add(idx)
+        try:
+            out[idx] = LLMResult(**{k: v for k, v in el.items() if k != "id"})
+        except (ValidationError, TypeError):
+            pass
+    return out
 
 def classify_break(row: Dict[str, Any]) -> LLMResult:
     """
@@ -83,50 +273,409 @@ def classify_break(row: Dict[str, Any]) -> LLMResult:
     if not api_key:
         return _fb(status)
 
-    # Prepare minimal data for LLM
-    slim = {k: row.get(k) for k in _KEYS_TO_SEND if k in row}
-    prompt_user = (
-        "Classify this reconciliation break and propose one next action.\n"
-        "Focus on the most critical issue if multiple breaks exist.\n"
-        "Data:\n" + json.dumps(slim, default=str, indent=2)
-    )
-
     try:
-        client = OpenAI(api_key=api_key)
-        resp = client.chat.completions.create(
+        resp = _client(api_key).chat.completions.create(
             model=_MODEL,
-            messages=[
-                {"role": "system", "content": _SYSTEM},
-                {"role": "user", "content": prompt_user}
-            ],
+            messages=_messages(row),
             temperature=0.1,
             max_tokens=200,  # Slightly increased for better explanations
         )
-        text = resp.choices[0].message.content.strip()
-        
-        # Handle markdown code blocks
-        if text.startswith("```"):
-            text = text.strip("`")
-            if text.startswith("json"):
-                text = text[4:].strip()
-        
-        data = json.loads(text)
-        
-        # Validate and construct result
-        try:
-            return LLMResult(**data)
-        except ValidationError:
-            # Map fields manually if validation fails
-            mapped = {
-                "break_code": data.get("break_code", "OTHER"),
-                "confidence": float(data.get("confidence", 0.6)),
-                "explanation_one_liner": data.get("explanation_one_liner", "Unclear break; needs review."),
-                "proposed_action": data.get("proposed_action", "Escalate to ops with evidence."),
-                "needs_human": bool(data.get("needs_human", True)),
-            }
-            return LLMResult(**mapped)
+        return _parse(resp.choices[0].message.content)
     
     except Exception as e:
         # Log error in production; for now, fallback silently
         # print(f"LLM call failed: {e}")
-        return _fb(status)
\ No newline at end of file
+        return _fb(status)
+
+def _record_usage(stats: Dict[str, Any], resp: Any, start: float, estimate: int) -> int:
+    """Add latency and token usage to stats; returns the tokens used (the estimate if the response has no usage)."""
+    stats.setdefault("latencies_ms", []).append((time.perf_counter() - start) * 1000)
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return estimate
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    stats["prompt_tokens"] = stats.get("prompt_tokens", 0) + prompt
+    stats["completion_tokens"] = stats.get("completion_tokens", 0) + completion
+    return prompt + completion
+
+def _count(stats: Dict[str, Any], name: str, reason: str, n: int = 1) -> None:
+    counts = stats.setdefault(name, {})
+    counts[reason] = counts.get(reason, 0) + n
+
+
+async def classify_breaks_async(
+    rows: Iterable[Dict[str, Any]],
+    concurrency: int = 8,
+    cache: Optional[LLMCache] = None,
+    max_calls: Optional[int] = None,
+    stats: Optional[Dict[str, int]] = None,
+    batch_size: int = 1,
+    priority: Optional[Sequence[float]] = None,
+    on_result: Optional[Callable[[int, LLMResult], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    limiter: Optional[RateLimiter] = None,
+    token_budget: Optional[int] = None,
+    max_retries: int = 3,
+) -> List[Optional[LLMResult]]:
+    """
+    Classify many breaks concurrently over one pooled async client.
+
+    - Requests go through `limiter` (default: RateLimiter(concurrency=concurrency), no
+      per-minute limits), whose concurrency cap halves on 429s and grows back on success;
+      results keep the order of `rows`.
+    - 429, 5xx and connection errors are retried up to max_retries times with jittered
+      exponential backoff (at least the server's Retry-After); retries are counted per
+      reason in stats["retries"].
+    - batch_size > 1 packs that many breaks into one request answered with a JSON
+      array; elements that are missing or fail validation fall back to _fb one by one.
+    - Each row falls back to _fb on its own if its request finally fails; stats["fallbacks"]
+      counts rows per reason (no_key, rate_limit, server_error, connection, api_error,
+      parse, error).
+    - With a cache (used only when an API key is set), hits skip the call and the budget;
+      successful live results are stored.
+    - The budget counts requests: once stats["calls"] reaches max_calls the remaining
+      rows are left as None. Pass the same `stats` dict across batches to share it.
+    - token_budget caps prompt + completion tokens: a request starts once the tokens
+      used so far plus the estimates of those in flight and its own fit, waiting for
+      in-flight requests to settle if needed. Only when the tokens used plus its own
+      estimate pass the budget are the rows it would have covered left None
+      (stats["skipped"]["token_budget"]) and its call refunded.
+    - With `priority` (one score per row), the budget goes to the highest-scoring
+      uncached rows first, picked with a heap; ties keep row order.
+    - Each completed request appends its latency to stats["latencies_ms"] and adds the
+      response's token usage to stats["prompt_tokens"] / stats["completion_tokens"];
+      stats["cost_usd"] is the running estimate_cost.
+    - on_result(i, result) is called as each row's result is known (for progress).
+    - Once `cancel` is set no further requests start (in-flight ones finish); rows they
+      would have covered stay None and their budget is given back.
+    """
+    rows = list(rows)
+    batch_size = max(1, batch_size)
+    stats = stats if stats is not None else {}
+    stats.setdefault("calls", 0)
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        cache = None
+
+    results: List[Optional[LLMResult]] = [None] * len(rows)
+
+    def settle(i: int, res: LLMResult) -> None:
+        results[i] = res
+        if on_result is not None:
+            on_result(i, res)
+
+    todo = []
+    for i, row in enumerate(rows):
+        if row.get("RECON_STATUS", "MATCHED") == "MATCHED":
+            settle(i, _fb("MATCHED"))
+            continue
+        key = None
+        if cache is not None:
+            key = cache_key(row)
+            hit = cache.get(key)
+            if hit is not None:
+                settle(i, hit)
+                continue
+        todo.append((i, key))
+
+    if priority is not None and max_calls is not None:
+        k = max(max_calls - stats["calls"], 0) * batch_size
+        if k < len(todo):
+            todo = heapq.nlargest(k, todo, key=lambda t: priority[t[0]])
+
+    # Group into requests and spend the budget one request at a time
+    requests = []
+    for start in range(0, len(todo), batch_size):
+        if max_calls is not None and stats["calls"] >= max_calls:
+            break
+        stats["calls"] += 1
+        requests.append(todo[start:start + batch_size])
+
+    def fallback(i: int) -> LLMResult:
+        return _fb(rows[i].get("RECON_STATUS", "MATCHED"))
+
+    def cancelled() -> bool:
+        if cancel is not None and cancel.is_set():
+            stats["calls"] -= 1
+            return True
+        return False
+
+    if not api_key:
+        for req in requests:
+            if cancelled():
+                continue
+            for i, _ in req:
+                settle(i, fallback(i))
+            _count(stats, "fallbacks", "no_key", len(req))
+        return results
+
+    limiter = limiter or RateLimiter(concurrency=concurrency)
+    reserved = 0  # estimated tokens of requests in flight, for token_budget
+    settled = asyncio.Event()  # set (and replaced) each time an in-flight request settles
+
+    async def admit(n_rows: int, estimate: int) -> bool:
+        """False (call refunded) if cancelled or the request can never fit token_budget."""
+        while not cancelled():
+            spent = stats.get("prompt_tokens", 0) + stats.get("completion_tokens", 0)
+            if token_budget is None or spent + reserved + estimate <= token_budget:
+                return True
+            if spent + estimate > token_budget:
+                stats["calls"] -= 1
+                _count(stats, "skipped", "token_budget", n_rows)
+                return False
+            # Fits once in-flight reservations (full max_tokens) settle to their real usage
+            await settled.wait()
+        return False
+
+    async def one(req) -> None:
+        nonlocal reserved, settled
+        batch = [rows[i] for i, _ in req]
+        max_tokens = 200 * len(batch)
+        messages = _messages(batch[0]) if batch_size == 1 else _batch_messages(batch)
+        estimate = estimate_tokens(messages, max_tokens)
+        parsed, reason = [None] * len(batch), None
+        for attempt in range(max_retries + 1):
+            epoch = await limiter.acquire(estimate)
+            if attempt == 0 and not await admit(len(req), estimate):
+                limiter.release(estimate, 0)
+                return
+            reserved += estimate
+            used = 0
+            try:
+                start = time.perf_counter()
+                resp = await client.chat.completions.create(
+                    model=_MODEL,
+                    messages=messages,
+                    temperature=0.1,
+                    max_tokens=max_tokens,
+                )
+                used = _record_usage(stats, resp, start, estimate)
+            except Exception as e:
+                reason = failure_reason(e)
+                if reason == "rate_limit":
+                    limiter.throttle(retry_after(e) or 0.0, epoch)
+                if reason in RETRYABLE and attempt < max_retries:
+                    _count(stats, "retries", reason)
+                    delay = backoff_delay(attempt, retry_after(e))
+                else:
+                    delay = None
+            else:
+                limiter.success()
+                delay = None
+                reason = None
+            finally:
+                reserved -= estimate
+                limiter.release(estimate, used)
+                settled.set()
+                settled = asyncio.Event()
+            if delay is None or (cancel is not None and cancel.is_set()):
+                break
+            await asyncio.sleep(delay)
+        if reason is None:
+            text = resp.choices[0].message.content
+            try:
+                parsed = [_parse(text)] if batch_size == 1 else _parse_batch(text, len(batch))
+            except Exception:
+                pass
+        for (i, key), res in zip(req, parsed):
+            if res is None:
+                _count(stats, "fallbacks", reason or "parse")
+                settle(i, fallback(i))
+                continue
+            settle(i, res)
+            if cache is not None:
+                cache.put(key, res)
+
+    async with _async_client(api_key) as client:
+        await asyncio.gather(*(one(req) for req in requests))
+    stats.update(limiter.snapshot())
+    stats["cost_usd"] = estimate_cost(stats)
+    return results
+
+def classify_breaks(rows: Iterable[Dict[str, Any]], concurrency: int = 8, **kwargs) -> List[Optional[LLMResult]]:
+    """Blocking wrapper around classify_breaks_async for the CLI and Streamlit app."""
+    return _loop().run_until_complete(classify_breaks_async(rows, concurrency=concurrency, **kwargs))
+
+# (delta column, base amount) pairs used for the bucketed relative deltas in a break signature
+_SIGNATURE_DELTAS = [
+    ("net_diff", "NET_AMOUNT_SETTLEMENT"),
+    ("gross_diff", "GROSS_AMOUNT_QUOTATION"),
+    ("tax_diff", "WITHHOLDING_TAX_AMOUNT_SETTLEMENT"),
+    ("fx_rel_diff", None),
+]
+
+def break_signature(breaks: pd.DataFrame, rel_bucket: float = 0.01) -> pd.Series:
+    """
+    Group id per break row: rows with the same status, currency pair, event key and
+    relative deltas in the same `rel_bucket`-wide bin share an id.
+    Ids are hashes of the signature, so they are stable across runs and stream buckets.
+    """
+    def col(name):
+        return breaks[name] if name in breaks.columns else pd.Series(np.nan, index=breaks.index)
+
+    sig = pd.DataFrame({
+        "status": col("RECON_STATUS").astype(str),
+        "settled": col("SETTLED_CURRENCY").astype(str),
+        "quotation": col("QUOTATION_CURRENCY").astype(str),
+        "event": col("COAC_EVENT_KEY").astype(str),
+    }, index=breaks.index)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for delta, base in _SIGNATURE_DELTAS:
+            d = pd.to_numeric(col(delta), errors="coerce").to_numpy(dtype=float)
+            if base is not None:
+                d = d / np.abs(pd.to_numeric(col(base), errors="coerce").to_numpy(dtype=float))
+            binned = np.floor(d / rel_bucket)
+            # NaN/inf (missing side, zero base) get their own bin
+            sig[delta] = np.where(np.isfinite(binned), binned, np.inf)
+    hashed = pd.util.hash_pandas_object(sig, index=False).to_numpy()
+    return pd.Series([f"{h:016x}" for h in hashed], index=breaks.index, dtype=object)
+
+def _portfolio_rates(report: pd.DataFrame) -> Dict[str, float]:
+    """Currency -> portfolio rate, from NBIM rows booked and settled in the same currency."""
+    cols = ["SETTLEMENT_CURRENCY", "QUOTATION_CURRENCY", "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO"]
+    if not all(c in report.columns for c in cols):
+        return {}
+    # Currency codes may be categoricals with different categories per column; compare as values
+    same = report[cols].dropna().astype({"SETTLEMENT_CURRENCY": object, "QUOTATION_CURRENCY": object})
+    same = same[same["SETTLEMENT_CURRENCY"] == same["QUOTATION_CURRENCY"]]
+    return same.groupby("SETTLEMENT_CURRENCY")["AVG_FX_RATE_QUOTATION_TO_PORTFOLIO"].median().to_dict()
+
+def break_impact(report: pd.DataFrame, rates: Optional[Dict[str, float]] = None) -> pd.Series:
+    """
+    Monetary impact per row in a common currency: |net_diff|, or |gross| for MISSING_* rows.
+
+    `rates` maps currency -> common-currency multiplier. By default the NBIM portfolio
+    currency is used, with rates taken from the report's own same-currency bookings;
+    currencies without a rate count at face value.
+    net_diff is in the settlement currency; gross is in the quotation currency, so a
+    MISSING_* row uses GROSS_AMOUNT_PORTFOLIO, else gross times the row's
+    AVG_FX_RATE_QUOTATION_TO_PORTFOLIO or the QUOTATION_CURRENCY rate. Custody-only
+    rows carry no quotation currency and count their settled net amount instead.
+    """
+    def col(name):
+        if name not in report.columns:
+            return pd.Series(np.nan, index=report.index)
+        return pd.to_numeric(report[name], errors="coerce")
+
+    rates = _portfolio_rates(report) if rates is None else rates
+    ccy = report.get("SETTLEMENT_CURRENCY", pd.Series(np.nan, index=report.index)).astype(object)
+    if "SETTLED_CURRENCY" in report.columns:
+        ccy = ccy.fillna(report["SETTLED_CURRENCY"].astype(object))
+    settle_rate = ccy.map(rates).astype(float)
+    quote_rate = col("AVG_FX_RATE_QUOTATION_TO_PORTFOLIO")
+    if "QUOTATION_CURRENCY" in report.columns:
+        quote_rate = quote_rate.fillna(report["QUOTATION_CURRENCY"].astype(object).map(rates).astype(float))
+
+    gross = col("GROSS_AMOUNT").fillna(col("GROSS_AMOUNT_QUOTATION")).abs()
+    net_settled = col("NET_AMOUNT_SC").fillna(col("NET_AMOUNT_SETTLEMENT")).abs()
+    missing_value = (
+        col("GROSS_AMOUNT_PORTFOLIO").abs()
+        .fillna(gross * quote_rate)
+        .fillna(net_settled * settle_rate)
+        .fillna(gross)
+    )
+    status = report["RECON_STATUS"].astype(str)
+    missing = status.str.startswith("MISSING_")
+    impact = (col("net_diff").abs() * settle_rate.fillna(1.0)).where(~missing, missing_value)
+    return impact.fillna(0.0)
+
+def _plan(
+    report: pd.DataFrame,
+    max_calls: int,
+    stats: Dict[str, int],
+    cache: Optional[LLMCache],
+    batch_size: int,
+    dedupe: bool,
+) -> Tuple[pd.Index, np.ndarray, Optional[pd.Series]]:
+    """Rows to send (one representative per group with dedupe), their priority and the groups."""
+    breaks = report.index[report["RECON_STATUS"] != "MATCHED"]
+
+    impact = break_impact(report.loc[breaks])
+
+    groups = break_signature(report.loc[breaks]) if dedupe else None
+    if groups is None:
+        targets = breaks
+    else:
+        targets = groups.drop_duplicates().index
+        impact = impact.groupby(groups).transform("sum")
+    priority = impact.loc[targets].to_numpy()
+
+    if cache is None or not os.getenv("OPENAI_API_KEY"):
+        # Without a cache every target needs a request; only the top of the remaining budget can be classified
+        k = max(max_calls - stats["calls"], 0) * max(1, batch_size)
+        if k < len(targets):
+            keep = sorted(heapq.nlargest(k, range(len(targets)), key=priority.__getitem__))
+            targets, priority = targets[keep], priority[keep]
+    return targets, priority, groups
+
+
+def _attach(
+    report: pd.DataFrame,
+    targets: pd.Index,
+    results: Sequence[Optional[LLMResult]],
+    groups: Optional[pd.Series],
+) -> pd.DataFrame:
+    """The report with LLM_COLUMNS from the targets' results (None = not classified), fanned out to groups."""
+    done = [(i, r.model_dump()) for i, r in zip(targets, results) if r is not None]
+    llm_cols = pd.DataFrame([d for _, d in done], index=pd.Index([i for i, _ in done], dtype=report.index.dtype))
+    return _attach_columns(report, llm_cols, groups)
+
+
+def _attach_columns(report: pd.DataFrame, llm_cols: pd.DataFrame, groups: Optional[pd.Series]) -> pd.DataFrame:
+    """Join LLMResult field columns (indexed by classified targets) onto report, fanned out to groups."""
+    llm_cols["llm_source"] = "live" if os.getenv("OPENAI_API_KEY") else "fallback"
+
+    if groups is not None:
+        # Fan each representative's result out to its whole group
+        by_group = llm_cols.set_axis(groups.loc[llm_cols.index].to_numpy())
+        members = groups[groups.isin(by_group.index)]
+        llm_cols = by_group.reindex(members.to_numpy()).set_axis(members.index)
+        llm_cols["llm_group"] = members
+
+    report = report.join(llm_cols)
+    # Same columns whether or not this frame had any breaks
+    return report.reindex(columns=[*report.columns, *(c for c in LLM_COLUMNS if c not in report.columns)])
+
+
+def classify_report(
+    report: pd.DataFrame,
+    max_calls: int,
+    concurrency: int = 8,
+    cache: Optional[LLMCache] = None,
+    stats: Optional[Dict[str, int]] = None,
+    batch_size: int = 1,
+    dedupe: bool = True,
+    limiter: Optional[RateLimiter] = None,
+    token_budget: Optional[int] = None,
+    max_retries: int = 3,
+) -> pd.DataFrame:
+    """
+    Add LLM_COLUMNS to a reconcile() report, classifying only break rows.
+
+    With dedupe, breaks are grouped by break_signature and only one representative
+    per group is classified; its result is copied to every member and llm_group
+    records the group. Pass the same `stats` dict (and limiter) across calls to
+    share max_calls, token_budget and the rate limits; see classify_breaks_async.
+    recon.jobs.ClassifyJob runs the same steps on a background thread.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("calls", 0)
+    targets, priority, groups = _plan(report, max_calls, stats, cache, batch_size, dedupe)
+    if not os.getenv("OPENAI_API_KEY"):
+        # Every target falls back: bulk lookup, budget charged per request as classify_breaks would
+        stats["calls"] += -(-len(targets) // max(1, batch_size))
+        if len(targets):
+            _count(stats, "fallbacks", "no_key", len(targets))
+        return _attach_columns(report, fallback_columns(report.loc[targets, "RECON_STATUS"]), groups)
+    results = classify_breaks(
+        report.loc[targets].to_dict("records"), concurrency=concurrency,
+        cache=cache, max_calls=max_calls, stats=stats, batch_size=batch_size,
+        priority=priority, limiter=limiter, token_budget=token_budget, max_retries=max_retries,
+    )
+    return _attach(report, targets, results, groups)
+
+
+def estimate_cost(stats: Dict[str, Any]) -> float:
+    """USD spent so far by the token counts in stats (LLM_PRICE_INPUT_PER_M / LLM_PRICE_OUTPUT_PER_M)."""
+    return (stats.get("prompt_tokens", 0) * _PRICE_INPUT + stats.get("completion_tokens", 0) * _PRICE_OUTPUT) / 1e6
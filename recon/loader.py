@@ -0,0 +1,219 @@
+# recon/loader.py
+"""
+Typed, column-pruned loading of the NBIM and custodian feeds.
+
+Each layout has a declared schema: only the columns that reconcile() reports
+or checks (and the LLM payload sends) are read, join identifiers come in as
+strings, low-cardinality values (currencies, custodian, instrument names,
+dates) as categoricals and amounts as float64. Dates stay text here;
+recon.rules.to_date parses each category once. Files
+may carry a UTF-8 BOM on the first header. When pyarrow is installed the
+multithreaded pyarrow.csv reader parses the file straight into the declared
+Arrow types (dictionary columns become categoricals without a pandas pass);
+otherwise pandas' C reader is used with the same dtypes.
+
+Parquet and Arrow IPC (Feather) feeds are picked by file extension and read
+through pyarrow with the same column pruning; their columns are cast to the
+declared types, except that typed date/timestamp columns stay dates. Arrow IPC
+files given as paths are memory-mapped. write_report writes the report as CSV,
+Parquet or Arrow IPC, optionally hive-partitioned on one column.
+
+Columns missing from a file are simply absent from the frame, like before;
+the rules engine treats them as empty.
+"""
+from __future__ import annotations
+import io
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, IO, Iterator, Optional, Union
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as pads
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = pacsv = pads = pq = None
+
+Source = Union[str, Path, IO[bytes]]
+
+SEP = ";"
+ENCODING = "utf-8-sig"  # strips the BOM some exports put before the first header
+
+_ID = "str"
+_CODE = "category"
+_NUM = "float64"
+
+NBIM_SCHEMA: Dict[str, str] = {
+    "COAC_EVENT_KEY": _ID,
+    "ISIN": _ID,
+    "BANK_ACCOUNT": _ID,
+    "INSTRUMENT_DESCRIPTION": _CODE,
+    "TICKER": _CODE,
+    "EXDATE": _CODE,
+    "PAYMENT_DATE": _CODE,
+    "QUOTATION_CURRENCY": _CODE,
+    "SETTLEMENT_CURRENCY": _CODE,
+    "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO": _NUM,
+    "NOMINAL_BASIS": _NUM,
+    "GROSS_AMOUNT_QUOTATION": _NUM,
+    "NET_AMOUNT_SETTLEMENT": _NUM,
+    "WTHTAX_COST_QUOTATION": _NUM,
+    "WTHTAX_COST_SETTLEMENT": _NUM,
+}
+
+CUSTODY_SCHEMA: Dict[str, str] = {
+    "COAC_EVENT_KEY": _ID,
+    "ISIN": _ID,
+    "CUSTODY": _ID,
+    "BANK_ACCOUNT": _ID,  # files already using the normalized name
+    "CUSTODIAN": _CODE,
+    "EVENT_EX_DATE": _CODE,
+    "EVENT_PAYMENT_DATE": _CODE,
+    "NOMINAL_BASIS": _NUM,
+    "HOLDING_QUANTITY": _NUM,
+    "TAX_RATE": _NUM,
+    "GROSS_AMOUNT": _NUM,
+    "NET_AMOUNT_SC": _NUM,
+    "TAX": _NUM,
+    "SETTLED_CURRENCY": _CODE,
+    "FX_RATE": _NUM,
+    "ADR_FEE": _NUM,
+}
+
+
+_FORMATS = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+
+def file_format(src: Source) -> str:
+    """'parquet', 'arrow' or 'csv' from the extension of a path or an upload's name (csv if unknown)."""
+    name = src if isinstance(src, (str, Path)) else getattr(src, "name", "")
+    return _FORMATS.get(Path(str(name)).suffix.lower(), "csv")
+
+
+def _require_pyarrow(fmt: str) -> None:
+    if pa is None:
+        raise ImportError(f"{fmt} files need pyarrow (pip install pyarrow)")
+
+
+def _header(src: Source) -> list:
+    header = pd.read_csv(src, sep=SEP, nrows=0, encoding=ENCODING).columns
+    if hasattr(src, "seek"):
+        src.seek(0)
+    return [c.lstrip("\ufeff") for c in header]
+
+
+def _read_args(src: Source, schema: Dict[str, str]) -> dict:
+    usecols = [c for c in _header(src) if c in schema]
+    return {"sep": SEP, "encoding": ENCODING, "usecols": usecols, "dtype": {c: schema[c] for c in usecols}}
+
+
+def _arrow_type(dtype: str):
+    return {_ID: pa.string(), _CODE: pa.dictionary(pa.int32(), pa.string()), _NUM: pa.float64()}[dtype]
+
+
+def _cast_column(col, dtype: str):
+    if dtype == _CODE and pa.types.is_temporal(col.type):
+        return col  # already a date; to_date passes it through
+    if dtype == _ID and pa.types.is_floating(col.type):
+        try:
+            col = col.cast(pa.int64())  # float IDs (an int column with gaps) read as "950123456", not "950123456.0"
+        except pa.ArrowInvalid:
+            pass
+    return col.cast(_arrow_type(dtype))
+
+
+def _read_columnar(src: Source, schema: Dict[str, str], fmt: str) -> pd.DataFrame:
+    _require_pyarrow(fmt)
+    if fmt == "parquet":
+        names = pq.read_schema(src).names
+        if hasattr(src, "seek"):
+            src.seek(0)
+        table = pq.read_table(src, columns=[c for c in names if c in schema])
+    else:
+        # Paths are memory-mapped, so the pruned columns are the only ones paged in
+        source = pa.memory_map(str(src)) if isinstance(src, (str, Path)) else src
+        table = pa.ipc.open_file(source).read_all()
+        table = table.select([c for c in table.column_names if c in schema])
+    table = pa.table({c: _cast_column(table.column(c), schema[c]) for c in table.column_names})
+    return table.to_pandas(date_as_object=False)
+
+
+def read_feed(src: Source, schema: Dict[str, str]) -> pd.DataFrame:
+    """Read one feed (path or binary file object) with the given schema; semicolon CSV unless the name says Parquet/Arrow."""
+    if hasattr(src, "read") and not hasattr(src, "seek"):
+        src = io.BytesIO(src.read())
+    fmt = file_format(src)
+    if fmt != "csv":
+        return _read_columnar(src, schema, fmt)
+    args = _read_args(src, schema)
+    if pacsv is None:
+        return pd.read_csv(src, **args)
+
+    table = pacsv.read_csv(
+        src,
+        read_options=pacsv.ReadOptions(encoding="utf8"),  # BOM is skipped
+        parse_options=pacsv.ParseOptions(delimiter=SEP),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=args["usecols"],
+            column_types={c: _arrow_type(t) for c, t in args["dtype"].items()},
+            strings_can_be_null=True,  # empty fields are missing, as in pandas
+        ),
+    )
+    return table.to_pandas()
+
+
+def read_feed_chunks(src: Source, schema: Dict[str, str], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Same schema as read_feed, in chunks (pyarrow.csv can't chunk by rows, so this uses the C reader)."""
+    return pd.read_csv(src, chunksize=chunk_rows, **_read_args(src, schema))
+
+
+def read_nbim(src: Source) -> pd.DataFrame:
+    return read_feed(src, NBIM_SCHEMA)
+
+
+def read_custody(src: Source) -> pd.DataFrame:
+    return read_feed(src, CUSTODY_SCHEMA)
+
+
+def write_report(report: pd.DataFrame, path: Union[str, Path], partition_by: Optional[str] = None) -> None:
+    """
+    Write the report in the format of path's extension (CSV otherwise).
+
+    - Parquet and Arrow IPC keep the column types (categoricals, floats, dates).
+    - partition_by names a report column; path then becomes a directory of
+      hive-style partitions (e.g. RECON_STATUS=MATCHED/part-0.parquet), so a
+      reader can load one status or custodian without scanning the rest.
+      Only for Parquet/Arrow. The partitions are written to a temporary
+      sibling directory that then replaces whatever was at path, so no
+      partition of an earlier report survives.
+    """
+    fmt = file_format(path)
+    if fmt == "csv":
+        if partition_by is not None:
+            raise ValueError("partitioned output needs a .parquet or .arrow path")
+        report.to_csv(path, index=False)
+        return
+
+    _require_pyarrow(fmt)
+    table = pa.Table.from_pandas(report, preserve_index=False)
+    if partition_by is not None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        pads.write_dataset(
+            table, tmp, format="parquet" if fmt == "parquet" else "ipc",
+            partitioning=[partition_by], partitioning_flavor="hive",
+        )
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+        os.replace(tmp, path)
+    elif fmt == "parquet":
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
@@ -0,0 +1,142 @@
+# recon/metrics.py
+"""
+Per-stage timing, memory and throughput instrumentation.
+
+    metrics = Metrics()
+    with metrics.stage("load") as st:
+        df = pd.read_csv(...)
+        st.rows_out = len(df)
+    metrics.to_json("metrics.json")
+
+Stages with the same name accumulate (e.g. once per stream bucket). A
+disabled Metrics hands out one shared no-op stage, so instrumented code costs
+next to nothing when --metrics isn't set.
+
+Memory is the process peak RSS (high-water mark) at the end of each stage
+and how much that peak grew during the stage, which points at the stage
+that drove the run's peak.
+"""
+from __future__ import annotations
+import json
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+
+# LLM latency histogram bucket upper bounds (ms)
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf")]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _NullStage:
+    rows_out: Optional[int] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, metrics: "Metrics", name: str, rows_in: Optional[int]):
+        self.metrics = metrics
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+
+    def __enter__(self):
+        self._peak0 = peak_rss_mb()
+        self._cpu0 = time.process_time()
+        self._wall0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._wall0
+        cpu = time.process_time() - self._cpu0
+        peak = peak_rss_mb()
+
+        rec = self.metrics.stages.setdefault(self.name, {
+            "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows_in": 0, "rows_out": 0,
+            "peak_rss_mb": 0.0, "peak_rss_growth_mb": 0.0,
+        })
+        rec["calls"] += 1
+        rec["wall_s"] += wall
+        rec["cpu_s"] += cpu
+        rec["rows_in"] += self.rows_in or 0
+        rec["rows_out"] += self.rows_out if self.rows_out is not None else (self.rows_in or 0)
+        rec["peak_rss_mb"] = max(rec["peak_rss_mb"], peak)
+        rec["peak_rss_growth_mb"] += peak - self._peak0
+        return False
+
+
+class Metrics:
+    """Collects stage records and LLM call statistics for one run."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.llm: Dict[str, Any] = {}
+        self.dates: Dict[str, int] = {}  # filled by recon.rules.to_date (fallback / coerced counts)
+        self.join: Dict[str, Any] = {}  # filled by recon.rules._merge_feeds (key coercions, null keys)
+
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows_in)
+
+    def record_llm(self, stats: Dict[str, Any]) -> None:
+        """Summarize the stats dict filled by recon.llm (calls, latencies, tokens, cost, retries, fallbacks)."""
+        if not self.enabled:
+            return
+        latencies = np.asarray(stats.get("latencies_ms", []), dtype=float)
+        counts, _ = np.histogram(latencies, bins=[0, *LATENCY_BUCKETS_MS])
+        self.llm = {
+            "requests": int(stats.get("calls", 0)),
+            "prompt_tokens": int(stats.get("prompt_tokens", 0)),
+            "completion_tokens": int(stats.get("completion_tokens", 0)),
+            "cost_usd": float(stats.get("cost_usd", 0.0)),
+            "retries": dict(stats.get("retries", {})),
+            "fallbacks": dict(stats.get("fallbacks", {})),
+            "skipped": dict(stats.get("skipped", {})),
+            "throttled": int(stats.get("throttled", 0)),
+            "latency_ms": {
+                "count": int(latencies.size),
+                "p50": float(np.percentile(latencies, 50)) if latencies.size else None,
+                "p90": float(np.percentile(latencies, 90)) if latencies.size else None,
+                "p99": float(np.percentile(latencies, 99)) if latencies.size else None,
+                "max": float(latencies.max()) if latencies.size else None,
+                "histogram": {
+                    (f"<={b:g}" if np.isfinite(b) else f">{LATENCY_BUCKETS_MS[-2]:g}"): int(c)
+                    for b, c in zip(LATENCY_BUCKETS_MS, counts)
+                },
+            },
+        }
+
+    def report(self) -> Dict[str, Any]:
+        stages = {}
+        for name, rec in self.stages.items():
+            out = {k: round(v, 4) if isinstance(v, float) else v for k, v in rec.items()}
+            out["rows_per_s"] = round(rec["rows_in"] / rec["wall_s"], 1) if rec["wall_s"] > 0 else None
+            stages[name] = out
+        return {"stages": stages, "dates": self.dates, "join": self.join, "llm": self.llm}
+
+    def to_json(self, path: Union[str, Path]) -> None:
+        Path(path).write_text(json.dumps(self.report(), indent=2))
+
+    def table(self) -> List[Dict[str, Any]]:
+        """Stage records as rows, for display."""
+        return [{"stage": name, **rec} for name, rec in self.report()["stages"].items()]
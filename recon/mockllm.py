@@ -0,0 +1,266 @@
+# recon/mockllm.py
+"""
+Local stand-in for the OpenAI chat-completions endpoint, for offline load tests.
+
+Answers POST /v1/chat/completions with schema-valid LLMResult JSON: the
+break_code is the first known code in the prompt's RECON_STATUS, and batched
+prompts (a JSON array of breaks with ids) get a JSON array back. Usage is
+reported at about 4 characters per token. Faults are injected per request:
+
+- latency: fixed:MS | uniform:LO,HI | lognormal:MEDIAN_MS,SIGMA | exp:MEAN_MS
+- rate_429: share of requests answered 429 with a retry-after-ms header
+- max_concurrent: requests beyond this many in flight are answered 429, like a
+  quota under load (this is what the client's adaptive concurrency tracks)
+- error_rate: share answered 500 / 503
+- malformed_rate: share whose content is cut-off JSON
+- fenced_rate: share wrapped in a ```json markdown fence (valid once stripped)
+
+Point recon.llm at it with LLM_BASE_URL (any OPENAI_API_KEY value works):
+
+    python -m recon.mockllm --port 8808 --latency lognormal:200,0.5 --rate-429 0.02
+    LLM_BASE_URL=http://127.0.0.1:8808/v1 OPENAI_API_KEY=mock recon --nbim ... --use-llm
+
+The server is a stdlib ThreadingHTTPServer (one thread per keep-alive
+connection), so it runs wherever recon does.
+"""
+from __future__ import annotations
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, get_args
+from .schemas import BreakCode
+
+_CODES = [c for c in get_args(BreakCode) if c not in ("MATCHED", "OTHER")]
+_STATUS = re.compile(r'"RECON_STATUS":\s*"([^"]*)"')
+
+
+def latency_sampler(spec: str) -> Callable[[random.Random], float]:
+    """Seconds-per-request sampler from a spec like "lognormal:200,0.5" (milliseconds)."""
+    kind, _, args = spec.partition(":")
+    try:
+        params = [float(a) for a in args.split(",")] if args else []
+        if kind == "fixed" and len(params) == 1:
+            return lambda rng: params[0] / 1000
+        if kind == "uniform" and len(params) == 2:
+            return lambda rng: rng.uniform(params[0], params[1]) / 1000
+        if kind == "lognormal" and len(params) == 2:
+            mu = math.log(max(params[0], 1e-9))  # the median is exp(mu)
+            return lambda rng: rng.lognormvariate(mu, params[1]) / 1000
+        if kind == "exp" and len(params) == 1:
+            return lambda rng: rng.expovariate(1 / params[0]) / 1000 if params[0] > 0 else 0.0
+    except ValueError:
+        pass
+    raise ValueError(f"bad latency spec {spec!r}; use fixed:MS, uniform:LO,HI, lognormal:MEDIAN,SIGMA or exp:MEAN")
+
+
+def _classification(status: str, rng: random.Random) -> Dict[str, Any]:
+    code = next((c for c in _CODES if c in status), "OTHER")
+    return {
+        "break_code": code,
+        "confidence": round(rng.uniform(0.5, 0.95), 2),
+        "explanation_one_liner": f"Mock analysis: {code.lower().replace('_', ' ')}.",
+        "proposed_action": "Review the booking against the custodian statement.",
+        "needs_human": rng.random() < 0.5,
+    }
+
+
+def _answer(messages: List[Dict[str, str]], rng: random.Random) -> str:
+    """JSON content for the prompt: one object, or an array with ids for a batch."""
+    data = messages[-1].get("content", "").split("Data:\n", 1)[-1]
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        payload = None
+    if isinstance(payload, list):
+        return json.dumps([
+            {"id": item.get("id"), **_classification(str(item.get("RECON_STATUS", "")), rng)}
+            for item in payload if isinstance(item, dict)
+        ])
+    match = _STATUS.search(data)
+    return json.dumps(_classification(match.group(1) if match else "", rng))
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default listen backlog of 5 drops connections under load
+
+
+class MockLLMServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: str = "fixed:0",
+        rate_429: float = 0.0,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        fenced_rate: float = 0.0,
+        max_concurrent: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        """port 0 picks a free port; see url. Fault rates are per request, drawn independently."""
+        self.latency = latency_sampler(latency)
+        self.rate_429 = rate_429
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.fenced_rate = fenced_rate
+        self.max_concurrent = max_concurrent
+        self.counts: Dict[str, int] = {}
+        self._in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._httpd = _Server((host, port), self._handler())
+
+    @property
+    def url(self) -> str:
+        """Base URL for LLM_BASE_URL."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _draw(self) -> tuple:
+        # One lock-protected draw per request keeps runs reproducible under a seed
+        with self._lock:
+            rng = random.Random(self._rng.random())
+        return rng, rng.random()
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    def respond(self, body: Dict[str, Any]) -> tuple:
+        """(status, headers, response body) for one chat-completions request."""
+        with self._lock:
+            self._in_flight += 1
+            overloaded = self.max_concurrent is not None and self._in_flight > self.max_concurrent
+        try:
+            return self._respond(body, overloaded)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _respond(self, body: Dict[str, Any], overloaded: bool) -> tuple:
+        rng, roll = self._draw()
+        time.sleep(self.latency(rng))
+        if overloaded or roll < self.rate_429:
+            self._count("rate_limit")
+            error = {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}
+            return 429, {"retry-after-ms": str(rng.randint(50, 500))}, {"error": error}
+        roll -= self.rate_429
+        if roll < self.error_rate:
+            self._count("server_error")
+            status = rng.choice([500, 503])
+            return status, {}, {"error": {"message": "Mock server error", "type": "server_error", "code": None}}
+
+        messages = body.get("messages") or []
+        content = _answer(messages, rng)
+        if rng.random() < self.malformed_rate:
+            self._count("malformed")
+            content = content[: max(1, len(content) // 2)]
+        elif rng.random() < self.fenced_rate:
+            self._count("fenced")
+            content = f"```json\n{content}\n```"
+        else:
+            self._count("ok")
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4 + 4 * len(messages)
+        completion_tokens = len(content) // 4
+        return 200, {}, {
+            "id": f"chatcmpl-mock-{rng.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    status, headers, payload = 404, {}, {"error": {"message": f"no route {self.path}", "type": "invalid_request_error"}}
+                else:
+                    status, headers, payload = server.respond(body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self) -> None:
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def start(self) -> "MockLLMServer":
+        """Serve on a daemon thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI chat-completions endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808, help="0 picks a free port")
+    parser.add_argument("--latency", default="lognormal:200,0.5",
+                        help="fixed:MS | uniform:LO,HI | lognormal:MEDIAN,SIGMA | exp:MEAN (milliseconds)")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 500/503 responses")
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--fenced-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrent", type=int, default=None, help="429 requests beyond this many in flight")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        args.host, args.port, latency=args.latency, rate_429=args.rate_429, error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate, fenced_rate=args.fenced_rate,
+        max_concurrent=args.max_concurrent, seed=args.seed,
+    )
+    print(f"Serving mock LLM on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
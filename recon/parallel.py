@@ -0,0 +1,125 @@
+# recon/parallel.py
+"""
+Multi-core reconciliation.
+
+Every rule only looks at rows sharing one join key (COAC_EVENT_KEY, ISIN,
+BANK_ACCOUNT), so both feeds are split by a hash of that key and each
+partition is normalized, merged and classified in its own process.
+
+Partitions travel through Arrow IPC (Feather) files that workers memory-map,
+rather than pickled DataFrames through the pool's pipes. Without pyarrow the
+same files are written as pickles, which is slower but keeps the API working.
+"""
+from __future__ import annotations
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+import pandas as pd
+from .rules import JOIN_KEYS, pair_orphans, reconcile
+from .stream import partition_keys
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow is optional
+    feather = None
+
+
+def _write_part(df: pd.DataFrame, path: Path) -> Path:
+    df = df.reset_index(drop=True)
+    if feather is not None:
+        try:
+            out = path.with_suffix(".arrow")
+            feather.write_feather(df, out, compression="uncompressed")
+            return out
+        except (TypeError, ValueError, ArithmeticError):
+            # Mixed-type object columns can't become Arrow arrays; fall through to pickle
+            pass
+    out = path.with_suffix(".pkl")
+    df.to_pickle(out)
+    return out
+
+
+def _read_part(path: Path) -> pd.DataFrame:
+    if path.suffix == ".arrow":
+        # Uncompressed IPC + memory_map: column buffers are mapped, not copied through a pipe
+        return feather.read_table(path, memory_map=True).to_pandas()
+    return pd.read_pickle(path)
+
+
+def _reconcile_partition(
+    nbim_path: Path, cust_path: Path, out_path: Path, duplicates: str, nbim_normalized: bool = False,
+) -> Dict[str, Path]:
+    """Reconcile one partition; returns the report part and any duplicate-key diagnostics parts."""
+    diagnostics: dict = {}
+    # Orphans are paired across partitions afterwards
+    report = reconcile(
+        _read_part(nbim_path), _read_part(cust_path),
+        duplicates=duplicates, diagnostics=diagnostics, match_orphans=False, nbim_normalized=nbim_normalized,
+    )
+    parts = {"report": _write_part(report, out_path)}
+    for name, frames in diagnostics.items():
+        # The side table is indexed by the join key; keep the key as columns on disk
+        frame = pd.concat(frames).reset_index() if name == "side_table" else pd.concat(frames)
+        parts[name] = _write_part(frame, out_path.with_name(f"{out_path.name}_{name}"))
+    return parts
+
+
+def reconcile_parallel(
+    nbim: pd.DataFrame,
+    cust: pd.DataFrame,
+    workers: Optional[int] = None,
+    duplicates: str = "fail",
+    diagnostics: Optional[dict] = None,
+    match_orphans: bool = True,
+    nbim_normalized: bool = False,
+) -> pd.DataFrame:
+    """
+    Same report as reconcile(nbim, cust), computed across `workers` processes.
+
+    Partitions are concatenated in partition order and then stably sorted on the
+    join key, so the row order is deterministic and matches the in-memory path.
+    All rows of a key share a partition, so `duplicates` behaves as in memory;
+    `diagnostics` gets each partition's duplicate keys and side table.
+    Orphan pairs usually sit in different partitions, so pair_orphans runs once
+    on the combined report. nbim_normalized is passed to reconcile() as is.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        return reconcile(
+            nbim, cust, duplicates=duplicates, diagnostics=diagnostics,
+            match_orphans=match_orphans, nbim_normalized=nbim_normalized,
+        )
+
+    nbim_ids = partition_keys(nbim, workers).to_numpy()
+    cust_ids = partition_keys(cust, workers).to_numpy()
+
+    with tempfile.TemporaryDirectory(prefix="recon_parallel_") as tmp:
+        tmp = Path(tmp)
+        jobs = [
+            (
+                _write_part(nbim[nbim_ids == p], tmp / f"nbim_{p}"),
+                _write_part(cust[cust_ids == p], tmp / f"cust_{p}"),
+                tmp / f"out_{p}",
+                duplicates,
+                nbim_normalized,
+            )
+            for p in range(workers)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outs = list(pool.map(_reconcile_partition, *zip(*jobs)))
+        report = pd.concat([_read_part(o["report"]) for o in outs], ignore_index=True)
+        if diagnostics is not None:
+            for o in outs:
+                if "duplicate_keys" in o:
+                    diagnostics.setdefault("duplicate_keys", []).append(_read_part(o["duplicate_keys"]))
+                if "side_table" in o:
+                    diagnostics.setdefault("side_table", []).append(_read_part(o["side_table"]).set_index(JOIN_KEYS))
+
+    try:
+        report = report.sort_values(JOIN_KEYS, kind="stable", ignore_index=True)
+    except TypeError:
+        # Mixed key types aren't orderable; partition order is still deterministic
+        pass
+    return pair_orphans(report) if match_orphans else report
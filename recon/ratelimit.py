@@ -0,0 +1,180 @@
+# recon/ratelimit.py
+"""
+Client-side rate limiting for LLM requests.
+
+RateLimiter combines three limits for the requests of one classify run:
+- token buckets for requests/min and tokens/min (the two quotas the API
+  enforces). Each request reserves its estimated tokens up front; once the
+  response reports real usage the difference is settled with the bucket.
+- an adaptive concurrency cap (AIMD): it halves when a request is throttled
+  (once per window of requests) and grows by one after a run of successes,
+  up to the configured maximum.
+- a shared pause: a 429's Retry-After (or the backoff delay) holds back every
+  request, not only the one that was throttled.
+
+The limiter keeps no asyncio primitives between calls (waiters are per-call
+futures), so one instance is not tied to an event loop: it can be shared by
+successive classify calls, e.g. across the partitions of a --stream run, whether
+they run on classify_breaks' per-thread loop or on a caller's own loop.
+"""
+from __future__ import annotations
+import asyncio
+import collections
+import random
+import time
+from typing import Any, Optional
+
+# Backoff between retries: full jitter over an exponential ceiling (seconds)
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously, holding at most `burst` (default: one minute's worth)."""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take amount now (the level may go negative); seconds until it is covered."""
+        self._refill()
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def settle(self, amount: float) -> None:
+        """Give back (positive) or take (negative) units after the fact."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Seconds before retry number `attempt` (0-based); never less than the server's Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """The Retry-After header of an API error, in seconds, if it sent one."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after-ms")) / 1000 if "retry-after-ms" in headers else float(headers["retry-after"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def failure_reason(exc: BaseException) -> str:
+    """rate_limit / server_error / connection (retried) or api_error / error (not retried)."""
+    status = getattr(exc, "status_code", None)
+    if status == 429:
+        return "rate_limit"
+    if isinstance(status, int) and status >= 500:
+        return "server_error"
+    if status is not None:
+        return "api_error"
+    if isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or type(exc).__name__ in (
+        "APIConnectionError", "APITimeoutError",
+    ):
+        return "connection"
+    return "error"
+
+
+RETRYABLE = {"rate_limit", "server_error", "connection"}
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        concurrency: int = 8,
+        min_concurrency: int = 1,
+    ):
+        """rpm / tpm: requests and tokens per minute (None: unlimited); concurrency: the cap's ceiling."""
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max(1, concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self.throttled = 0
+        self._ok = 0
+        self._epoch = 0
+        self._paused_until = 0.0
+        self._waiters: collections.deque = collections.deque()
+
+    async def acquire(self, tokens: int) -> int:
+        """
+        Wait for a concurrency slot, then for the buckets and any pause; reserves `tokens`.
+        Returns the current decrease epoch, to pass to throttle() if the request is throttled.
+        """
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+        wait = self._paused_until - time.monotonic()
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return self._epoch
+
+    def release(self, reserved: int, used: int) -> None:
+        """Free the slot and settle the token bucket with the tokens the request really used."""
+        self.in_flight -= 1
+        if self.tokens is not None:
+            self.tokens.settle(reserved - used)
+        self._wake()
+
+    def success(self) -> None:
+        """Additive increase: one more slot after `limit` successes in a row."""
+        self._ok += 1
+        if self.limit < self.max_concurrency and self._ok >= self.limit:
+            self.limit += 1
+            self._ok = 0
+            self._wake()
+
+    def throttle(self, pause: float = 0.0, epoch: Optional[int] = None) -> None:
+        """
+        Multiplicative decrease on a 429 / overload; hold every request back for `pause` seconds.
+        Requests sent before the last decrease (an older `epoch`) don't decrease again: a
+        burst of 429s from one window halves the cap once, as in TCP congestion control.
+        """
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        if epoch is not None and epoch < self._epoch:
+            return
+        self._ok = 0
+        self._epoch += 1
+        self.limit = max(self.min_concurrency, self.limit // 2)
+
+    def _wake(self) -> None:
+        free = self.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def snapshot(self) -> dict:
+        return {"concurrency": self.limit, "throttled": self.throttled}
+
+
+def estimate_tokens(messages: Any, max_tokens: int) -> int:
+    """Rough prompt size (about 4 characters per token, plus per-message overhead) plus the completion cap."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + 4 * len(messages) + max_tokens
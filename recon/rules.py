@@ -1,37 +1,84 @@
 from __future__ import annotations
+from typing import Optional
+import numpy as np
 import pandas as pd
+from .metrics import Metrics
+from .schemas import BREAK_BITS
 
 DATE_TOLERANCE_DAYS = 1  # ±1 day
 FX_TOLERANCE = 0.01      # 1%
 AMOUNT_TOLERANCE = 0.01  # Small rounding tolerance
+DATE_FORMAT = "%d.%m.%Y"  # Both feeds book dates as DD.MM.YYYY
 
-def to_date(series: pd.Series) -> pd.Series:
-    return pd.to_datetime(series, dayfirst=True, errors="coerce")
+def _to_date_permissive(values) -> pd.Series:
+    return pd.to_datetime(values, dayfirst=True, errors="coerce")
 
-def normalize(nbim: pd.DataFrame, cust: pd.DataFrame):
-    nbim = nbim.copy()
-    cust = cust.copy()
+def to_date(series: pd.Series, fmt: str = DATE_FORMAT, stats: Optional[dict] = None) -> pd.Series:
+    """
+    Parse a date column, each distinct string once.
 
-    # Align column names for joining
+    Unique values are parsed with the explicit `fmt` and mapped back through
+    factorized codes (a categorical column's own categories and codes are used
+    directly). Unique values that don't fit the format are parsed with the
+    permissive dayfirst parser, which infers a format from the first of them, so a
+    column mixing DD.MM.YYYY with another format keeps both. Non-string columns go
+    straight to that parser.
+
+    stats, if given, accumulates "fallback" (values that needed the permissive
+    parser) and "coerced" (non-null values that ended up NaT).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        parsed = pd.to_datetime(series.cat.categories, format=fmt, errors="coerce")
+        if not parsed.isna().any():
+            return _take_dates(parsed, series.cat.codes.to_numpy(), series)
+        series = series.astype(object)  # categories are sorted, not in appearance order
+
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return _to_date_permissive(series)
+
+    codes, uniques = pd.factorize(series)
+    parsed = pd.to_datetime(uniques, format=fmt, errors="coerce")
+    failed = parsed.isna()
+    if failed.any():
+        # Only the uniques that missed the format go through the (much slower) permissive parser
+        fallback = pd.DatetimeIndex(_to_date_permissive(pd.Series(uniques[failed], dtype=object)))
+        values = parsed.to_numpy().copy()
+        values[failed] = fallback.to_numpy().astype(values.dtype)
+        parsed = pd.DatetimeIndex(values)
+        if stats is not None:
+            per_unique = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            stats["fallback"] = stats.get("fallback", 0) + int(per_unique[failed].sum())
+            stats["coerced"] = stats.get("coerced", 0) + int(per_unique[parsed.isna()].sum())
+    return _take_dates(parsed, codes, series)
+
+def _take_dates(parsed: pd.DatetimeIndex, codes: np.ndarray, series: pd.Series) -> pd.Series:
+    # Code -1 (missing) picks the trailing NaT
+    values = np.append(parsed.to_numpy(), np.datetime64("NaT")).astype(parsed.dtype)
+    return pd.Series(values[codes], index=series.index, name=series.name)
+
+def normalize_nbim(nbim: pd.DataFrame, date_stats: Optional[dict] = None) -> pd.DataFrame:
+    """NBIM side of normalize(): report column names and parsed dates (what recon.snapshot stores)."""
     nbim = nbim.rename(columns={
         'WTHTAX_COST_QUOTATION': 'WITHHOLDING_TAX_AMOUNT_QUOTATION',
         'WTHTAX_COST_SETTLEMENT': 'WITHHOLDING_TAX_AMOUNT_SETTLEMENT',
     })
-    
-    cust = cust.rename(columns={
-        'CUSTODY': 'BANK_ACCOUNT',
-    })
-
-    # Normalize dates
     for col in ["EXDATE", "PAYMENT_DATE"]:
         if col in nbim.columns:
-            nbim[col] = to_date(nbim[col])
+            nbim[col] = to_date(nbim[col], stats=date_stats)
+    return nbim
 
+def normalize_custody(cust: pd.DataFrame, date_stats: Optional[dict] = None) -> pd.DataFrame:
+    cust = cust.rename(columns={
+        'CUSTODY': 'BANK_ACCOUNT',
+    })
     for col in ["EVENT_EX_DATE", "EVENT_PAYMENT_DATE", "RECORD_DATE", "PAY_DATE", "EX_DATE"]:
         if col in cust.columns:
-            cust[col] = to_date(cust[col])
+            cust[col] = to_date(cust[col], stats=date_stats)
+    return cust
 
-    return nbim, cust
+def normalize(nbim: pd.DataFrame, cust: pd.DataFrame, date_stats: Optional[dict] = None):
+    # rename() returns new frames, so the inputs are never modified
+    return normalize_nbim(nbim, date_stats), normalize_custody(cust, date_stats)
 
 def _classify_row(row) -> str:
     if row["_merge"] == "left_only":
@@ -118,36 +165,499 @@ def _classify_row(row) -> str:
 
     return "MATCHED" if not issues else " | ".join(sorted(set(issues)))
 
-def reconcile(nbim: pd.DataFrame, cust: pd.DataFrame) -> pd.DataFrame:
-    nbim_norm, cust_norm = normalize(nbim, cust)
-    
-    # Critical fix: Join on event + ISIN + bank account
-    merged = cust_norm.merge(
-        nbim_norm,
-        on=["COAC_EVENT_KEY", "ISIN", "BANK_ACCOUNT"],
+# Rule checks in the order they appear in a joined RECON_STATUS string
+_RULES = sorted([
+    "DATE_MISMATCH", "GROSS_MISMATCH", "NET_MISMATCH", "TAX_MISMATCH",
+    "FX_VARIANCE", "ADR_FEE_HANDLING", "POSITION_MISMATCH",
+])
+
+# Signed custodian-minus-NBIM deltas emitted next to break_mask
+DELTA_COLS = ["net_diff", "gross_diff", "tax_diff", "fx_rel_diff", "payment_date_diff_days"]
+
+def _num(df: pd.DataFrame, col: str, default: float = np.nan) -> np.ndarray:
+    """Column as float array; `default` everywhere if the column is absent (mirrors row.get)."""
+    if col not in df.columns:
+        return np.full(len(df), default, dtype=float)
+    return df[col].to_numpy(dtype=float, na_value=np.nan)
+
+def _obj(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    return df[col].to_numpy(dtype=object)
+
+def _day_diff(df: pd.DataFrame, a: str, b: str) -> np.ndarray:
+    """Whole-day difference a - b (Timedelta.days semantics), NaN where either side is missing."""
+    if a not in df.columns or b not in df.columns:
+        return np.full(len(df), np.nan)
+    return (df[a] - df[b]).dt.days.to_numpy(dtype=float, na_value=np.nan)
+
+def _checks(merged: pd.DataFrame):
+    """
+    Vectorized equivalent of the checks in _classify_row.
+    Returns (one boolean mask per rule in _RULES, signed deltas keyed by DELTA_COLS).
+    MISSING_* is handled by the caller.
+    """
+    # Python equality on object arrays keeps row.get semantics (NaN != NaN, None == None)
+    same_ccy = np.asarray(_obj(merged, "SETTLED_CURRENCY") == _obj(merged, "QUOTATION_CURRENCY"), dtype=bool)
+    cross_ccy = ~same_ccy
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Date checks
+        pay_days = _day_diff(merged, "EVENT_PAYMENT_DATE", "PAYMENT_DATE")
+        ex_days = _day_diff(merged, "EVENT_EX_DATE", "EXDATE")
+        date = (np.abs(pay_days) > DATE_TOLERANCE_DAYS) | (np.abs(ex_days) > DATE_TOLERANCE_DAYS)
+
+        # Gross amount check (same currency only)
+        gross_diff = np.where(same_ccy, _num(merged, "GROSS_AMOUNT") - _num(merged, "GROSS_AMOUNT_QUOTATION"), np.nan)
+
+        # Net amount check (settlement currency)
+        net_cust = _num(merged, "NET_AMOUNT_SC")
+        net_nbim = _num(merged, "NET_AMOUNT_SETTLEMENT")
+        net_diff = net_cust - net_nbim
+
+        # Tax check; cross-currency custody tax is converted with FX_RATE first
+        tax_cust = _num(merged, "TAX")
+        fx_cust = _num(merged, "FX_RATE", default=1.0)
+        tax_conv = np.where(cross_ccy, np.where(fx_cust > 1, tax_cust / fx_cust, tax_cust * fx_cust), tax_cust)
+        tax_diff = tax_conv - _num(merged, "WITHHOLDING_TAX_AMOUNT_SETTLEMENT")
+
+        # FX variance check - ONLY for cross-currency settlements, inverse quotes flipped
+        fx_cust = _num(merged, "FX_RATE")
+        fx_nbim = _num(merged, "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO")
+        inverse = (fx_cust > 1) & (fx_nbim < 1)
+        fx_nbim_equiv = np.where(inverse, np.where(fx_nbim != 0, 1 / fx_nbim, 0.0), fx_nbim)
+        base = np.maximum(np.abs(fx_cust), 1e-9)
+        fx_rel_diff = np.where(cross_ccy, (fx_cust - fx_nbim_equiv) / base, np.nan)
+
+        # ADR fee handling: net should be Gross - Tax - ADR Fee
+        adr_fee = _num(merged, "ADR_FEE", default=0.0)
+        adr = (adr_fee != 0) & ~np.isnan(adr_fee) & (np.abs((net_cust + adr_fee) - net_nbim) > AMOUNT_TOLERANCE)
+
+        # Position basis check (warning for data quality)
+        position = np.abs(_num(merged, "NOMINAL_BASIS") - _num(merged, "HOLDING_QUANTITY")) > AMOUNT_TOLERANCE
+
+        masks = {
+            "DATE_MISMATCH": date,
+            "GROSS_MISMATCH": np.abs(gross_diff) > AMOUNT_TOLERANCE,
+            "NET_MISMATCH": np.abs(net_diff) > AMOUNT_TOLERANCE,
+            "TAX_MISMATCH": np.abs(tax_diff) > AMOUNT_TOLERANCE,
+            "FX_VARIANCE": np.abs(fx_rel_diff) > FX_TOLERANCE,
+            "ADR_FEE_HANDLING": adr,
+            "POSITION_MISMATCH": position,
+        }
+    deltas = {
+        "net_diff": net_diff, "gross_diff": gross_diff, "tax_diff": tax_diff,
+        "fx_rel_diff": fx_rel_diff, "payment_date_diff_days": pay_days,
+    }
+    return masks, deltas
+
+def _break_columns(merged: pd.DataFrame) -> pd.DataFrame:
+    """break_mask (one BREAK_BITS bit per hit) plus the DELTA_COLS, aligned to merged."""
+    masks, deltas = _checks(merged)
+    mask = np.zeros(len(merged), dtype=np.int16)
+    for r in _RULES:
+        mask |= np.where(masks[r], BREAK_BITS[r], 0).astype(np.int16)
+
+    # Orphans carry only their MISSING_* bit, like _classify_row's early return
+    side = merged["_merge"].to_numpy(dtype=object)
+    mask[side == "left_only"] = BREAK_BITS["MISSING_AT_CUSTODIAN"]
+    mask[side == "right_only"] = BREAK_BITS["MISSING_IN_NBIM"]
+
+    return pd.DataFrame({"break_mask": mask, **deltas}, index=merged.index)
+
+def _mask_label(mask: int) -> str:
+    if mask == 0:
+        return "MATCHED"
+    return " | ".join(sorted(code for code, bit in BREAK_BITS.items() if mask & bit))
+
+def status_from_mask(mask) -> pd.Series:
+    """
+    Render break_mask values as RECON_STATUS strings.
+    Only the distinct masks are formatted, so this stays cheap on large reports.
+    """
+    index = mask.index if isinstance(mask, pd.Series) else None
+    values = np.asarray(mask, dtype=np.int64)
+    uniq, inverse = np.unique(values, return_inverse=True)
+    labels = np.array([_mask_label(int(m)) for m in uniq], dtype=object)
+    return pd.Series(labels[inverse.reshape(-1)], index=index, dtype=object)
+
+def _classify_frame(merged: pd.DataFrame) -> pd.Series:
+    """
+    Vectorized RECON_STATUS for a merged frame; same output as merged.apply(_classify_row, axis=1).
+    """
+    return status_from_mask(_break_columns(merged)["break_mask"])
+
+# Report columns
+REPORT_COLS = [
+    "COAC_EVENT_KEY", "ISIN", "BANK_ACCOUNT",
+    "INSTRUMENT_DESCRIPTION", "TICKER",
+    "CUSTODIAN",
+    "EVENT_EX_DATE", "EXDATE",
+    "EVENT_PAYMENT_DATE", "PAYMENT_DATE",
+    "SETTLED_CURRENCY", "QUOTATION_CURRENCY", "SETTLEMENT_CURRENCY",
+    "GROSS_AMOUNT", "GROSS_AMOUNT_QUOTATION",
+    "NET_AMOUNT_SC", "NET_AMOUNT_SETTLEMENT",
+    "TAX", "WITHHOLDING_TAX_AMOUNT_QUOTATION", "WITHHOLDING_TAX_AMOUNT_SETTLEMENT",
+    "FX_RATE", "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO",
+    "ADR_FEE", "TAX_RATE",
+    "NOMINAL_BASIS", "HOLDING_QUANTITY", "NOMINAL_BASIS_NBIM",
+    "_merge", "RECON_STATUS", "break_mask", *DELTA_COLS,
+    "cust_rows", "nbim_rows",
+    "COAC_EVENT_KEY_NBIM", "BANK_ACCOUNT_NBIM", "orphan_score",
+]
+
+# Filled by pair_orphans; always present so every report (and stream bucket) has the same columns
+_ORPHAN_COLS = ["COAC_EVENT_KEY_NBIM", "BANK_ACCOUNT_NBIM", "orphan_score"]
+
+JOIN_KEYS = ["COAC_EVENT_KEY", "ISIN", "BANK_ACCOUNT"]
+
+_JOIN_CODE = "__join_code"
+
+def _is_numeric_key(col: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col)
+
+def _key_as_text(col: pd.Series) -> pd.Series:
+    # Integral floats (int ids with gaps) render without ".0" so they match the text side
+    if pd.api.types.is_float_dtype(col) and (col.dropna() % 1 == 0).all():
+        col = col.astype("Int64")
+    return col.astype(object).where(col.notna()).map(lambda v: v if pd.isna(v) else str(v))
+
+def _align_keys(cust_norm: pd.DataFrame, nbim_norm: pd.DataFrame, stats: Optional[dict]):
+    """
+    One comparable dtype per join key: where one side is numeric and the other text,
+    the numeric side is rendered as text (pandas would refuse to merge them).
+    """
+    cust_keys, nbim_keys = cust_norm[JOIN_KEYS].copy(), nbim_norm[JOIN_KEYS].copy()
+    for k in JOIN_KEYS:
+        if _is_numeric_key(cust_keys[k]) == _is_numeric_key(nbim_keys[k]):
+            continue
+        side, keys = ("cust", cust_keys) if _is_numeric_key(cust_keys[k]) else ("nbim", nbim_keys)
+        if stats is not None:
+            stats.setdefault("coercions", []).append(f"{k}: {side} {keys[k].dtype} -> text")
+        keys[k] = _key_as_text(keys[k])
+    return cust_keys, nbim_keys
+
+def _composite_codes(keys: pd.DataFrame) -> np.ndarray:
+    """
+    Dense int64 code per row of `keys`, ordered like a lexicographic sort of the key
+    columns. Missing key parts get their own code, so they match each other as in a merge.
+    """
+    code = None
+    for k in JOIN_KEYS:
+        col, _ = pd.factorize(keys[k], sort=True, use_na_sentinel=False)
+        # Re-densify after each column so the combined code can't overflow int64
+        code = col if code is None else pd.factorize(code * (int(col.max(initial=0)) + 1) + col, sort=True)[0]
+    return code.astype(np.int64)
+
+DUPLICATE_POLICIES = ("fail", "aggregate", "side_table", "allow")
+
+# Summed when duplicate key rows are aggregated (partial bookings); every other column takes its first value
+DUPLICATE_SUM_COLS = frozenset([
+    "GROSS_AMOUNT", "NET_AMOUNT_QC", "NET_AMOUNT_SC", "TAX", "ADR_FEE",
+    "NOMINAL_BASIS", "HOLDING_QUANTITY", "LOAN_QUANTITY", "POSSIBLE_RESTITUTION_AMOUNT",
+    "GROSS_AMOUNT_QUOTATION", "NET_AMOUNT_QUOTATION", "NET_AMOUNT_SETTLEMENT",
+    "GROSS_AMOUNT_PORTFOLIO", "NET_AMOUNT_PORTFOLIO",
+    "WITHHOLDING_TAX_AMOUNT_QUOTATION", "WITHHOLDING_TAX_AMOUNT_SETTLEMENT", "WTHTAX_COST_PORTFOLIO",
+    "LOCALTAX_COST_QUOTATION", "LOCALTAX_COST_SETTLEMENT",
+    "EXRESPRDIV_COST_QUOTATION", "EXRESPRDIV_COST_SETTLEMENT",
+])
+
+class DuplicateKeyError(ValueError):
+    """Raised by the "fail" duplicate policy; `keys` lists the affected join keys and row counts."""
+
+    def __init__(self, message: str, keys: pd.DataFrame):
+        super().__init__(message)
+        self.keys = keys
+
+    def __reduce__(self):  # picklable across the process pool in recon.parallel
+        return type(self), (self.args[0], self.keys)
+
+def aggregate_duplicates(df: pd.DataFrame, codes: np.ndarray, sum_cols=DUPLICATE_SUM_COLS):
+    """
+    One row per key code: numeric `sum_cols` are summed (all-missing stays missing),
+    every other column keeps its first non-missing value. Returns (frame, codes).
+    """
+    dup = pd.Series(codes).duplicated(keep=False).to_numpy()
+    if not dup.any():
+        return df, codes
+    groups = df[dup].groupby(codes[dup], sort=False)
+    summed = [c for c in df.columns if c in sum_cols and pd.api.types.is_numeric_dtype(df[c])]
+    others = [c for c in df.columns if c not in summed]
+    collapsed = pd.concat([groups[summed].sum(min_count=1), groups[others].first()], axis=1)[list(df.columns)]
+    out = pd.concat([df[~dup], collapsed], ignore_index=True)
+    return out, np.concatenate([codes[~dup], collapsed.index.to_numpy(dtype=np.int64)])
+
+def _duplicate_keys(keys: pd.DataFrame, codes: np.ndarray, cust_rows: np.ndarray, nbim_rows: np.ndarray) -> pd.DataFrame:
+    affected = np.flatnonzero((cust_rows > 1) | (nbim_rows > 1))
+    _, first = np.unique(codes, return_index=True)
+    out = keys.iloc[first[affected]].reset_index(drop=True)
+    out["cust_rows"], out["nbim_rows"] = cust_rows[affected], nbim_rows[affected]
+    return out
+
+def _merge_feeds(
+    nbim_norm: pd.DataFrame,
+    cust_norm: pd.DataFrame,
+    stats: Optional[dict] = None,
+    duplicates: str = "allow",
+    diagnostics: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    Outer join on event + ISIN + bank account, custodian rows on the left.
+
+    The three keys of both sides are factorized into one shared int64 code and the
+    frames are joined on that single column; rows come out in the same order and with
+    the same columns as a three-column outer merge. stats, if given, collects
+    "coercions" (key columns cast to text to match the other side), "null_key_rows"
+    per side (rows with a missing key part; they still match each other, like pandas
+    merge, and nothing is dropped) and "duplicate_keys".
+
+    Keys with more than one row on a side are found from the same codes, before the
+    merge, and handled per `duplicates`:
+    - "fail": raise DuplicateKeyError listing the keys.
+    - "aggregate": collapse each side to one row per key (aggregate_duplicates).
+    - "side_table": join the first row per key; the other rows go, with their keys
+      and a SIDE column, to diagnostics["side_table"].
+    - "allow": plain many-to-many merge (one row per pair).
+    Affected keys are appended to diagnostics["duplicate_keys"]; every merged row
+    carries cust_rows / nbim_rows, the source rows behind its key on each side.
+    """
+    if duplicates not in DUPLICATE_POLICIES:
+        raise ValueError(f"duplicates must be one of {DUPLICATE_POLICIES}, got {duplicates!r}")
+    cust_keys, nbim_keys = _align_keys(cust_norm, nbim_norm, stats)
+    all_keys = pd.concat([cust_keys, nbim_keys], ignore_index=True)
+    codes = _composite_codes(all_keys)
+    n_cust = len(cust_keys)
+    cust_codes, nbim_codes = codes[:n_cust], codes[n_cust:]
+    if stats is not None:
+        stats["null_key_rows"] = {
+            "cust": int(cust_keys.isna().any(axis=1).sum()),
+            "nbim": int(nbim_keys.isna().any(axis=1).sum()),
+        }
+
+    n_codes = int(codes.max()) + 1 if len(codes) else 0
+    cust_rows = np.bincount(cust_codes, minlength=n_codes)
+    nbim_rows = np.bincount(nbim_codes, minlength=n_codes)
+    cust_side = cust_norm.drop(columns=JOIN_KEYS)
+    nbim_side = nbim_norm.drop(columns=JOIN_KEYS)
+
+    if (cust_rows > 1).any() or (nbim_rows > 1).any():
+        dup_keys = _duplicate_keys(all_keys, codes, cust_rows, nbim_rows)
+        if stats is not None:
+            stats["duplicate_keys"] = stats.get("duplicate_keys", 0) + len(dup_keys)
+        if diagnostics is not None:
+            diagnostics.setdefault("duplicate_keys", []).append(dup_keys)
+        if duplicates == "fail":
+            sample = ", ".join(
+                f"({', '.join(map(str, row[:3]))}) x{row[3]}/{row[4]}" for row in dup_keys.head(5).itertuples(index=False)
+            )
+            raise DuplicateKeyError(
+                f"{len(dup_keys)} join keys have duplicate rows (cust/nbim rows): {sample}. "
+                "Aggregate them, keep extras in a side table, or allow a many-to-many merge.",
+                dup_keys,
+            )
+        if duplicates == "aggregate":
+            cust_side, cust_codes = aggregate_duplicates(cust_side, cust_codes)
+            nbim_side, nbim_codes = aggregate_duplicates(nbim_side, nbim_codes)
+        elif duplicates == "side_table":
+            keep_cust = ~pd.Series(cust_codes).duplicated().to_numpy()
+            keep_nbim = ~pd.Series(nbim_codes).duplicated().to_numpy()
+            if diagnostics is not None:
+                extras = [cust_norm[~keep_cust].assign(SIDE="cust"), nbim_norm[~keep_nbim].assign(SIDE="nbim")]
+                diagnostics.setdefault("side_table", []).append(pd.concat(extras).set_index(JOIN_KEYS))
+            cust_side, cust_codes = cust_side[keep_cust], cust_codes[keep_cust]
+            nbim_side, nbim_codes = nbim_side[keep_nbim], nbim_codes[keep_nbim]
+
+    merged = cust_side.assign(**{_JOIN_CODE: cust_codes}).merge(
+        nbim_side.assign(**{_JOIN_CODE: nbim_codes}),
+        on=_JOIN_CODE,
         how="outer",
         suffixes=("", "_NBIM"),
         indicator=True,
     )
-    
-    merged["RECON_STATUS"] = merged.apply(_classify_row, axis=1)
-
-    # Report columns
-    report_cols = [
-        "COAC_EVENT_KEY", "ISIN", "BANK_ACCOUNT",
-        "INSTRUMENT_DESCRIPTION", "TICKER",
-        "CUSTODIAN",
-        "EVENT_EX_DATE", "EXDATE",
-        "EVENT_PAYMENT_DATE", "PAYMENT_DATE",
-        "SETTLED_CURRENCY", "QUOTATION_CURRENCY", "SETTLEMENT_CURRENCY",
-        "GROSS_AMOUNT", "GROSS_AMOUNT_QUOTATION",
-        "NET_AMOUNT_SC", "NET_AMOUNT_SETTLEMENT",
-        "TAX", "WITHHOLDING_TAX_AMOUNT_QUOTATION",
-        "FX_RATE", "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO",
-        "ADR_FEE", "TAX_RATE",
-        "NOMINAL_BASIS", "HOLDING_QUANTITY",
-        "_merge", "RECON_STATUS",
-    ]
-    
-    existing = [c for c in report_cols if c in merged.columns]
-    return merged[existing].copy()
\ No newline at end of file
+
+    # Key values back from the code: first row carrying each code
+    _, first = np.unique(codes, return_index=True)
+    merged_codes = merged[_JOIN_CODE].to_numpy()
+    key_rows = first[merged_codes]
+    for k in sorted(JOIN_KEYS, key=cust_norm.columns.get_loc):
+        merged.insert(cust_norm.columns.get_loc(k), k, all_keys[k].take(key_rows).reset_index(drop=True))
+    merged["cust_rows"], merged["nbim_rows"] = cust_rows[merged_codes], nbim_rows[merged_codes]
+    return merged.drop(columns=_JOIN_CODE)
+
+def _build_report(merged: pd.DataFrame) -> pd.DataFrame:
+    """Classify a merged frame and keep the report columns."""
+    breaks = _break_columns(merged)
+    merged = pd.concat([merged, breaks], axis=1)
+    merged["RECON_STATUS"] = status_from_mask(breaks["break_mask"])
+    for c in _ORPHAN_COLS:
+        merged[c] = pd.Series(np.nan, index=merged.index, dtype="float64" if c == "orphan_score" else "str")
+
+    existing = [c for c in REPORT_COLS if c in merged.columns]
+    return merged[existing].copy()
+
+ORPHAN_DATE_BUCKET_DAYS = 7     # payment-date block width; neighbouring blocks are probed too
+ORPHAN_AMOUNT_TOLERANCE = 0.05  # relative difference at which an amount/quantity stops counting as close
+ORPHAN_MIN_SCORE = 0.8          # pairs scoring below this stay orphans
+ORPHAN_MAX_BLOCK = 50           # blocks with more NBIM orphans than this are skipped, keeping the pass linear
+
+# Report columns that come from each feed; a paired row takes the NBIM side from its partner
+_CUST_SIDE = [
+    "CUSTODIAN", "EVENT_EX_DATE", "EVENT_PAYMENT_DATE", "SETTLED_CURRENCY", "GROSS_AMOUNT", "NET_AMOUNT_SC",
+    "TAX", "FX_RATE", "ADR_FEE", "TAX_RATE", "NOMINAL_BASIS", "HOLDING_QUANTITY", "cust_rows",
+]
+_NBIM_SIDE = [
+    "INSTRUMENT_DESCRIPTION", "TICKER", "EXDATE", "PAYMENT_DATE", "QUOTATION_CURRENCY", "SETTLEMENT_CURRENCY",
+    "GROSS_AMOUNT_QUOTATION", "NET_AMOUNT_SETTLEMENT", "WITHHOLDING_TAX_AMOUNT_QUOTATION",
+    "WITHHOLDING_TAX_AMOUNT_SETTLEMENT", "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO", "NOMINAL_BASIS_NBIM", "nbim_rows",
+]
+# (custodian column, NBIM column) pairs scored for proximity
+_ORPHAN_SCORE_COLS = [
+    ("NET_AMOUNT_SC", "NET_AMOUNT_SETTLEMENT"),
+    ("GROSS_AMOUNT", "GROSS_AMOUNT_QUOTATION"),
+    ("NOMINAL_BASIS", "NOMINAL_BASIS_NBIM"),
+]
+
+def _day_numbers(df: pd.DataFrame, col: str, pos: np.ndarray) -> np.ndarray:
+    """Days since epoch of the rows at positions `pos`, as float, NaN where missing."""
+    if col not in df.columns:
+        return np.full(len(pos), np.nan)
+    days = pd.to_datetime(df[col].iloc[pos]).to_numpy().astype("datetime64[D]")
+    return np.where(np.isnat(days), np.nan, days.astype(np.int64).astype(float))
+
+def _orphan_candidates(report: pd.DataFrame, cust_pos: np.ndarray, nbim_pos: np.ndarray, stats: Optional[dict]):
+    """
+    Candidate (cust, nbim) position pairs sharing an ISIN and a payment-date block.
+    Each custodian orphan probes its own block and both neighbours; no all-pairs step.
+    """
+    isin = report["ISIN"]
+    cust_day = _day_numbers(report, "EVENT_PAYMENT_DATE", cust_pos)
+    nbim_day = _day_numbers(report, "PAYMENT_DATE", nbim_pos)
+
+    def blocks(pos, day):
+        # Missing dates share one block per ISIN and only match each other
+        bucket = np.where(np.isnan(day), np.iinfo(np.int64).min, np.floor(day / ORPHAN_DATE_BUCKET_DAYS))
+        return pd.DataFrame({"pos": pos, "ISIN": isin.iloc[pos].to_numpy(dtype=object), "bucket": bucket.astype(np.int64)})
+
+    nbim_blocks = blocks(nbim_pos, nbim_day).dropna(subset=["ISIN"])
+    size = nbim_blocks.groupby(["ISIN", "bucket"])["pos"].transform("size")
+    if stats is not None:
+        stats["orphan_blocks_skipped"] += int(nbim_blocks.loc[size > ORPHAN_MAX_BLOCK, ["ISIN", "bucket"]].drop_duplicates().shape[0])
+    nbim_blocks = nbim_blocks[size <= ORPHAN_MAX_BLOCK]
+
+    cust_blocks = blocks(cust_pos, cust_day).dropna(subset=["ISIN"])
+    dated = cust_blocks["bucket"] != np.iinfo(np.int64).min
+    probes = pd.concat(
+        [cust_blocks] + [cust_blocks[dated].assign(bucket=cust_blocks.loc[dated, "bucket"] + off) for off in (-1, 1)],
+        ignore_index=True,
+    )
+    pairs = probes.merge(nbim_blocks, on=["ISIN", "bucket"], suffixes=("_cust", "_nbim"))
+    return pairs["pos_cust"].to_numpy(), pairs["pos_nbim"].to_numpy()
+
+def _orphan_scores(report: pd.DataFrame, c: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """Mean closeness (1 = equal, 0 = ORPHAN_AMOUNT_TOLERANCE apart or worse) over the comparable columns."""
+    total = np.zeros(len(c))
+    count = np.zeros(len(c))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for cust_col, nbim_col in _ORPHAN_SCORE_COLS:
+            a, b = _num(report, cust_col)[c], _num(report, nbim_col)[n]
+            scale = np.maximum(np.abs(a), np.abs(b))
+            rel = np.where(scale > 0, np.abs(a - b) / scale, 0.0)
+            close = np.clip(1 - rel / ORPHAN_AMOUNT_TOLERANCE, 0, 1)
+            ok = ~np.isnan(close)
+            total += np.where(ok, close, 0)
+            count += ok
+        return np.where(count > 0, total / count, np.nan)
+
+def pair_orphans(report: pd.DataFrame, stats: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Second matching pass over the rows the join left unmatched.
+
+    Custodian-only and NBIM-only rows are blocked on ISIN + payment-date bucket,
+    candidates are scored on net, gross and quantity proximity (same settlement
+    currency, payment dates within ORPHAN_DATE_BUCKET_DAYS), and the best pairs
+    scoring at least ORPHAN_MIN_SCORE are taken greedily, one partner per row.
+    Each pair becomes one row: the custodian row with the NBIM side filled from its
+    partner, the partner's keys in COAC_EVENT_KEY_NBIM / BANK_ACCOUNT_NBIM, and the
+    rules re-run with IDENTIFIER_MISMATCH added. The NBIM row is dropped.
+    stats, if given, gets "orphan_candidates", "orphan_pairs" and "orphan_blocks_skipped".
+    """
+    if stats is not None:
+        stats.setdefault("orphan_candidates", 0)
+        stats.setdefault("orphan_pairs", 0)
+        stats.setdefault("orphan_blocks_skipped", 0)
+    side = report["_merge"].to_numpy(dtype=object)
+    cust_pos = np.flatnonzero(side == "left_only")
+    nbim_pos = np.flatnonzero(side == "right_only")
+    if not len(cust_pos) or not len(nbim_pos) or "ISIN" not in report.columns:
+        return report
+
+    c, n = _orphan_candidates(report, cust_pos, nbim_pos, stats)
+    ccy_c, ccy_n = _obj(report.iloc[c], "SETTLED_CURRENCY"), _obj(report.iloc[n], "SETTLEMENT_CURRENCY")
+    same_ccy = pd.isna(ccy_c) | pd.isna(ccy_n) | (ccy_c == ccy_n)
+    gap = np.abs(_day_numbers(report, "EVENT_PAYMENT_DATE", c) - _day_numbers(report, "PAYMENT_DATE", n))
+    score = _orphan_scores(report, c, n)
+    keep = same_ccy.astype(bool) & ~(gap > ORPHAN_DATE_BUCKET_DAYS) & (score >= ORPHAN_MIN_SCORE)
+    c, n, score = c[keep], n[keep], score[keep]
+
+    # Greedy one-to-one: best score first, ties by row position
+    used_c, used_n, pairs = set(), set(), []
+    for i in np.lexsort((n, c, -score)):
+        if c[i] not in used_c and n[i] not in used_n:
+            used_c.add(c[i])
+            used_n.add(n[i])
+            pairs.append(i)
+    if stats is not None:
+        stats["orphan_candidates"] += int(keep.sum())
+        stats["orphan_pairs"] += len(pairs)
+    if not pairs:
+        return report
+
+    pairs = np.sort(np.asarray(pairs))
+    c, n, score = c[pairs], n[pairs], score[pairs]
+    out = report.copy()
+    rows = out.index[c]
+    for col in _NBIM_SIDE:
+        if col in out.columns:
+            out.loc[rows, col] = report[col].iloc[n].to_numpy()
+    for key in ("COAC_EVENT_KEY", "BANK_ACCOUNT"):
+        out.loc[rows, f"{key}_NBIM"] = report[key].iloc[n].astype("str").to_numpy()
+    out.loc[rows, "orphan_score"] = score
+    out.loc[rows, "_merge"] = "both"
+
+    breaks = _break_columns(out.loc[rows])
+    mask = (breaks["break_mask"].to_numpy() | BREAK_BITS["IDENTIFIER_MISMATCH"]).astype(np.int16)
+    out.loc[rows, "break_mask"] = mask
+    for col in DELTA_COLS:
+        out.loc[rows, col] = breaks[col].to_numpy()
+    out.loc[rows, "RECON_STATUS"] = status_from_mask(mask).to_numpy()
+    return out.drop(index=out.index[n]).reset_index(drop=True)
+
+def reconcile(
+    nbim: pd.DataFrame,
+    cust: pd.DataFrame,
+    metrics: Optional[Metrics] = None,
+    duplicates: str = "fail",
+    diagnostics: Optional[dict] = None,
+    match_orphans: bool = True,
+    nbim_normalized: bool = False,
+) -> pd.DataFrame:
+    """
+    Normalize, merge and classify. Pass a recon.metrics.Metrics to time each stage.
+    `duplicates` picks how keys with several rows on one side are handled (see
+    _merge_feeds); `diagnostics` collects the affected keys and any side table.
+    With match_orphans, unmatched rows go through pair_orphans afterwards.
+    nbim_normalized says nbim already went through normalize_nbim (a snapshot).
+    """
+    metrics = metrics if metrics is not None else Metrics(enabled=False)
+    with metrics.stage("normalize", len(nbim) + len(cust)):
+        cust_norm = normalize_custody(cust, date_stats=metrics.dates)
+        nbim_norm = nbim if nbim_normalized else normalize_nbim(nbim, date_stats=metrics.dates)
+    with metrics.stage("merge", len(nbim_norm) + len(cust_norm)) as st:
+        merged = _merge_feeds(nbim_norm, cust_norm, stats=metrics.join, duplicates=duplicates, diagnostics=diagnostics)
+        st.rows_out = len(merged)
+    with metrics.stage("classify", len(merged)):
+        report = _build_report(merged)
+    if match_orphans:
+        with metrics.stage("orphans", len(report)):
+            report = pair_orphans(report, stats=metrics.join)
+    return report
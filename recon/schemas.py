@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Literal, get_args
 from pydantic import BaseModel, Field
 
 BreakCode = Literal[
@@ -16,6 +16,9 @@ BreakCode = Literal[
     "OTHER"
 ]
 
+# One bit per break code for the integer break_mask column; MATCHED is the empty mask (0)
+BREAK_BITS = {code: 1 << i for i, code in enumerate(c for c in get_args(BreakCode) if c != "MATCHED")}
+
 class LLMResult(BaseModel):
     """
     Result from LLM classification of a reconciliation break.
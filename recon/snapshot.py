@@ -0,0 +1,125 @@
+# recon/snapshot.py
+"""
+Memory-mapped snapshot of the normalized NBIM book.
+
+The NBIM side barely changes during the day, yet every run re-reads its CSV
+and re-runs normalize_nbim (renames, date parsing). build_snapshot does that
+once and writes the normalized frame to an uncompressed Arrow IPC file whose
+schema metadata records the source path, its size/mtime and a content
+fingerprint (BLAKE2b of the file bytes). load_snapshot memory-maps the file:
+numeric, date and text buffers are used in place rather than copied, and
+reconcile(..., nbim_normalized=True) skips the NBIM normalization.
+
+Before use the snapshot is checked against its source: an unchanged size and
+mtime is trusted; otherwise the source is re-hashed and the snapshot rebuilt
+if the content differs (or the snapshot comes from another SNAPSHOT_VERSION).
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional, Union
+import pandas as pd
+from .loader import read_nbim
+from .rules import normalize_nbim
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+SNAPSHOT_VERSION = 1
+
+_META_KEY = b"recon_snapshot"
+
+
+def fingerprint(path: Union[str, Path]) -> str:
+    """Content hash of a file, read in 1 MiB blocks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat(path: Path) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def build_snapshot(source: Union[str, Path], path: Union[str, Path]) -> Path:
+    """Read and normalize the NBIM feed at source and write the snapshot to path (atomically)."""
+    if pa is None:
+        raise ImportError("NBIM snapshots need pyarrow (pip install pyarrow)")
+    source, path = Path(source).resolve(), Path(path)
+    # Stat before reading: a write racing the build then shows up as a changed source next time
+    meta = {"version": SNAPSHOT_VERSION, "source": str(source), **_stat(source), "fingerprint": fingerprint(source)}
+
+    table = pa.Table.from_pandas(normalize_nbim(read_nbim(source)), preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, _META_KEY: json.dumps(meta).encode()})
+    tmp = path.with_name(path.name + ".tmp")
+    # Uncompressed IPC, so the buffers can be mapped as they are on disk
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return path
+
+
+def snapshot_info(path: Union[str, Path]) -> Optional[dict]:
+    """The snapshot's metadata (version, source, size, mtime_ns, fingerprint); None if unreadable."""
+    if pa is None:
+        return None
+    try:
+        with pa.memory_map(str(path)) as source:
+            meta = pa.ipc.open_file(source).schema.metadata or {}
+        return json.loads(meta[_META_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+        return None
+
+
+def _is_current(info: Optional[dict], source: Path) -> bool:
+    if info is None or info.get("version") != SNAPSHOT_VERSION:
+        return False
+    stat = _stat(source)
+    if stat == {"size": info["size"], "mtime_ns": info["mtime_ns"]}:
+        return True
+    return stat["size"] == info["size"] and fingerprint(source) == info["fingerprint"]
+
+
+def load_snapshot(
+    path: Union[str, Path],
+    source: Optional[Union[str, Path]] = None,
+    stats: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    Normalized NBIM frame from the snapshot at path, memory-mapped.
+
+    source defaults to the path recorded in the snapshot. The snapshot is built
+    if it doesn't exist and rebuilt if the source's content changed; with no
+    source available a missing snapshot is an error and an existing one is used
+    as is. stats, if given, gets "rebuilt" (True when this call wrote the file).
+    Pass the frame to reconcile(..., nbim_normalized=True).
+    """
+    if pa is None:
+        raise ImportError("NBIM snapshots need pyarrow (pip install pyarrow)")
+    path = Path(path)
+    info = snapshot_info(path)
+    if source is None and info is not None:
+        source = info["source"]
+    if source is None:
+        raise FileNotFoundError(f"no NBIM snapshot at {path} and no source feed to build it from")
+
+    source = Path(source)
+    rebuild = source.exists() and not _is_current(info, source)
+    if info is None and not rebuild:
+        raise FileNotFoundError(f"no NBIM snapshot at {path} and source {source} not found")
+    if rebuild:
+        build_snapshot(source, path)
+    if stats is not None:
+        stats["rebuilt"] = rebuild
+
+    # read_all on a memory map references the mapped pages; to_pandas wraps numeric,
+    # date and string buffers without copying where Arrow allows (categoricals re-code)
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    return table.to_pandas(split_blocks=True)
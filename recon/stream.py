@@ -0,0 +1,165 @@
+# recon/stream.py
+"""
+Out-of-core reconciliation for feeds that don't fit in memory.
+
+Both CSVs are read in chunks and hash-partitioned on the join key
+(COAC_EVENT_KEY, ISIN, BANK_ACCOUNT) into on-disk spill buckets. Every key
+lands in the same bucket on both sides, so each bucket can be reconciled on
+its own and appended to the output. Peak memory is roughly one chunk while
+partitioning and one bucket pair while reconciling.
+"""
+from __future__ import annotations
+import math
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+import numpy as np
+import pandas as pd
+from .incremental import key_hashes
+from .loader import CUSTODY_SCHEMA, NBIM_SCHEMA, read_custody, read_feed, read_feed_chunks, read_nbim
+from .metrics import Metrics
+from .rules import JOIN_KEYS, pair_orphans, reconcile
+
+
+_SCHEMAS = {"nbim": NBIM_SCHEMA, "cust": CUSTODY_SCHEMA}
+
+
+def _count_rows(path: Path) -> int:
+    """Data rows in a CSV without parsing it (newline count minus header)."""
+    n = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            n += block.count(b"\n")
+    return max(n - 1, 0)
+
+
+def partition_keys(chunk: pd.DataFrame, buckets: int) -> pd.Series:
+    """
+    Bucket id per row from a stable hash of the join key (raw or normalized columns).
+    Keys are hashed as text (recon.incremental.key_hashes), like reconcile() compares a
+    numeric key with a text one, so matching rows land in the same bucket.
+    """
+    return pd.Series(key_hashes(chunk) % np.uint64(buckets), index=chunk.index).astype(np.int64)
+
+
+def _spill(path: Path, side: str, spill: Path, buckets: int, chunk_rows: int) -> pd.DataFrame:
+    """Partition one CSV into spill/<side>_<bucket>.csv; returns an empty frame with the side's schema."""
+    template = None
+    # The declared schema reads keys as text, so every chunk hashes them the same way
+    for chunk in read_feed_chunks(path, _SCHEMAS[side], chunk_rows):
+        if template is None:
+            template = chunk.iloc[:0]
+        bucket_ids = partition_keys(chunk, buckets)
+        for b, part in chunk.groupby(bucket_ids, sort=False):
+            target = spill / f"{side}_{b}.csv"
+            part.to_csv(target, sep=";", index=False, mode="a", header=not target.exists())
+    return template if template is not None else read_feed(path, _SCHEMAS[side])
+
+
+def reconcile_stream(
+    nbim_path: Path,
+    cust_path: Path,
+    out_path: Path,
+    chunk_rows: int = 100_000,
+    buckets: Optional[int] = None,
+    spill_dir: Optional[Path] = None,
+    enrich: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    metrics: Optional[Metrics] = None,
+    duplicates: str = "fail",
+    diagnostics: Optional[dict] = None,
+    match_orphans: bool = True,
+) -> int:
+    """
+    Reconcile two semicolon CSVs bucket by bucket and write the report CSV.
+
+    - buckets defaults to enough partitions for ~chunk_rows rows per side per bucket.
+    - enrich, if given, is applied to each bucket's report before it is written
+      (used by the CLI for the LLM columns). Break rows are held back and enriched
+      in one call at the end, so a budget ranked by impact (classify_report) picks
+      the largest breaks of the whole run, not of each bucket; only MATCHED rows
+      are enriched per bucket. The breaks are kept in memory until then.
+    - Rows come out grouped by bucket rather than globally sorted; the row set
+      and values match reconcile() on the whole files.
+    - metrics, if given, accumulates partition/load/normalize/merge/classify/write
+      stages across all buckets.
+    - duplicates / diagnostics are passed to reconcile() for every bucket; all rows of
+      a key share a bucket, so duplicates are detected exactly as in memory.
+    - match_orphans holds each bucket's unmatched rows back (orphan pairs hash to
+      different buckets), runs pair_orphans over all of them and writes them last.
+      Only the orphans are kept in memory.
+
+    Returns the number of report rows written.
+    """
+    if buckets is None:
+        largest = max(_count_rows(nbim_path), _count_rows(cust_path))
+        buckets = max(1, math.ceil(largest / chunk_rows))
+
+    metrics = metrics or Metrics(enabled=False)
+    written = 0
+    columns = None
+    orphans = []
+    breaks = []
+
+    def write(report: pd.DataFrame) -> None:
+        nonlocal columns, written
+        if enrich is not None:
+            report = enrich(report)
+        # Keep one header for the whole file even if a bucket adds/lacks optional columns
+        first = columns is None
+        if first:
+            columns = list(report.columns)
+        else:
+            report = report.reindex(columns=columns)
+
+        with metrics.stage("write", len(report)):
+            report.to_csv(out_path, index=False, mode="a", header=first)
+        written += len(report)
+
+    with tempfile.TemporaryDirectory(dir=spill_dir, prefix="recon_spill_") as tmp:
+        spill = Path(tmp)
+        with metrics.stage("partition"):
+            nbim_empty = _spill(nbim_path, "nbim", spill, buckets, chunk_rows)
+            cust_empty = _spill(cust_path, "cust", spill, buckets, chunk_rows)
+
+        out_path = Path(out_path)
+        if out_path.exists():
+            out_path.unlink()
+
+        for b in range(buckets):
+            nbim_file = spill / f"nbim_{b}.csv"
+            cust_file = spill / f"cust_{b}.csv"
+            if not nbim_file.exists() and not cust_file.exists():
+                continue
+            with metrics.stage("load") as st:
+                nbim_df = read_nbim(nbim_file) if nbim_file.exists() else nbim_empty
+                cust_df = read_custody(cust_file) if cust_file.exists() else cust_empty
+                st.rows_out = len(nbim_df) + len(cust_df)
+
+            report = reconcile(
+                nbim_df, cust_df, metrics=metrics, duplicates=duplicates,
+                diagnostics=diagnostics, match_orphans=False,
+            )
+            if match_orphans:
+                orphan = (report["_merge"] != "both").to_numpy()
+                orphans.append(report[orphan])
+                report = report[~orphan]
+            if enrich is not None:
+                held = (report["RECON_STATUS"] != "MATCHED").to_numpy()
+                breaks.append(report[held])
+                report = report[~held]
+            if len(report) or columns is None:
+                write(report)
+
+        if orphans:
+            report = pd.concat(orphans, ignore_index=True)
+            with metrics.stage("orphans", len(report)):
+                report = pair_orphans(report, stats=metrics.join)
+            breaks.append(report)
+        held = [b for b in breaks if len(b)]
+        if held:
+            write(pd.concat(held, ignore_index=True))
+
+    if columns is None:
+        # Both inputs empty: still produce a report with the standard header
+        reconcile(nbim_empty, cust_empty).to_csv(out_path, index=False)
+    return written
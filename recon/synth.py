@@ -0,0 +1,282 @@
+# recon/synth.py
+"""
+Synthetic NBIM / custodian dividend booking generator.
+
+Produces frame pairs with the same column layout as the sample files
+(NBIM_Dividend_Bookings*.csv and CUSTODY_Dividend_Bookings*.csv) at any size,
+for tests and benchmarks. Break injection is controlled per break type; with
+every rate at zero and no orphans, reconcile() reports every row MATCHED.
+
+    python -m recon.synth --rows 1000000 --out-dir data/
+"""
+from __future__ import annotations
+import argparse
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+NBIM_COLUMNS = [
+    "COAC_EVENT_KEY", "INSTRUMENT_DESCRIPTION", "ISIN", "SEDOL", "TICKER", "ORGANISATION_NAME",
+    "DIVIDENDS_PER_SHARE", "EXDATE", "PAYMENT_DATE", "CUSTODIAN", "BANK_ACCOUNT",
+    "QUOTATION_CURRENCY", "SETTLEMENT_CURRENCY", "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO", "NOMINAL_BASIS",
+    "GROSS_AMOUNT_QUOTATION", "NET_AMOUNT_QUOTATION", "NET_AMOUNT_SETTLEMENT",
+    "GROSS_AMOUNT_PORTFOLIO", "NET_AMOUNT_PORTFOLIO",
+    "WTHTAX_COST_QUOTATION", "WTHTAX_COST_SETTLEMENT", "WTHTAX_COST_PORTFOLIO", "WTHTAX_RATE",
+    "LOCALTAX_COST_QUOTATION", "LOCALTAX_COST_SETTLEMENT", "TOTAL_TAX_RATE",
+    "EXRESPRDIV_COST_QUOTATION", "EXRESPRDIV_COST_SETTLEMENT", "RESTITUTION_RATE",
+]
+
+CUSTODY_COLUMNS = [
+    "COAC_EVENT_KEY", "ISIN", "EVENT_EX_DATE", "EVENT_PAYMENT_DATE", "CUSTODY", "SEDOL", "CUSTODIAN",
+    "EVENT_TYPE", "NOMINAL_BASIS", "LOAN_QUANTITY", "HOLDING_QUANTITY", "LENDING_PERCENTAGE",
+    "BANK_ACCOUNTS", "EX_DATE", "RECORD_DATE", "PAY_DATE", "CURRENCIES", "DIV_RATE", "TAX_RATE",
+    "GROSS_AMOUNT", "NET_AMOUNT_QC", "TAX", "NET_AMOUNT_SC", "SETTLED_CURRENCY",
+    "IS_CROSS_CURRENCY_REVERSAL", "FX_RATE", "POSSIBLE_RESTITUTION_PAYMENT",
+    "POSSIBLE_RESTITUTION_AMOUNT", "ADR_FEE", "ADR_FEE_RATE",
+]
+
+# Same-currency markets: (currency, ISIN prefix, NBIM custodian, custodian code, withholding %, NOK rate)
+_DOMESTIC = [
+    ("USD", "US", "JPMORGAN_CHASE", "CUST/JPMORGANUS", 15, 11.2345),
+    ("CHF", "CH", "UBS_SWITZERLAND", "CUST/UBSCH", 35, 12.4567),
+    ("EUR", "FR", "BNP_PARIBAS", "CUST/BNPFR", 25, 11.7321),
+    ("GBP", "GB", "HSBC_UK", "CUST/HSBCGB", 0, 13.9012),
+]
+# Cross-currency markets quoted locally, settled in USD: (currency, prefix, custodian, code, tax %, local per USD)
+_CROSS = [
+    ("KRW", "KR", "HSBC_KOREA", "CUST/HSBCKR", 22, 1307.25),
+    ("JPY", "JP", "MIZUHO_JAPAN", "CUST/MIZUHOJP", 15, 149.52),
+    ("TWD", "TW", "CITI_TAIWAN", "CUST/CITITW", 21, 31.84),
+]
+
+BREAK_TYPES = [
+    "DATE_MISMATCH", "GROSS_MISMATCH", "NET_MISMATCH", "TAX_MISMATCH",
+    "FX_VARIANCE", "ADR_FEE_HANDLING", "POSITION_MISMATCH",
+]
+DEFAULT_BREAK_RATES = {b: 0.01 for b in BREAK_TYPES}
+
+
+def _per_unique(values: np.ndarray, fn) -> np.ndarray:
+    """Apply a per-value formatter once per distinct value (few dates/securities, many rows)."""
+    uniq, inverse = np.unique(values, return_inverse=True)
+    return np.asarray(fn(uniq), dtype=object)[inverse.reshape(-1)]
+
+
+def _fmt_date(d: np.ndarray) -> np.ndarray:
+    return _per_unique(d, lambda u: pd.DatetimeIndex(u).strftime("%d.%m.%Y"))
+
+
+def generate(
+    rows: int,
+    seed: int = 0,
+    break_rates: Optional[Dict[str, float]] = None,
+    cross_currency_share: float = 0.1,
+    max_accounts_per_event: int = 4,
+    orphan_rate: float = 0.005,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Generate (nbim, custodian) frames with about `rows` account-level bookings each.
+
+    - break_rates: per-break-type probability for a booking (keys from BREAK_TYPES;
+      missing keys use DEFAULT_BREAK_RATES). FX_VARIANCE only hits cross-currency
+      rows and GROSS_MISMATCH only same-currency rows, as the rules do.
+    - cross_currency_share: share of events quoted in KRW/JPY/TWD and settled in USD,
+      with the custodian quoting local-per-USD and NBIM the inverse.
+    - max_accounts_per_event: each event is held in 1..N bank accounts.
+    - orphan_rate: share of bookings dropped from one side (split evenly).
+    """
+    rng = np.random.default_rng(seed)
+    rates = {**DEFAULT_BREAK_RATES, **(break_rates or {})}
+
+    # Events, then accounts per event, trimmed to exactly `rows` bookings
+    n_events = max(1, int(rows / ((1 + max_accounts_per_event) / 2)) + 1)
+    per_event = rng.integers(1, max_accounts_per_event + 1, n_events)
+    event_of = np.repeat(np.arange(n_events), per_event)[:rows]
+    n = len(event_of)
+    account_no = np.arange(n) - (np.cumsum(per_event) - per_event)[event_of]
+
+    # Per-event attributes; markets index into _DOMESTIC + _CROSS
+    cross_ev = rng.random(n_events) < cross_currency_share
+    market_ev = np.where(
+        cross_ev,
+        len(_DOMESTIC) + rng.integers(0, len(_CROSS), n_events),
+        rng.integers(0, len(_DOMESTIC), n_events),
+    )
+    security_ev = rng.integers(0, max(1, n_events // 3) + 1, n_events)
+    ex_ev = np.datetime64("2025-01-02") + rng.integers(0, 360, n_events).astype("timedelta64[D]")
+    pay_ev = ex_ev + rng.integers(2, 60, n_events).astype("timedelta64[D]")
+    dps_ev = np.where(cross_ev, rng.integers(10, 2000, n_events).astype(float), rng.uniform(0.05, 5, n_events).round(2))
+
+    cross = cross_ev[event_of]
+    market = market_ev[event_of]
+    markets = _DOMESTIC + _CROSS
+    field = lambda i: np.array([m[i] for m in markets], dtype=object)[market]
+    quote_ccy = field(0)
+    prefix = field(1)
+    nbim_custodian = field(2)
+    cust_code = field(3)
+    tax_pct = field(4).astype(float)
+    fx_local = np.where(cross, (field(5).astype(float) * (1 + rng.normal(0, 0.002, n))).round(4), 1.0)
+    # NBIM carries the inverse quote (USD per local unit) for cross-currency events
+    nok_rate = np.where(cross, 1 / fx_local, field(5).astype(float))
+    settle_ccy = np.where(cross, "USD", quote_ccy)
+
+    event_key = 900_000_000 + event_of
+    security = security_ev[event_of]
+    # ISIN = country prefix + 9-digit security number + check digit
+    isin = prefix + _per_unique(security, lambda u: [f"{x:09d}{x % 10}" for x in u])
+    sedol = 1_000_000 + security
+    account = 500_000_000 + (event_of * 7 + account_no * 1_000_003) % 400_000_000
+    ex = ex_ev[event_of]
+    pay = pay_ev[event_of]
+    dps = dps_ev[event_of]
+
+    nominal = rng.integers(1, 500, n) * 1000
+    gross_q = (nominal * dps).round(2)
+    tax_q = (gross_q * tax_pct / 100).round(2)
+    net_q = (gross_q - tax_q).round(2)
+    net_s = np.where(cross, (net_q / fx_local).round(2), net_q)
+    tax_s = np.where(cross, (tax_q / fx_local).round(2), tax_q)
+
+    # Custodian view starts identical, breaks are injected below
+    c_pay = pay.copy()
+    c_gross = gross_q.copy()
+    c_net_s = net_s.copy()
+    c_tax = tax_q.copy()
+    c_fx = fx_local.copy()
+    adr_fee = np.zeros(n)
+    loan = np.zeros(n, dtype=np.int64)
+
+    def hit(kind, eligible=True):
+        return (rng.random(n) < rates.get(kind, 0.0)) & eligible
+
+    m = hit("DATE_MISMATCH")
+    c_pay[m] = c_pay[m] + rng.integers(2, 6, m.sum()).astype("timedelta64[D]")
+    m = hit("GROSS_MISMATCH", ~cross)
+    c_gross[m] = (c_gross[m] * (1 + rng.uniform(0.001, 0.05, m.sum()))).round(2)
+    m = hit("NET_MISMATCH")
+    c_net_s[m] = (c_net_s[m] * (1 - rng.uniform(0.001, 0.05, m.sum()))).round(2)
+    m = hit("TAX_MISMATCH")
+    c_tax[m] = (c_tax[m] * (1 + rng.uniform(0.05, 0.3, m.sum()))).round(2)
+    m = hit("FX_VARIANCE", cross)
+    c_fx[m] = (c_fx[m] * (1 + rng.uniform(0.015, 0.05, m.sum()))).round(6)
+    m = hit("ADR_FEE_HANDLING")
+    adr_fee[m] = (nominal[m] * 0.02).round(2)  # fee reported but not deducted from net
+    m = hit("POSITION_MISMATCH")
+    loan[m] = (nominal[m] * rng.uniform(0.05, 0.2, m.sum())).astype(np.int64)
+
+    ex_s, pay_s, c_pay_s = _fmt_date(ex), _fmt_date(pay), _fmt_date(c_pay)
+    record_s = _fmt_date(ex + np.timedelta64(1, "D"))
+    names = _per_unique(security, lambda u: [f"SYNTHETIC SECURITY {x}" for x in u])
+
+    nbim = pd.DataFrame({
+        "COAC_EVENT_KEY": event_key,
+        "INSTRUMENT_DESCRIPTION": names,
+        "ISIN": isin,
+        "SEDOL": sedol,
+        "TICKER": _per_unique(security, lambda u: [f"SYN{x}" for x in u]),
+        "ORGANISATION_NAME": names,
+        "DIVIDENDS_PER_SHARE": dps,
+        "EXDATE": ex_s,
+        "PAYMENT_DATE": pay_s,
+        "CUSTODIAN": nbim_custodian,
+        "BANK_ACCOUNT": account,
+        "QUOTATION_CURRENCY": quote_ccy,
+        "SETTLEMENT_CURRENCY": settle_ccy,
+        "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO": nok_rate.round(6),
+        "NOMINAL_BASIS": nominal,
+        "GROSS_AMOUNT_QUOTATION": gross_q,
+        "NET_AMOUNT_QUOTATION": net_q,
+        "NET_AMOUNT_SETTLEMENT": net_s,
+        "GROSS_AMOUNT_PORTFOLIO": (gross_q * nok_rate).round(2),
+        "NET_AMOUNT_PORTFOLIO": (net_q * nok_rate).round(2),
+        "WTHTAX_COST_QUOTATION": tax_q,
+        "WTHTAX_COST_SETTLEMENT": tax_s,
+        "WTHTAX_COST_PORTFOLIO": (tax_q * nok_rate).round(2),
+        "WTHTAX_RATE": tax_pct,
+        "LOCALTAX_COST_QUOTATION": 0,
+        "LOCALTAX_COST_SETTLEMENT": 0,
+        "TOTAL_TAX_RATE": tax_pct,
+        "EXRESPRDIV_COST_QUOTATION": 0,
+        "EXRESPRDIV_COST_SETTLEMENT": 0,
+        "RESTITUTION_RATE": 0,
+    }, columns=NBIM_COLUMNS)
+
+    holding = nominal - loan
+    cust = pd.DataFrame({
+        "COAC_EVENT_KEY": event_key,
+        "ISIN": isin,
+        "EVENT_EX_DATE": ex_s,
+        "EVENT_PAYMENT_DATE": c_pay_s,
+        "CUSTODY": account,
+        "SEDOL": sedol,
+        "CUSTODIAN": cust_code,
+        "EVENT_TYPE": "DVCA",
+        "NOMINAL_BASIS": nominal,
+        "LOAN_QUANTITY": loan,
+        "HOLDING_QUANTITY": holding,
+        "LENDING_PERCENTAGE": (loan / nominal * 100).round(0),
+        "BANK_ACCOUNTS": account,
+        "EX_DATE": ex_s,
+        "RECORD_DATE": record_s,
+        "PAY_DATE": c_pay_s,
+        "CURRENCIES": np.where(cross, quote_ccy + " USD", quote_ccy),
+        "DIV_RATE": dps,
+        "TAX_RATE": tax_pct,
+        "GROSS_AMOUNT": c_gross,
+        "NET_AMOUNT_QC": (c_gross - c_tax).round(2),
+        "TAX": c_tax,
+        "NET_AMOUNT_SC": c_net_s,
+        "SETTLED_CURRENCY": settle_ccy,
+        "IS_CROSS_CURRENCY_REVERSAL": np.where(cross, "TRUE", "FALSE"),
+        "FX_RATE": c_fx,
+        "POSSIBLE_RESTITUTION_PAYMENT": 0,
+        "POSSIBLE_RESTITUTION_AMOUNT": 0,
+        "ADR_FEE": adr_fee,
+        "ADR_FEE_RATE": np.where(adr_fee > 0, 0.02, 0.0),
+    }, columns=CUSTODY_COLUMNS)
+
+    # Orphans: drop bookings from one side only
+    orphan = rng.random(n) < orphan_rate
+    side = rng.random(n) < 0.5
+    nbim = nbim[~(orphan & side)].reset_index(drop=True)
+    cust = cust[~(orphan & ~side)].reset_index(drop=True)
+    return nbim, cust
+
+
+def write_pair(nbim: pd.DataFrame, cust: pd.DataFrame, out_dir: Path, stem: str = "synthetic") -> Tuple[Path, Path]:
+    """Write both frames like the real feeds: semicolon separated, UTF-8 with BOM."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    nbim_path = out_dir / f"NBIM_{stem}.csv"
+    cust_path = out_dir / f"CUSTODY_{stem}.csv"
+    nbim.to_csv(nbim_path, sep=";", index=False, encoding="utf-8-sig")
+    cust.to_csv(cust_path, sep=";", index=False, encoding="utf-8-sig")
+    return nbim_path, cust_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic NBIM/custodian CSV pairs.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--out-dir", type=Path, default=Path("."))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--break-rate", type=float, default=0.01, help="Rate for every break type")
+    parser.add_argument("--cross-currency-share", type=float, default=0.1)
+    parser.add_argument("--max-accounts-per-event", type=int, default=4)
+    parser.add_argument("--orphan-rate", type=float, default=0.005)
+    args = parser.parse_args()
+
+    nbim, cust = generate(
+        args.rows, seed=args.seed,
+        break_rates={b: args.break_rate for b in BREAK_TYPES},
+        cross_currency_share=args.cross_currency_share,
+        max_accounts_per_event=args.max_accounts_per_event,
+        orphan_rate=args.orphan_rate,
+    )
+    for path in write_pair(nbim, cust, args.out_dir, stem=f"{args.rows}"):
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# recon/view.py
+"""
+Server-side filtering and paging of a report, for the Streamlit app.
+
+ReportView factorizes the filter columns once (break_mask bits, CUSTODIAN,
+needs_human); each filter change is then a few vectorized comparisons over
+integer arrays, and only the rows of the requested page are materialized and
+sent to the browser.
+"""
+from __future__ import annotations
+from typing import Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from .schemas import BREAK_BITS
+
+NO_CUSTODIAN = "(none)"
+
+
+class ReportView:
+    def __init__(self, report: pd.DataFrame):
+        self.report = report
+        n = len(report)
+        self._mask = (report["break_mask"].to_numpy(np.int64) if "break_mask" in report.columns
+                      else np.zeros(n, dtype=np.int64))
+        if "CUSTODIAN" in report.columns:
+            codes, uniques = pd.factorize(report["CUSTODIAN"], sort=True)
+        else:
+            codes, uniques = np.full(n, -1), []
+        self._custodian = codes
+        self._custodians = [str(u) for u in uniques]
+        human = report["needs_human"] if "needs_human" in report.columns else pd.Series(pd.NA, index=report.index)
+        # 1 / 0 / -1 (not classified)
+        self._human = np.where(human.isna(), -1, human.fillna(False).astype(bool).astype(np.int8)).astype(np.int8)
+
+    def break_codes(self) -> List[str]:
+        """MATCHED (if any row is) and every break code some row carries, in BREAK_BITS order."""
+        present = np.bitwise_or.reduce(self._mask) if len(self._mask) else 0
+        codes = [code for code, bit in BREAK_BITS.items() if present & bit]
+        return (["MATCHED"] if (self._mask == 0).any() else []) + codes
+
+    def custodians(self) -> List[str]:
+        return self._custodians + ([NO_CUSTODIAN] if (self._custodian < 0).any() else [])
+
+    def counts(self) -> dict:
+        return {
+            "rows": len(self._mask),
+            "matched": int((self._mask == 0).sum()),
+            "breaks": int((self._mask != 0).sum()),
+            "needs_human": int((self._human == 1).sum()),
+        }
+
+    def select(
+        self,
+        codes: Iterable[str] = (),
+        custodians: Iterable[str] = (),
+        needs_human: Optional[bool] = None,
+    ) -> np.ndarray:
+        """
+        Row positions passing every given filter (empty selections don't filter).
+        - codes: rows carrying any of the break codes; MATCHED selects break_mask == 0.
+        - custodians: CUSTODIAN values; NO_CUSTODIAN selects rows without one.
+        - needs_human: True / False keeps rows the LLM flagged / cleared.
+        """
+        keep = np.ones(len(self._mask), dtype=bool)
+        codes = list(codes)
+        if codes:
+            bits = 0
+            for code in codes:
+                bits |= BREAK_BITS.get(code, 0)
+            keep &= ((self._mask & bits) != 0) | (("MATCHED" in codes) & (self._mask == 0))
+        custodians = list(custodians)
+        if custodians:
+            wanted = [self._custodians.index(c) for c in custodians if c in self._custodians]
+            if NO_CUSTODIAN in custodians:
+                wanted.append(-1)
+            keep &= np.isin(self._custodian, wanted)
+        if needs_human is not None:
+            keep &= self._human == int(needs_human)
+        return np.flatnonzero(keep)
+
+    def page(self, rows: np.ndarray, page: int, size: int) -> pd.DataFrame:
+        """One page (0-based) of the selected rows; only these rows are copied."""
+        return self.report.iloc[rows[page * size:(page + 1) * size]]
@@ -0,0 +1,66 @@
+# tests/test_cache.py
+"""
+Minimal critical tests for the on-disk LLM classification cache.
+Tests: round trip, persistence without close, TTL expiry, LRU eviction, key stability.
+"""
+import time
+from recon.cache import LLMCache
+from recon.llm import cache_key
+from recon.schemas import LLMResult
+
+RESULT = LLMResult(break_code="TAX_MISMATCH", confidence=0.9,
+                   explanation_one_liner="Tax differs.", proposed_action="Check treaty rate.",
+                   needs_human=True)
+
+
+def test_round_trip_and_stats(tmp_path):
+    """Critical: Stored results come back intact and hits/misses are counted"""
+    cache = LLMCache(tmp_path / "c.sqlite")
+
+    assert cache.get("k") is None
+    cache.put("k", RESULT)
+
+    assert cache.get("k") == RESULT
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_survive_without_close(tmp_path):
+    """Critical: A run that dies before close() keeps the classifications it paid for"""
+    cache = LLMCache(tmp_path / "c.sqlite")
+    cache.put("k", RESULT)
+
+    reopened = LLMCache(tmp_path / "c.sqlite")
+
+    assert reopened.get("k") == RESULT
+
+
+def test_ttl_expiry(tmp_path):
+    """Critical: Entries older than the TTL are treated as misses"""
+    cache = LLMCache(tmp_path / "c.sqlite", ttl_seconds=0.05)
+    cache.put("k", RESULT)
+    time.sleep(0.1)
+
+    assert cache.get("k") is None
+
+
+def test_lru_eviction(tmp_path):
+    """Critical: Least recently used entries are dropped beyond max_entries"""
+    cache = LLMCache(tmp_path / "c.sqlite", max_entries=2)
+    for k in ("a", "b", "c"):
+        cache.put(k, RESULT)
+        time.sleep(0.01)
+    cache.get("a")  # touch: "b" is now the oldest
+
+    cache.evict()
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == RESULT
+
+
+def test_cache_key_uses_slim_payload():
+    """Critical: Columns not sent to the LLM don't change the key; sent ones do"""
+    row = {"ISIN": "US01", "RECON_STATUS": "TAX_MISMATCH", "TAX": 10.0}
+
+    assert cache_key(row) == cache_key({**row, "_merge": "both"})
+    assert cache_key(row) != cache_key({**row, "TAX": 11.0})
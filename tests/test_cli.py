@@ -1,7 +1,7 @@
 # tests/test_cli.py
 """
 Minimal critical tests for CLI interface.
-Tests: basic execution, output creation, help text.
+Tests: basic execution, output creation, help text, Parquet in/out.
 """
 import tempfile
 from pathlib import Path
@@ -136,4 +136,38 @@ def test_cli_budget_cap():
         ])
         
         # Should still complete successfully
-        assert result.exit_code == 0
\ No newline at end of file
+        assert result.exit_code == 0
+
+def test_cli_duplicate_keys(tmp_path):
+    """Critical: Duplicate keys fail with exit code 1 by default; --duplicates aggregate writes the key list"""
+    nbim_path, cust_path, out_path = tmp_path / "nbim.csv", tmp_path / "cust.csv", tmp_path / "out.csv"
+    pd.DataFrame({"COAC_EVENT_KEY": [1], "ISIN": ["US01"], "BANK_ACCOUNT": ["A"],
+                  "GROSS_AMOUNT_QUOTATION": [100], "QUOTATION_CURRENCY": ["USD"]}).to_csv(nbim_path, sep=";", index=False)
+    pd.DataFrame({"COAC_EVENT_KEY": [1, 1], "ISIN": ["US01", "US01"], "CUSTODY": ["A", "A"],
+                  "GROSS_AMOUNT": [60, 40], "SETTLED_CURRENCY": ["USD", "USD"]}).to_csv(cust_path, sep=";", index=False)
+    args = ["--nbim", str(nbim_path), "--cust", str(cust_path), "--out", str(out_path)]
+
+    failed = runner.invoke(app, args)
+    assert failed.exit_code == 1
+    assert "duplicate rows" in failed.output
+
+    result = runner.invoke(app, [*args, "--duplicates", "aggregate"])
+    assert result.exit_code == 0
+    assert pd.read_csv(out_path)["GROSS_AMOUNT"].tolist() == [100.0]
+    assert pd.read_csv(tmp_path / "out_duplicate_keys.csv")["cust_rows"].tolist() == [2]
+
+
+def test_cli_parquet_partitioned_output(tmp_path):
+    """Critical: Parquet feeds in, a status-partitioned Parquet report out; CSV can't be partitioned"""
+    pd.DataFrame({"COAC_EVENT_KEY": [1, 2], "ISIN": ["US01", "US02"], "BANK_ACCOUNT": ["A", "A"],
+                  "GROSS_AMOUNT_QUOTATION": [100.0, 50.0], "QUOTATION_CURRENCY": ["USD", "USD"]}).to_parquet(tmp_path / "nbim.parquet")
+    pd.DataFrame({"COAC_EVENT_KEY": [1, 2], "ISIN": ["US01", "US02"], "CUSTODY": ["A", "A"],
+                  "GROSS_AMOUNT": [100.0, 55.0], "SETTLED_CURRENCY": ["USD", "USD"]}).to_parquet(tmp_path / "cust.parquet")
+    args = ["--nbim", str(tmp_path / "nbim.parquet"), "--cust", str(tmp_path / "cust.parquet")]
+
+    result = runner.invoke(app, args + ["--out", str(tmp_path / "out.parquet"), "--partition-by", "status"])
+
+    assert result.exit_code == 0, result.output
+    report = pd.read_parquet(tmp_path / "out.parquet")
+    assert sorted(report["RECON_STATUS"].astype(str)) == ["GROSS_MISMATCH", "MATCHED"]
+    assert runner.invoke(app, args + ["--out", str(tmp_path / "out.csv"), "--partition-by", "status"]).exit_code != 0
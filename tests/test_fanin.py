@@ -0,0 +1,76 @@
+# tests/test_fanin.py
+"""
+Minimal critical tests for one-NBIM-against-many-custodians fan-in.
+Tests: same report as one merged custodian feed, uncovered NBIM rows, shared keys, workers, CLI --cust-dir.
+"""
+from pathlib import Path
+import pandas as pd
+from typer.testing import CliRunner
+from recon.cli import app
+from recon.fanin import custodian_files, reconcile_fanin
+from recon.loader import read_custody, read_nbim
+from recon.rules import reconcile
+from recon.synth import generate, write_pair
+
+runner = CliRunner()
+
+
+def _split_custodians(tmp: Path, skip_last: bool = True):
+    """Synthetic book with the custodian side split into one file per custodian (the last one withheld)."""
+    nbim, cust = generate(3_000, seed=5)
+    nbim_path, _ = write_pair(nbim, cust, tmp)
+    groups = list(cust.groupby("CUSTODIAN"))
+    cust_dir = tmp / "custodians"
+    cust_dir.mkdir()
+    for name, part in groups[:-1] if skip_last else groups:
+        part.to_csv(cust_dir / f"{name.replace('/', '_')}.csv", sep=";", index=False)
+    return nbim_path, cust_dir, groups[-1][1]
+
+
+def test_fanin_matches_single_merged_feed(tmp_path):
+    """Critical: Fan-in gives the report of one run against all files (orphans paired across files); uncovered NBIM rows stay unmatched"""
+    nbim_path, cust_dir, withheld = _split_custodians(tmp_path)
+    files = custodian_files(cust_dir)
+    merged = pd.concat([read_custody(f) for f in files], ignore_index=True)
+
+    report, summary = reconcile_fanin(read_nbim(nbim_path), files, workers=1)
+
+    expected = reconcile(read_nbim(nbim_path), merged)
+    pd.testing.assert_frame_equal(report.drop(columns="cust_file"), expected, check_dtype=False, check_categorical=False)
+    uncovered = report[report["cust_file"] == ""]
+    assert (uncovered["_merge"] == "right_only").all()
+    assert set(withheld["COAC_EVENT_KEY"].astype(str)) <= set(uncovered["COAC_EVENT_KEY"])
+    assert summary["cust_file"].tolist() == [f.name for f in files] + [""]
+    assert summary["cust_rows"].iloc[:-1].sum() == len(merged)
+    assert summary["nbim_rows"].sum() == len(read_nbim(nbim_path))
+
+
+def test_shared_keys_and_workers(tmp_path):
+    """Critical: A key in two custodian files is reconciled against each; results don't depend on workers"""
+    nbim_path, cust_dir, _ = _split_custodians(tmp_path)
+    first = custodian_files(cust_dir)[0]
+    (cust_dir / "copy.csv").write_bytes(first.read_bytes())
+    files = custodian_files(cust_dir)
+
+    single, summary = reconcile_fanin(read_nbim(nbim_path), files, workers=1)
+    multi, _ = reconcile_fanin(read_nbim(nbim_path), files, workers=2)
+
+    pd.testing.assert_frame_equal(single, multi, check_dtype=False, check_categorical=False)
+    shared = summary.set_index("cust_file")["shared_keys"]
+    assert shared["copy.csv"] == shared[first.name] == summary.set_index("cust_file")["nbim_rows"]["copy.csv"]
+
+
+def test_cli_cust_dir(tmp_path):
+    """Critical: CLI --cust-dir writes the combined report and a per-custodian summary; --cust conflicts"""
+    nbim_path, cust_dir, _ = _split_custodians(tmp_path)
+    out = tmp_path / "out.csv"
+
+    result = runner.invoke(app, ["--nbim", str(nbim_path), "--cust-dir", str(cust_dir), "--out", str(out)])
+
+    assert result.exit_code == 0, result.output
+    assert "(no custodian)" in result.output
+    summary = pd.read_csv(tmp_path / "out_custodians.csv", keep_default_na=False)
+    assert len(summary) == len(custodian_files(cust_dir)) + 1
+    assert "cust_file" in pd.read_csv(out).columns
+    conflict = runner.invoke(app, ["--nbim", str(nbim_path), "--cust-dir", str(cust_dir), "--cust", str(nbim_path)])
+    assert conflict.exit_code != 0
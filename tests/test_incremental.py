@@ -0,0 +1,161 @@
+# tests/test_incremental.py
+"""
+Minimal critical tests for reusing LLM results between runs.
+Tests: enrich reuse equals a full enrich, skipped breaks retried, config change, no pickle, CLI --state,
+hashes independent of the other rows.
+"""
+import pickle
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+from recon.cli import app
+from recon.incremental import enrich_incremental, key_hashes
+from recon.loader import read_custody, read_nbim
+from recon.rules import reconcile
+
+pq = pytest.importorskip("pyarrow.parquet")
+runner = CliRunner()
+
+
+def _write_feeds(tmp: Path, n: int = 200):
+    rng = np.random.default_rng(11)
+    events = np.arange(n) // 2 + 960_000_000
+    nbim = pd.DataFrame({
+        "COAC_EVENT_KEY": events,
+        "ISIN": [f"NO{e % 13:010d}" for e in events],
+        "BANK_ACCOUNT": np.arange(n) % 2 + 712_000_000,
+        "PAYMENT_DATE": "14.02.2025",
+        "SETTLEMENT_CURRENCY": "NOK",
+        "QUOTATION_CURRENCY": "NOK",
+        "GROSS_AMOUNT_QUOTATION": rng.uniform(1_000, 9_000, n).round(2),
+    })
+    cust = nbim.rename(columns={
+        "BANK_ACCOUNT": "CUSTODY",
+        "PAYMENT_DATE": "EVENT_PAYMENT_DATE",
+        "SETTLEMENT_CURRENCY": "SETTLED_CURRENCY",
+        "GROSS_AMOUNT_QUOTATION": "GROSS_AMOUNT",
+    }).drop(columns="QUOTATION_CURRENCY")
+    nbim_path, cust_path = tmp / "nbim.csv", tmp / "cust.csv"
+    nbim.iloc[3:].to_csv(nbim_path, sep=";", index=False)
+    cust.iloc[:-3].to_csv(cust_path, sep=";", index=False)
+    return nbim_path, cust_path
+
+
+def _amend(path: Path, line: int, old: bytes, new: bytes):
+    lines = path.read_bytes().split(b"\n")
+    lines[line] = lines[line].replace(old, new)
+    path.write_bytes(b"\n".join(lines))
+
+
+def _full(nbim_path, cust_path, **kwargs):
+    return reconcile(read_nbim(nbim_path), read_custody(cust_path), **kwargs)
+
+
+def _enricher(seen: list):
+    def enrich(report):
+        seen.append(len(report))
+        return report.assign(break_code=report["RECON_STATUS"].str.split(" | ").str[0], confidence=0.5)
+    return enrich
+
+
+def test_unchanged_rows_reuse_enrich_columns(tmp_path):
+    """Critical: enrich only sees rows it has no result for; reused columns match a full enrich"""
+    nbim_path, cust_path = _write_feeds(tmp_path)
+    state = tmp_path / "state.parquet"
+    seen = []
+    enrich = _enricher(seen)
+
+    enrich_incremental(_full(nbim_path, cust_path), state, enrich)
+    _amend(nbim_path, 10, b"NOK", b"USD")
+    report = _full(nbim_path, cust_path)
+    stats = {}
+
+    out = enrich_incremental(report, state, enrich, stats=stats)
+
+    pd.testing.assert_frame_equal(out, enrich(report), check_dtype=False, check_categorical=False)
+    assert seen[1] == 1 and stats["enrich_reused"] == len(report) - 1
+
+
+def test_breaks_without_result_are_retried(tmp_path):
+    """Critical: Breaks the budget left unclassified aren't stored, so the next run sends them again"""
+    nbim_path, cust_path = _write_feeds(tmp_path)
+    state = tmp_path / "state.parquet"
+    report = _full(nbim_path, cust_path)
+    breaks = int((report["RECON_STATUS"] != "MATCHED").sum())
+
+    enrich_incremental(report, state, lambda r: r.assign(break_code=None))
+    seen = []
+    stats = {}
+    enrich_incremental(report, state, _enricher(seen), stats=stats)
+
+    assert seen == [breaks] and stats["enrich_reused"] == len(report) - breaks
+
+
+def test_config_change_ignores_store(tmp_path):
+    """Critical: A store written for another model or prompt is not reused"""
+    nbim_path, cust_path = _write_feeds(tmp_path)
+    state = tmp_path / "state.parquet"
+    report = _full(nbim_path, cust_path)
+    seen = []
+    enrich_incremental(report, state, _enricher(seen), config={"model": "a"})
+    stats = {}
+
+    enrich_incremental(report, state, _enricher(seen), config={"model": "b"}, stats=stats)
+
+    assert seen == [len(report), len(report)] and stats["enrich_reused"] == 0
+
+
+class _Payload:
+    """Touches `target` when unpickled."""
+
+    def __init__(self, target: Path):
+        self.target = target
+
+    def __reduce__(self):
+        return (Path.touch, (self.target,))
+
+
+def test_store_is_parquet_and_never_unpickled(tmp_path):
+    """Critical: The store is Parquet + JSON metadata; a pickle at the --state path is ignored, not loaded"""
+    nbim_path, cust_path = _write_feeds(tmp_path)
+    state = tmp_path / "state.parquet"
+    report = _full(nbim_path, cust_path)
+
+    enrich_incremental(report, state, _enricher([]))
+    assert b"recon_state" in pq.read_schema(state).metadata
+
+    state.write_bytes(pickle.dumps(_Payload(tmp_path / "pwned")))
+    seen = []
+    enrich_incremental(report, state, _enricher(seen))
+
+    assert not (tmp_path / "pwned").exists()
+    assert seen == [len(report)]
+
+
+def test_cli_state_flag(tmp_path, monkeypatch):
+    """Critical: CLI --state reuses stored LLM results on the second run and needs --use-llm"""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    nbim_path, cust_path = _write_feeds(tmp_path)
+    args = ["--nbim", str(nbim_path), "--cust", str(cust_path), "--out", str(tmp_path / "out.csv"),
+            "--state", str(tmp_path / "state.parquet")]
+
+    first = runner.invoke(app, args + ["--use-llm"])
+    second = runner.invoke(app, args + ["--use-llm", "--workers", "2"])
+
+    assert first.exit_code == 0 and second.exit_code == 0, second.output
+    rows = len(pd.read_csv(tmp_path / "out.csv"))
+    assert f"LLM results reused from {tmp_path / 'state.parquet'}: {rows} of {rows} rows" in second.output
+    assert runner.invoke(app, args).exit_code != 0
+
+
+def test_key_hash_depends_only_on_the_key():
+    """Critical: A key hashes the same whatever else is in the frame (longer values, multi-byte text, dtype)"""
+    keys = pd.DataFrame({"COAC_EVENT_KEY": ["1", "2"], "ISIN": ["NO1", "NO2"], "BANK_ACCOUNT": ["7", "8"]})
+    other = pd.DataFrame({
+        "COAC_EVENT_KEY": ["1" * 40, "Ørsted", "1"], "ISIN": ["X", "ÆØÅ", "NO1"], "BANK_ACCOUNT": ["7", "8", "7"],
+    }).astype("str")
+
+    assert key_hashes(keys)[0] == key_hashes(other)[2]
+    assert len(set(key_hashes(other))) == 3
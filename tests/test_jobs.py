@@ -0,0 +1,89 @@
+# tests/test_jobs.py
+"""
+Minimal critical tests for background LLM classification jobs.
+Tests: same output as classify_report, cancel keeps partial results and refunds budget, resume.
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+import pandas as pd
+from recon.jobs import ClassifyJob
+from recon.llm import classify_report
+
+
+def _report(n=6):
+    return pd.DataFrame({
+        "COAC_EVENT_KEY": list(range(n)) + [99],
+        "RECON_STATUS": ["NET_MISMATCH"] * n + ["MATCHED"],
+        "net_diff": [float(-100 * (i + 1)) for i in range(n)] + [0.0],
+    })
+
+
+class _SlowClient:
+    """Stands in for AsyncOpenAI; each request takes a moment so a job can be stopped mid-way."""
+    made = closed = 0
+
+    def __init__(self, **kwargs):
+        self.chat = self
+        self.completions = self
+        type(self).made += 1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        type(self).closed += 1
+        return False
+
+    async def create(self, messages, **kwargs):
+        await asyncio.sleep(0.05)
+        content = json.dumps({"break_code": "NET_MISMATCH", "confidence": 0.7,
+                              "explanation_one_liner": "x", "proposed_action": "y",
+                              "needs_human": True})
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def test_job_matches_classify_report(monkeypatch):
+    """Critical: A finished job yields the same report as the blocking call"""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    report = _report()
+
+    job = ClassifyJob(report, max_calls=4, dedupe=False).start()
+    assert job.wait(5)
+
+    expected = classify_report(report, max_calls=4, dedupe=False)
+    pd.testing.assert_frame_equal(job.report(), expected)
+    assert job.finished and job.progress() == (4, 4)
+    assert job.stats["calls"] == 4
+
+
+def test_cancel_keeps_results_and_resumes(monkeypatch):
+    """Critical: Stopping keeps what is classified, gives back unspent budget, resume finishes"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("recon.llm.AsyncOpenAI", _SlowClient)
+    _SlowClient.made = _SlowClient.closed = 0
+    report = _report()
+
+    job = ClassifyJob(report, max_calls=10, concurrency=1, dedupe=False).start()
+    deadline = time.monotonic() + 5
+    while job.progress()[0] < 1 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    job.cancel()
+    assert job.wait(5)
+
+    done, total = job.progress()
+    assert 1 <= done < total == 6
+    assert job.stats["calls"] == done       # cancelled requests don't count against max_calls
+    assert job.cost() > 0
+    partial = job.report()
+    assert partial["break_code"].notna().sum() == done
+    assert not job.finished
+
+    job.start()
+    assert job.wait(5)
+    assert job.finished and job.progress() == (6, 6)
+    assert job.stats["calls"] == 6
+    assert job.report()["break_code"].iloc[:6].notna().all()
+    assert _SlowClient.made == _SlowClient.closed == 2   # each run's thread closes its client
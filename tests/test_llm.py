@@ -1,10 +1,10 @@
 # tests/test_llm.py
 """
 Minimal critical tests for LLM classification module.
-Tests: fallback behavior, matched skipping, valid outputs.
+Tests: fallback behavior, matched skipping, valid outputs, async batching, client pooling, bulk fallback.
 """
 import pytest
-from recon.llm import classify_break
+from recon.llm import classify_break, classify_breaks
 from recon.schemas import LLMResult
 
 
@@ -68,4 +68,238 @@ def test_handles_unknown_break_types():
     
     assert result.break_code == "OTHER"
     assert result.needs_human is True
-    assert len(result.proposed_action) > 0
\ No newline at end of file
+    assert len(result.proposed_action) > 0
+
+class _FakeAsyncClient:
+    """Stands in for AsyncOpenAI: tracks in-flight requests, fails on demand."""
+    in_flight = 0
+    peak = 0
+
+    def __init__(self, **kwargs):
+        self.chat = self
+        self.completions = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def create(self, messages, **kwargs):
+        import asyncio, json
+        from types import SimpleNamespace
+        cls = type(self)
+        cls.in_flight += 1
+        cls.peak = max(cls.peak, cls.in_flight)
+        await asyncio.sleep(0.01)
+        cls.in_flight -= 1
+        if "FAIL" in messages[-1]["content"]:
+            raise RuntimeError("boom")
+        content = json.dumps({"break_code": "NET_MISMATCH", "confidence": 0.7,
+                              "explanation_one_liner": "x", "proposed_action": "y",
+                              "needs_human": True})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_async_batch_bounded_concurrency(monkeypatch):
+    """Critical: Batch API caps in-flight calls and falls back per failed row"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("recon.llm.AsyncOpenAI", _FakeAsyncClient)
+    _FakeAsyncClient.peak = 0
+
+    rows = [{"RECON_STATUS": "NET_MISMATCH", "ISIN": f"US{i}"} for i in range(20)]
+    rows[5] = {"RECON_STATUS": "TAX_MISMATCH", "ISIN": "FAIL"}
+    rows[6] = {"RECON_STATUS": "MATCHED"}
+
+    results = classify_breaks(rows, concurrency=4)
+
+    assert len(results) == 20
+    assert _FakeAsyncClient.peak == 4
+    assert results[0].break_code == "NET_MISMATCH"
+    assert results[5].break_code == "TAX_MISMATCH"  # _fb fallback for the failed call
+    assert results[6].break_code == "MATCHED"
+
+
+def test_async_client_is_pooled_across_calls(monkeypatch):
+    """Critical: Successive calls reuse one async client per key and endpoint; every client gets closed"""
+    import asyncio
+    from recon.llm import classify_breaks_async, close_thread_clients
+
+    class _CountingClient(_FakeAsyncClient):
+        made = closed = 0
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            type(self).made += 1
+
+        async def __aexit__(self, *exc):
+            type(self).closed += 1
+            return False
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("recon.llm.AsyncOpenAI", _CountingClient)
+    rows = [{"RECON_STATUS": "NET_MISMATCH", "ISIN": f"US{i}"} for i in range(3)]
+
+    classify_breaks(rows)
+    classify_breaks(rows)
+    assert (_CountingClient.made, _CountingClient.closed) == (1, 0)
+
+    asyncio.run(classify_breaks_async(rows))  # a caller's own loop gets a client scoped to the call
+    assert (_CountingClient.made, _CountingClient.closed) == (2, 1)
+
+    close_thread_clients()
+    assert _CountingClient.closed == 2
+
+
+def test_cache_hits_skip_calls_and_budget(monkeypatch, tmp_path):
+    """Critical: Cached breaks are served without an API call or budget use"""
+    from recon.cache import LLMCache
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("recon.llm.AsyncOpenAI", _FakeAsyncClient)
+    cache = LLMCache(tmp_path / "c.sqlite")
+    rows = [{"RECON_STATUS": "NET_MISMATCH", "ISIN": f"US{i}"} for i in range(3)]
+
+    first = {}
+    classify_breaks(rows, cache=cache, max_calls=2, stats=first)
+    second = {}
+    results = classify_breaks(rows, cache=cache, max_calls=1, stats=second)
+
+    assert first["calls"] == 2
+    assert second["calls"] == 1            # only the row that wasn't cached
+    assert all(r is not None for r in results)
+    assert cache.hits == 2
+
+
+class _FakeBatchClient(_FakeAsyncClient):
+    """Answers batch prompts with a JSON array: one malformed element, one missing."""
+    requests = 0
+
+    async def create(self, messages, **kwargs):
+        import json
+        from types import SimpleNamespace
+        type(self).requests += 1
+        items = json.loads(messages[-1]["content"].split("Data:\n", 1)[1])
+        out = []
+        for item in items:
+            if item["ISIN"] == "MISSING":
+                continue
+            el = {"id": item["id"], "break_code": "NET_MISMATCH", "confidence": 0.7,
+                  "explanation_one_liner": "x", "proposed_action": "y", "needs_human": True}
+            if item["ISIN"] == "BAD":
+                el["confidence"] = 7  # fails strict validation
+            out.append(el)
+        content = "```json\n" + json.dumps(out) + "\n```"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_batched_requests_validate_per_element(monkeypatch):
+    """Critical: One request per batch; bad elements fall back individually"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("recon.llm.AsyncOpenAI", _FakeBatchClient)
+    _FakeBatchClient.requests = 0
+    rows = [{"RECON_STATUS": "GROSS_MISMATCH", "ISIN": f"US{i}"} for i in range(10)]
+    rows[1]["ISIN"] = "BAD"
+    rows[2]["ISIN"] = "MISSING"
+
+    stats = {}
+    results = classify_breaks(rows, batch_size=4, max_calls=2, stats=stats)
+
+    assert _FakeBatchClient.requests == 2 == stats["calls"]  # budget counts requests, not rows
+    assert results[0].break_code == "NET_MISMATCH"
+    assert results[1].break_code == "GROSS_MISMATCH"  # _fb fallback
+    assert results[2].break_code == "GROSS_MISMATCH"  # _fb fallback
+    assert all(r is not None for r in results[:8])
+    assert results[8] is None and results[9] is None  # over budget
+
+
+def test_dedupe_fans_out_one_result_per_group(monkeypatch):
+    """Critical: Breaks with the same signature cost one call and all get the result"""
+    import pandas as pd
+    from recon.llm import classify_report
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    report = pd.DataFrame({
+        "COAC_EVENT_KEY": [970456789] * 4 + [960789012],
+        "RECON_STATUS": ["NET_MISMATCH"] * 4 + ["NET_MISMATCH"],
+        "SETTLED_CURRENCY": "CHF",
+        "QUOTATION_CURRENCY": "CHF",
+        "NET_AMOUNT_SETTLEMENT": [1000.0, 2000.0, 3000.0, 1000.0, 1000.0],
+        "net_diff": [-50.0, -100.0, -150.0, -300.0, -50.0],  # 5%, 5%, 5%, 30%, other event
+    })
+
+    stats = {}
+    out = classify_report(report, max_calls=100, stats=stats)
+
+    assert stats["calls"] == 3
+    assert out["break_code"].notna().all()
+    assert out.loc[0, "llm_group"] == out.loc[1, "llm_group"] == out.loc[2, "llm_group"]
+    assert out.loc[3, "llm_group"] != out.loc[0, "llm_group"]
+    assert out.loc[4, "llm_group"] != out.loc[0, "llm_group"]
+
+
+def test_budget_goes_to_largest_impact_first(monkeypatch):
+    """Critical: With a tight budget the biggest monetary breaks are classified"""
+    import pandas as pd
+    from recon.llm import classify_report
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    report = pd.DataFrame({
+        "COAC_EVENT_KEY": [1, 2, 3, 4],
+        "RECON_STATUS": ["NET_MISMATCH", "NET_MISMATCH", "MISSING_IN_NBIM", "NET_MISMATCH"],
+        "SETTLEMENT_CURRENCY": ["USD", "KRW", None, "USD"],
+        "QUOTATION_CURRENCY": ["USD", "KRW", None, "USD"],
+        "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO": [10.0, 0.01, None, 10.0],
+        "GROSS_AMOUNT": [None, None, 5_000.0, None],
+        "net_diff": [-100.0, 50_000.0, None, 20.0],  # 1000 NOK, 500 NOK, gross 5000, 200 NOK
+    })
+
+    out = classify_report(report, max_calls=2)
+
+    assert out["break_code"].notna().tolist() == [True, False, True, False]
+
+
+def test_missing_rows_convert_gross_with_quotation_currency(monkeypatch):
+    """Critical: A missing KRW-quoted, USD-settled booking is valued at the KRW rate, not the USD one"""
+    import pandas as pd
+    from recon.llm import break_impact, classify_report
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    report = pd.DataFrame({
+        "COAC_EVENT_KEY": [1, 2, 3, 4],
+        "RECON_STATUS": ["MISSING_IN_CUSTODY", "NET_MISMATCH", "MISSING_IN_NBIM", "NET_MISMATCH"],
+        "SETTLEMENT_CURRENCY": ["USD", "USD", None, "USD"],
+        "SETTLED_CURRENCY": [None, "USD", "USD", "USD"],
+        "QUOTATION_CURRENCY": ["KRW", "USD", None, "USD"],
+        "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO": [0.008, 10.0, None, 10.0],
+        "GROSS_AMOUNT_QUOTATION": [1_000_000.0, None, None, None],
+        "GROSS_AMOUNT": [None, None, 2_000_000.0, None],    # KRW, but the custodian row has no quotation currency
+        "NET_AMOUNT_SC": [None, None, 1_200.0, None],        # USD
+        "net_diff": [None, 1_000.0, None, 500.0],
+    })
+
+    impact = break_impact(report, rates={"USD": 10.0, "KRW": 0.008})
+
+    assert impact.tolist() == pytest.approx([8_000.0, 10_000.0, 12_000.0, 5_000.0])
+    assert impact.sort_values(ascending=False).index.tolist() == [2, 1, 0, 3]
+    out = classify_report(report, max_calls=2)
+    assert out["break_code"].notna().tolist() == [False, True, True, False]
+
+
+def test_bulk_fallback_matches_per_row(monkeypatch):
+    """Critical: Vectorized fallback equals _fb row by row, first _FALLBACK match winning"""
+    import pandas as pd
+    from recon.llm import _attach, _fb, classify_report, fallback_columns
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    statuses = ["NET_MISMATCH", "TAX_MISMATCH|NET_MISMATCH", "IDENTIFIER_MISMATCH|DATE_MISMATCH",
+                "MISSING_IN_NBIM", "MATCHED", "FX_VARIANCE|ADR_FEE_HANDLING", "NET_MISMATCH"]
+    status = pd.Series(statuses, index=[10, 3, 7, 1, 0, 5, 2])
+
+    bulk = fallback_columns(status)
+    expected = pd.DataFrame([_fb(s).model_dump() for s in statuses], index=status.index)
+    pd.testing.assert_frame_equal(bulk, expected)
+    assert bulk["break_code"].tolist()[:3] == ["NET_MISMATCH", "NET_MISMATCH", "IDENTIFIER_MISMATCH"]
+
+    report = pd.DataFrame({"RECON_STATUS": status, "net_diff": range(7)})
+    stats = {}
+    out = classify_report(report, max_calls=100, dedupe=False, stats=stats)
+    breaks = report.index[report["RECON_STATUS"] != "MATCHED"]
+    per_row = _attach(report, breaks, [_fb(s) for s in report.loc[breaks, "RECON_STATUS"]], None)
+    pd.testing.assert_frame_equal(out, per_row)
+    assert stats["calls"] == 6 and stats["fallbacks"] == {"no_key": 6}
@@ -0,0 +1,114 @@
+# tests/test_loader.py
+"""
+Minimal critical tests for typed, column-pruned feed loading.
+Tests: declared dtypes and pruning, BOM header, file objects, same report as untyped loading, C-reader fallback,
+Parquet/Arrow feeds and report output, partitioned output.
+"""
+import io
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from recon.loader import CUSTODY_SCHEMA, NBIM_SCHEMA, read_custody, read_nbim, write_report
+from recon.rules import reconcile
+
+REPO = Path(__file__).resolve().parent.parent
+NBIM_CSV = REPO / "NBIM_Dividend_Bookings 1 (2).csv"
+CUST_CSV = REPO / "CUSTODY_Dividend_Bookings 1 (2).csv"
+
+
+def test_declared_columns_and_dtypes():
+    """Critical: Only schema columns are loaded, with identifiers as text and codes as categoricals"""
+    nbim, cust = read_nbim(NBIM_CSV), read_custody(CUST_CSV)
+
+    assert set(nbim.columns) <= set(NBIM_SCHEMA) and set(cust.columns) <= set(CUSTODY_SCHEMA)
+    assert "SEDOL" not in cust.columns and "RESTITUTION_RATE" not in nbim.columns
+    assert nbim["COAC_EVENT_KEY"].iloc[0] == "950123456"
+    assert isinstance(nbim["QUOTATION_CURRENCY"].dtype, pd.CategoricalDtype)
+    assert isinstance(cust["SETTLED_CURRENCY"].dtype, pd.CategoricalDtype)
+    assert cust["GROSS_AMOUNT"].dtype == np.float64
+
+
+def test_bom_header_and_file_object():
+    """Critical: A BOM before the first header doesn't hide COAC_EVENT_KEY; uploads load like paths"""
+    raw = CUST_CSV.read_bytes()
+    assert raw.startswith(b"\xef\xbb\xbf")
+
+    from_file = read_custody(io.BytesIO(raw))
+
+    assert from_file.columns[0] == "COAC_EVENT_KEY"
+    pd.testing.assert_frame_equal(from_file, read_custody(CUST_CSV))
+
+
+def test_missing_columns_and_empty_fields(tmp_path):
+    """Critical: Absent schema columns are skipped and empty fields load as missing"""
+    path = tmp_path / "cust.csv"
+    path.write_text("COAC_EVENT_KEY;ISIN;CUSTODY;GROSS_AMOUNT;SETTLED_CURRENCY;EXTRA\n1;US01;;;USD;x\n")
+
+    cust = read_custody(path)
+
+    assert list(cust.columns) == ["COAC_EVENT_KEY", "ISIN", "CUSTODY", "GROSS_AMOUNT", "SETTLED_CURRENCY"]
+    assert cust["CUSTODY"].isna().all() and cust["GROSS_AMOUNT"].isna().all()
+
+
+def test_same_report_as_untyped_loading():
+    """Critical: Typed loading gives the same statuses and deltas as plain read_csv"""
+    typed = reconcile(read_nbim(NBIM_CSV), read_custody(CUST_CSV))
+    plain = reconcile(pd.read_csv(NBIM_CSV, sep=";"), pd.read_csv(CUST_CSV, sep=";"))
+
+    assert list(typed.columns) == list(plain.columns)
+    assert typed["RECON_STATUS"].tolist() == plain["RECON_STATUS"].tolist()
+    pd.testing.assert_frame_equal(typed[["break_mask", "net_diff", "tax_diff"]], plain[["break_mask", "net_diff", "tax_diff"]])
+
+
+def test_pandas_reader_fallback(monkeypatch):
+    """Critical: Without pyarrow the C reader produces the same typed frame"""
+    arrow = read_nbim(NBIM_CSV)
+    monkeypatch.setattr("recon.loader.pacsv", None)
+
+    pd.testing.assert_frame_equal(read_nbim(NBIM_CSV), arrow, check_categorical=False)
+
+
+def test_columnar_feeds_match_csv(tmp_path):
+    """Critical: Parquet/Arrow feeds load pruned and typed (int IDs as text, typed dates kept) and reconcile like the CSVs"""
+    nbim = pd.read_csv(NBIM_CSV, sep=";")
+    nbim["PAYMENT_DATE"] = pd.to_datetime(nbim["PAYMENT_DATE"], format="%d.%m.%Y").dt.date
+    nbim.to_parquet(tmp_path / "nbim.parquet")
+    pd.read_csv(CUST_CSV, sep=";", encoding="utf-8-sig").to_feather(tmp_path / "cust.arrow")
+
+    nbim_df, cust_df = read_nbim(tmp_path / "nbim.parquet"), read_custody(tmp_path / "cust.arrow")
+
+    assert set(nbim_df.columns) <= set(NBIM_SCHEMA) and "SEDOL" not in cust_df.columns
+    assert nbim_df["COAC_EVENT_KEY"].iloc[0] == "950123456"
+    assert pd.api.types.is_datetime64_dtype(nbim_df["PAYMENT_DATE"])
+    assert isinstance(cust_df["SETTLED_CURRENCY"].dtype, pd.CategoricalDtype)
+    expected = reconcile(read_nbim(NBIM_CSV), read_custody(CUST_CSV))
+    pd.testing.assert_frame_equal(reconcile(nbim_df, cust_df), expected, check_dtype=False, check_categorical=False)
+
+
+def test_write_report_formats_and_partitions(tmp_path):
+    """Critical: Parquet/Arrow reports keep column types; partitioned output splits on the column"""
+    report = reconcile(read_nbim(NBIM_CSV), read_custody(CUST_CSV))
+
+    write_report(report, tmp_path / "r.parquet")
+    write_report(report, tmp_path / "r.arrow")
+    write_report(report, tmp_path / "parts.parquet", partition_by="RECON_STATUS")
+
+    for back in (pd.read_parquet(tmp_path / "r.parquet"), pd.read_feather(tmp_path / "r.arrow")):
+        pd.testing.assert_frame_equal(back, report, check_dtype=False)
+        assert isinstance(back["CUSTODIAN"].dtype, pd.CategoricalDtype)
+    assert (tmp_path / "parts.parquet" / "RECON_STATUS=MATCHED").is_dir()
+    breaks = pd.read_parquet(tmp_path / "parts.parquet", filters=[("RECON_STATUS", "!=", "MATCHED")])
+    assert len(breaks) == (report["RECON_STATUS"] != "MATCHED").sum()
+
+
+def test_partitioned_rewrite_drops_stale_partitions(tmp_path):
+    """Critical: Rewriting a partitioned report with fewer partitions leaves none of the old ones"""
+    report = pd.DataFrame({"RECON_STATUS": ["A", "B"], "net_diff": [1.0, 2.0]})
+    out = tmp_path / "parts.parquet"
+
+    write_report(report, out, partition_by="RECON_STATUS")
+    write_report(report.iloc[:1], out, partition_by="RECON_STATUS")
+
+    assert not (out / "RECON_STATUS=B").exists()
+    back = pd.read_parquet(out)
+    assert back["RECON_STATUS"].astype(str).tolist() == ["A"] and back["net_diff"].tolist() == [1.0]
@@ -0,0 +1,82 @@
+# tests/test_metrics.py
+"""
+Minimal critical tests for per-stage instrumentation.
+Tests: stage accumulation, disabled no-op, LLM latency/token summary, CLI --metrics report.
+"""
+import json
+from pathlib import Path
+import pandas as pd
+from typer.testing import CliRunner
+from recon.cli import app
+from recon.metrics import Metrics
+from recon.rules import reconcile
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def test_stages_accumulate():
+    """Critical: Same-named stages add up calls, rows and time"""
+    metrics = Metrics()
+    for _ in range(2):
+        with metrics.stage("load", 10) as st:
+            st.rows_out = 4
+
+    rec = metrics.report()["stages"]["load"]
+    assert (rec["calls"], rec["rows_in"], rec["rows_out"]) == (2, 20, 8)
+    assert rec["wall_s"] >= 0 and rec["cpu_s"] >= 0 and rec["peak_rss_mb"] > 0
+
+
+def test_disabled_records_nothing():
+    """Critical: A disabled recorder hands out a no-op stage and reports nothing"""
+    metrics = Metrics(enabled=False)
+    with metrics.stage("load", 10) as st:
+        st.rows_out = 4
+    metrics.record_llm({"calls": 3, "latencies_ms": [10.0]})
+
+    assert metrics.report() == {"stages": {}, "dates": {}, "join": {}, "llm": {}}
+
+
+def test_reconcile_stages_match_plain_run():
+    """Critical: Instrumented reconcile times normalize/merge/classify/orphans without changing the report"""
+    nbim = pd.read_csv(REPO / "NBIM_Dividend_Bookings 1 (2).csv", sep=";")
+    cust = pd.read_csv(REPO / "CUSTODY_Dividend_Bookings 1 (2).csv", sep=";")
+    metrics = Metrics()
+
+    report = reconcile(nbim, cust, metrics=metrics)
+
+    pd.testing.assert_frame_equal(report, reconcile(nbim, cust))
+    stages = metrics.report()["stages"]
+    assert list(stages) == ["normalize", "merge", "classify", "orphans"]
+    assert stages["classify"]["rows_out"] == len(report)
+
+
+def test_llm_latency_and_tokens():
+    """Critical: LLM stats become a latency histogram plus token totals"""
+    metrics = Metrics()
+    metrics.record_llm({"calls": 3, "latencies_ms": [20.0, 300.0, 20000.0],
+                        "prompt_tokens": 120, "completion_tokens": 45})
+
+    llm = metrics.report()["llm"]
+    assert (llm["requests"], llm["prompt_tokens"], llm["completion_tokens"]) == (3, 120, 45)
+    assert llm["latency_ms"]["histogram"]["<=50"] == 1
+    assert llm["latency_ms"]["histogram"]["<=500"] == 1
+    assert llm["latency_ms"]["histogram"][">10000"] == 1
+    assert llm["latency_ms"]["max"] == 20000.0
+
+
+def test_cli_metrics_report(tmp_path, monkeypatch):
+    """Critical: --metrics writes a JSON report covering every pipeline stage"""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    out, metrics_path = tmp_path / "out.csv", tmp_path / "metrics.json"
+
+    result = CliRunner().invoke(app, [
+        "--nbim", str(REPO / "NBIM_Dividend_Bookings 1 (2).csv"),
+        "--cust", str(REPO / "CUSTODY_Dividend_Bookings 1 (2).csv"),
+        "--out", str(out), "--use-llm", "--metrics", str(metrics_path),
+    ])
+
+    assert result.exit_code == 0, result.output
+    report = json.loads(metrics_path.read_text())
+    assert list(report["stages"]) == ["load", "normalize", "merge", "classify", "orphans", "llm", "write"]
+    assert report["stages"]["write"]["rows_in"] == len(pd.read_csv(out))
+    assert report["llm"]["requests"] > 0
@@ -0,0 +1,58 @@
+# tests/test_mockllm.py
+"""
+Minimal critical tests for the local mock LLM server.
+Tests: schema-valid answers over HTTP via LLM_BASE_URL, batches, fenced / malformed output, 429s.
+"""
+import pytest
+from recon.llm import classify_breaks
+from recon.mockllm import MockLLMServer, latency_sampler
+
+
+def _rows(n=6):
+    statuses = ["NET_MISMATCH", "TAX_MISMATCH|FX_VARIANCE", "SOMETHING_ELSE"]
+    return [{"RECON_STATUS": statuses[i % 3], "ISIN": f"US{i}"} for i in range(n)]
+
+
+def test_mock_answers_through_base_url(monkeypatch):
+    """Critical: recon.llm talks to the mock like the real API, fenced answers included"""
+    monkeypatch.setenv("OPENAI_API_KEY", "mock")
+    with MockLLMServer(fenced_rate=0.5, seed=1) as server:
+        monkeypatch.setenv("LLM_BASE_URL", server.url)
+        stats = {}
+        single = classify_breaks(_rows(), stats=stats)
+        batched = classify_breaks(_rows(), batch_size=3)
+
+    assert [r.break_code for r in single] == ["NET_MISMATCH", "TAX_MISMATCH", "OTHER"] * 2
+    assert [r.break_code for r in batched] == [r.break_code for r in single]
+    assert server.counts["fenced"] > 0
+    assert "fallbacks" not in stats and stats["prompt_tokens"] > 0
+
+
+def test_mock_faults_reach_fallbacks(monkeypatch):
+    """Critical: Malformed output and exhausted 429 retries fall back with their reason"""
+    monkeypatch.setenv("OPENAI_API_KEY", "mock")
+    monkeypatch.setattr("recon.ratelimit.BACKOFF_BASE", 0.001)
+    with MockLLMServer(malformed_rate=1.0) as server:
+        monkeypatch.setenv("LLM_BASE_URL", server.url)
+        malformed = {}
+        classify_breaks(_rows(3), stats=malformed)
+    with MockLLMServer(rate_429=1.0) as server:
+        monkeypatch.setenv("LLM_BASE_URL", server.url)
+        limited = {}
+        results = classify_breaks(_rows(2), stats=limited, max_retries=1)
+
+    assert malformed["fallbacks"] == {"parse": 3}
+    assert limited["fallbacks"] == {"rate_limit": 2} and limited["retries"] == {"rate_limit": 2}
+    assert server.counts == {"rate_limit": 4}
+    assert results[0].break_code == "NET_MISMATCH"  # _fb
+
+
+def test_latency_specs():
+    """Critical: Latency specs parse; bad ones are rejected"""
+    import random
+    rng = random.Random(0)
+    assert latency_sampler("fixed:20")(rng) == 0.02
+    assert 0.01 <= latency_sampler("uniform:10,30")(rng) <= 0.03
+    assert latency_sampler("lognormal:200,0.5")(rng) > 0
+    with pytest.raises(ValueError):
+        latency_sampler("gamma:1")
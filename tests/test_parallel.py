@@ -0,0 +1,91 @@
+# tests/test_parallel.py
+"""
+Minimal critical tests for multi-core reconciliation.
+Tests: identical report to the single-process path, mismatched key types, CLI --workers flag.
+"""
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from typer.testing import CliRunner
+from recon.cli import app
+from recon.parallel import reconcile_parallel
+from recon.rules import reconcile
+
+runner = CliRunner()
+
+
+def _feeds(n: int = 400):
+    rng = np.random.default_rng(3)
+    events = np.arange(n) // 4 + 970_000_000
+    nbim = pd.DataFrame({
+        "COAC_EVENT_KEY": events,
+        "ISIN": [f"CH{e % 11:010d}" for e in events],
+        "BANK_ACCOUNT": np.arange(n) % 4 + 823_000_000,
+        "PAYMENT_DATE": "20.05.2025",
+        "QUOTATION_CURRENCY": "CHF",
+        "GROSS_AMOUNT_QUOTATION": rng.uniform(1_000, 9_000, n).round(2),
+    })
+    cust = nbim.rename(columns={
+        "BANK_ACCOUNT": "CUSTODY",
+        "PAYMENT_DATE": "EVENT_PAYMENT_DATE",
+        "QUOTATION_CURRENCY": "SETTLED_CURRENCY",
+        "GROSS_AMOUNT_QUOTATION": "GROSS_AMOUNT",
+    })
+    cust.loc[cust.index[::7], "GROSS_AMOUNT"] += 1
+    return nbim.iloc[5:], cust.iloc[:-5]
+
+
+def test_parallel_matches_single_process():
+    """Critical: Partitioned multi-process run gives the same report, in the same order"""
+    nbim, cust = _feeds()
+
+    expected = reconcile(nbim, cust).reset_index(drop=True)
+    actual = reconcile_parallel(nbim, cust, workers=3)
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_parallel_mixed_key_types():
+    """Critical: A numeric key on one side and a text key on the other partition together, as reconcile() joins them"""
+    nbim, cust = _feeds()
+    cust = cust.astype({"CUSTODY": str, "COAC_EVENT_KEY": str})
+
+    expected = reconcile(nbim, cust).reset_index(drop=True)
+    actual = reconcile_parallel(nbim, cust, workers=3)
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    assert (actual["RECON_STATUS"] == "MATCHED").sum() > 300
+
+
+def test_cli_workers_flag():
+    """Critical: CLI --workers produces a report"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        nbim, cust = _feeds(40)
+        nbim_path = Path(tmpdir) / "nbim.csv"
+        cust_path = Path(tmpdir) / "cust.csv"
+        out_path = Path(tmpdir) / "out.csv"
+        nbim.to_csv(nbim_path, sep=";", index=False)
+        cust.to_csv(cust_path, sep=";", index=False)
+
+        result = runner.invoke(app, [
+            "--nbim", str(nbim_path), "--cust", str(cust_path), "--out", str(out_path),
+            "--workers", "2",
+        ])
+
+        assert result.exit_code == 0
+        assert len(pd.read_csv(out_path)) == 40  # 30 matched keys + 5 orphans per side
+
+
+def test_parallel_duplicate_diagnostics():
+    """Critical: Duplicate keys are handled per partition and their side table comes back to the caller"""
+    nbim, cust = _feeds()
+    cust = pd.concat([cust, cust.iloc[:3]], ignore_index=True)
+    expected_diag, actual_diag = {}, {}
+
+    expected = reconcile(nbim, cust, duplicates="side_table", diagnostics=expected_diag).reset_index(drop=True)
+    actual = reconcile_parallel(nbim, cust, workers=3, duplicates="side_table", diagnostics=actual_diag)
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    assert sorted(pd.concat(actual_diag["side_table"]).index) == sorted(pd.concat(expected_diag["side_table"]).index)
+    assert len(pd.concat(actual_diag["duplicate_keys"])) == 3
@@ -0,0 +1,136 @@
+# tests/test_ratelimit.py
+"""
+Minimal critical tests for LLM rate limiting.
+Tests: token bucket waits, adaptive concurrency, 429 retry/backoff, fallback reasons, token budget.
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+from recon.llm import classify_breaks
+from recon.ratelimit import RateLimiter, TokenBucket, failure_reason, retry_after
+
+
+def test_token_bucket_waits_for_refill():
+    """Critical: A reservation past the bucket's level waits for the refill rate"""
+    bucket = TokenBucket(per_minute=600)  # 10 per second, 600 burst
+
+    assert bucket.reserve(600) == 0.0
+    assert abs(bucket.reserve(5) - 0.5) < 0.05
+    bucket.settle(5)                     # request used less than reserved
+    assert bucket.reserve(0) < 0.05
+
+
+def test_concurrency_halves_on_throttle_and_grows_back():
+    """Critical: AIMD - halve on 429, +1 after a run of successes, within [min, max]"""
+    limiter = RateLimiter(concurrency=8)
+
+    limiter.throttle()
+    limiter.throttle()
+    assert limiter.limit == 2
+    for _ in range(2):
+        limiter.success()
+    assert limiter.limit == 3
+    for _ in range(100):
+        limiter.success()
+    assert limiter.limit == 8
+    for _ in range(10):
+        limiter.throttle()
+    assert limiter.limit == 1 and limiter.throttled == 12
+
+
+class _ApiError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def test_failure_reasons():
+    """Critical: 429 / 5xx / connection errors are told apart from permanent ones"""
+    assert failure_reason(_ApiError(429)) == "rate_limit"
+    assert failure_reason(_ApiError(503)) == "server_error"
+    assert failure_reason(_ApiError(400)) == "api_error"
+    assert failure_reason(ConnectionError()) == "connection"
+    assert failure_reason(ValueError()) == "error"
+    assert retry_after(_ApiError(429, {"retry-after": "2"})) == 2.0
+    assert retry_after(_ApiError(429, {"retry-after-ms": "150"})) == 0.15
+
+
+class _FlakyClient:
+    """Fails per ISIN: RETRY429 throttles twice then answers, DOWN always 503s, BAD400 is rejected."""
+    attempts = {}
+
+    def __init__(self, **kwargs):
+        self.chat = self
+        self.completions = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def create(self, messages, **kwargs):
+        isin = json.loads(messages[-1]["content"].split("Data:\n", 1)[1])["ISIN"]
+        n = type(self).attempts[isin] = type(self).attempts.get(isin, 0) + 1
+        await asyncio.sleep(0)
+        if isin == "RETRY429" and n <= 2:
+            raise _ApiError(429, {"retry-after-ms": "1"})
+        if isin == "DOWN":
+            raise _ApiError(503)
+        if isin == "BAD400":
+            raise _ApiError(400)
+        content = json.dumps({"break_code": "NET_MISMATCH", "confidence": 0.7,
+                              "explanation_one_liner": "x", "proposed_action": "y",
+                              "needs_human": True})
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def test_retries_then_falls_back_by_reason(monkeypatch):
+    """Critical: 429s are retried with backoff; exhausted / permanent failures fall back with a reason"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("recon.llm.AsyncOpenAI", _FlakyClient)
+    monkeypatch.setattr("recon.ratelimit.BACKOFF_BASE", 0.001)
+    _FlakyClient.attempts = {}
+    rows = [{"RECON_STATUS": "TAX_MISMATCH", "ISIN": isin} for isin in ("OK", "RETRY429", "DOWN", "BAD400")]
+
+    stats = {}
+    results = classify_breaks(rows, stats=stats, max_retries=2, limiter=RateLimiter(concurrency=4))
+
+    assert [r.break_code for r in results] == ["NET_MISMATCH", "NET_MISMATCH", "TAX_MISMATCH", "TAX_MISMATCH"]
+    assert _FlakyClient.attempts == {"OK": 1, "RETRY429": 3, "DOWN": 3, "BAD400": 1}
+    assert stats["retries"] == {"rate_limit": 2, "server_error": 2}
+    assert stats["fallbacks"] == {"server_error": 1, "api_error": 1}
+    assert stats["throttled"] == 2 and stats["concurrency"] < 4
+    assert stats["prompt_tokens"] == 200 and stats["cost_usd"] > 0
+
+
+def test_token_budget_stops_new_requests(monkeypatch):
+    """Critical: Once spent + a request's estimate would pass token_budget, remaining rows stay unclassified"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("recon.llm.AsyncOpenAI", _FlakyClient)
+    rows = [{"RECON_STATUS": "NET_MISMATCH", "ISIN": "OK"} for _ in range(5)]
+
+    stats = {}
+    results = classify_breaks(rows, stats=stats, concurrency=1, token_budget=700)
+
+    done = sum(r is not None for r in results)
+    assert 1 <= done < 5
+    assert stats["calls"] == done                       # skipped requests are refunded
+    assert stats["skipped"] == {"token_budget": 5 - done}
+    assert stats["prompt_tokens"] + stats["completion_tokens"] <= 700
+
+
+def test_token_budget_waits_for_in_flight_requests(monkeypatch):
+    """Critical: Requests that don't fit beside in-flight reservations wait for them instead of being dropped"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("recon.llm.AsyncOpenAI", _FlakyClient)
+    rows = [{"RECON_STATUS": "NET_MISMATCH", "ISIN": "OK"} for _ in range(30)]
+
+    stats = {}
+    results = classify_breaks(rows, stats=stats, concurrency=8, token_budget=3_000)
+
+    spent = stats["prompt_tokens"] + stats["completion_tokens"]
+    assert 0.8 * 3_000 < spent <= 3_000                 # reservations of 8 in flight would stop at ~7 calls
+    assert sum(r is not None for r in results) == stats["calls"] == spent // 120
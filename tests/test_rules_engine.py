@@ -0,0 +1,290 @@
+# tests/test_rules_engine.py
+"""
+Minimal critical tests for the vectorized rules engine.
+Tests: equivalence with the row-wise _classify_row, break_mask and delta columns, date parsing, join, duplicate keys, orphan pairing.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from recon.rules import JOIN_KEYS, DuplicateKeyError, _classify_frame, _classify_row, _merge_feeds, pair_orphans, reconcile, status_from_mask, to_date
+from recon.schemas import BREAK_BITS
+
+
+def _random_merged(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    def amounts(base, noise=0.05, missing=0.1):
+        vals = base * (1 + rng.choice([0, 0, 0, noise], n))
+        return np.where(rng.random(n) < missing, np.nan, vals)
+
+    base = rng.uniform(1, 10_000, n).round(2)
+    pay = pd.Timestamp("2025-02-14") + pd.to_timedelta(rng.integers(0, 30, n), unit="D")
+    pay_shift = pd.to_timedelta(rng.choice([0, 1, -1, 2, -3], n), unit="D")
+    fx_nbim = rng.choice([1.0, 0.008234, 0.0, 11.2345, np.nan], n)
+    fx_cust = np.where(rng.random(n) < 0.5, 1 / np.where(fx_nbim == 0, 1, fx_nbim), fx_nbim)
+
+    merged = pd.DataFrame({
+        "EVENT_PAYMENT_DATE": pay + pay_shift,
+        "PAYMENT_DATE": pay.where(rng.random(n) > 0.1),
+        "EVENT_EX_DATE": pay - pd.Timedelta(days=7),
+        "EXDATE": pay - pd.to_timedelta(rng.choice([7, 9], n), unit="D"),
+        "SETTLED_CURRENCY": rng.choice(["USD", "CHF", None], n, p=[0.6, 0.3, 0.1]),
+        "QUOTATION_CURRENCY": rng.choice(["USD", "KRW", "CHF"], n),
+        "GROSS_AMOUNT": amounts(base),
+        "GROSS_AMOUNT_QUOTATION": base,
+        "NET_AMOUNT_SC": amounts(base * 0.85),
+        "NET_AMOUNT_SETTLEMENT": base * 0.85,
+        "TAX": amounts(base * 0.15),
+        "WITHHOLDING_TAX_AMOUNT_SETTLEMENT": amounts(base * 0.15),
+        "FX_RATE": fx_cust * (1 + rng.choice([0, 0.02], n)),
+        "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO": fx_nbim,
+        "ADR_FEE": rng.choice([0.0, 0.0, 5.0, np.nan], n),
+        "NOMINAL_BASIS": rng.choice([100.0, 120.0, np.nan], n),
+        "HOLDING_QUANTITY": rng.choice([100.0, 90.0], n),
+        "_merge": pd.Categorical(
+            rng.choice(["both", "both", "both", "left_only", "right_only"], n),
+            categories=["left_only", "right_only", "both"],
+        ),
+    })
+    return merged
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorized_matches_row_wise(seed):
+    """Critical: Vectorized engine gives the same RECON_STATUS as _classify_row"""
+    merged = _random_merged(500, seed)
+
+    expected = merged.apply(_classify_row, axis=1)
+    actual = _classify_frame(merged)
+
+    pd.testing.assert_series_equal(actual, expected, check_dtype=False)
+
+
+def test_vectorized_handles_missing_columns():
+    """Critical: Absent columns behave like row.get defaults"""
+    merged = _random_merged(200, 42).drop(columns=["FX_RATE", "ADR_FEE", "SETTLED_CURRENCY"])
+
+    expected = merged.apply(_classify_row, axis=1)
+    actual = _classify_frame(merged)
+
+    pd.testing.assert_series_equal(actual, expected, check_dtype=False)
+
+
+
+def test_break_mask_decodes_to_status():
+    """Critical: break_mask carries one bit per BreakCode and renders back to RECON_STATUS"""
+    nbim = pd.DataFrame([
+        {"COAC_EVENT_KEY": 1, "ISIN": "US01", "BANK_ACCOUNT": "ACC001",
+         "GROSS_AMOUNT_QUOTATION": 100.0, "NET_AMOUNT_SETTLEMENT": 85.0, "QUOTATION_CURRENCY": "USD"},
+        {"COAC_EVENT_KEY": 2, "ISIN": "US02", "BANK_ACCOUNT": "ACC001",
+         "GROSS_AMOUNT_QUOTATION": 100.0, "NET_AMOUNT_SETTLEMENT": 85.0, "QUOTATION_CURRENCY": "USD"},
+    ])
+    cust = pd.DataFrame([
+        {"COAC_EVENT_KEY": 1, "ISIN": "US01", "BANK_ACCOUNT": "ACC001",
+         "GROSS_AMOUNT": 95.0, "NET_AMOUNT_SC": 80.0, "SETTLED_CURRENCY": "USD"},
+    ])
+
+    report = reconcile(nbim, cust).set_index("COAC_EVENT_KEY")
+
+    assert report.loc[1, "break_mask"] == BREAK_BITS["GROSS_MISMATCH"] | BREAK_BITS["NET_MISMATCH"]
+    assert report.loc[2, "break_mask"] == BREAK_BITS[report.loc[2, "RECON_STATUS"]]  # orphan: single MISSING_* bit
+    assert list(status_from_mask(report["break_mask"])) == list(report["RECON_STATUS"])
+
+
+def test_signed_deltas():
+    """Critical: Delta columns are custodian minus NBIM"""
+    nbim = pd.DataFrame([{
+        "COAC_EVENT_KEY": 1, "ISIN": "US01", "BANK_ACCOUNT": "ACC001",
+        "GROSS_AMOUNT_QUOTATION": 100.0, "NET_AMOUNT_SETTLEMENT": 85.0,
+        "QUOTATION_CURRENCY": "USD", "PAYMENT_DATE": "14.02.2025",
+    }])
+    cust = pd.DataFrame([{
+        "COAC_EVENT_KEY": 1, "ISIN": "US01", "BANK_ACCOUNT": "ACC001",
+        "GROSS_AMOUNT": 95.0, "NET_AMOUNT_SC": 80.0,
+        "SETTLED_CURRENCY": "USD", "EVENT_PAYMENT_DATE": "17.02.2025",
+    }])
+
+    row = reconcile(nbim, cust).iloc[0]
+
+    assert row["gross_diff"] == pytest.approx(-5.0)
+    assert row["net_diff"] == pytest.approx(-5.0)
+    assert row["payment_date_diff_days"] == 3
+    assert np.isnan(row["fx_rel_diff"])  # same currency: no FX comparison
+
+
+@pytest.mark.filterwarnings("ignore:Could not infer format")
+@pytest.mark.parametrize("values", [
+    ["07.02.2025", "13.02.2025", None, "07.02.2025", "1.2.2025"],
+    ["31.02.2025", "01.01.2024"],
+    [None, None],
+])
+def test_to_date_matches_permissive_parser(values):
+    """Critical: Unique-value DD.MM.YYYY parsing gives the same column as pd.to_datetime(dayfirst=True)"""
+    for dtype in (object, "str"):
+        series = pd.Series(values, dtype=dtype, index=range(10, 10 + len(values)), name="PAY_DATE")
+        expected = pd.to_datetime(series, dayfirst=True, errors="coerce")
+        pd.testing.assert_series_equal(to_date(series), expected)
+
+
+@pytest.mark.filterwarnings("ignore:Could not infer format")
+@pytest.mark.parametrize("values", [
+    ["07.02.2025", "2025-02-08", "x", None, ""],
+    ["2025-02-08", "07.02.2025", "13.02.2025"],
+])
+def test_to_date_mixed_formats(values):
+    """Critical: DD.MM.YYYY values parse with the format and only the others go to the dayfirst parser"""
+    for dtype in (object, "str"):
+        series = pd.Series(values, dtype=dtype, index=range(10, 10 + len(values)), name="PAY_DATE")
+        expected = pd.to_datetime(series, format="%d.%m.%Y", errors="coerce")
+        rest = expected.isna()
+        expected[rest] = pd.to_datetime(series[rest].astype(object), dayfirst=True, errors="coerce")
+        assert expected[series == "2025-02-08"].notna().all()  # the whole-column parser gave NaT here
+        pd.testing.assert_series_equal(to_date(series), expected)
+
+
+def test_to_date_reports_coerced_values():
+    """Critical: Values that miss the explicit format are counted, and those ending up NaT as coerced"""
+    stats = {}
+    to_date(pd.Series(["07.02.2025", "bad", "bad", None, "08.02.2025"]), stats=stats)
+    assert stats == {"fallback": 2, "coerced": 2}
+
+    stats = {}
+    to_date(pd.Series(["07.02.2025", None]), stats=stats)
+    assert stats == {}
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_coded_join_matches_pandas_merge(seed):
+    """Critical: Joining on the composite int64 code equals the three-column outer merge, order included"""
+    rng = np.random.default_rng(seed)
+
+    def side(n, amount):
+        events = rng.integers(0, 20, n).astype(float)
+        events[rng.random(n) < 0.05] = np.nan
+        isins = np.array([f"US{i}" for i in rng.integers(0, 5, n)], dtype=object)
+        isins[rng.random(n) < 0.05] = None
+        return pd.DataFrame({"COAC_EVENT_KEY": events, "ISIN": isins, amount: rng.random(n),
+                             "BANK_ACCOUNT": rng.integers(0, 4, n)})
+
+    cust = side(150, "GROSS_AMOUNT")
+    nbim = side(120, "GROSS_AMOUNT_QUOTATION")[["BANK_ACCOUNT", "GROSS_AMOUNT_QUOTATION", "ISIN", "COAC_EVENT_KEY"]]
+    expected = cust.merge(nbim, on=JOIN_KEYS, how="outer", suffixes=("", "_NBIM"), indicator=True)
+
+    merged = _merge_feeds(nbim, cust).drop(columns=["cust_rows", "nbim_rows"])
+    pd.testing.assert_frame_equal(merged, expected)
+
+
+def test_join_coerces_numeric_key_to_text():
+    """Critical: An int account on one side matches the same account as text, and the cast is reported"""
+    cust = pd.DataFrame({"COAC_EVENT_KEY": ["1", "2"], "ISIN": ["US01", "US02"], "BANK_ACCOUNT": ["501", None]})
+    nbim = pd.DataFrame({"COAC_EVENT_KEY": ["1", "2"], "ISIN": ["US01", "US02"], "BANK_ACCOUNT": [501.0, np.nan]})
+    stats = {}
+
+    merged = _merge_feeds(nbim, cust, stats=stats)
+
+    assert merged["_merge"].tolist() == ["both", "both"]
+    assert stats["coercions"] == ["BANK_ACCOUNT: nbim float64 -> text"]
+    assert stats["null_key_rows"] == {"cust": 1, "nbim": 1}
+
+
+def _feeds_with_duplicates():
+    nbim = pd.DataFrame({
+        "COAC_EVENT_KEY": ["1", "2"], "ISIN": ["US01", "US02"], "BANK_ACCOUNT": ["A", "A"],
+        "PAYMENT_DATE": ["14.02.2025", "14.02.2025"], "QUOTATION_CURRENCY": ["USD", "USD"],
+        "GROSS_AMOUNT_QUOTATION": [100.0, 50.0], "NET_AMOUNT_SETTLEMENT": [85.0, 42.5],
+    })
+    # Event 1 booked by the custodian in two partial lines
+    cust = pd.DataFrame({
+        "COAC_EVENT_KEY": ["1", "1", "2"], "ISIN": ["US01", "US01", "US02"], "CUSTODY": ["A", "A", "A"],
+        "EVENT_PAYMENT_DATE": ["14.02.2025", "15.02.2025", "14.02.2025"], "SETTLED_CURRENCY": ["USD"] * 3,
+        "GROSS_AMOUNT": [60.0, 40.0, 50.0], "NET_AMOUNT_SC": [51.0, 34.0, 42.5],
+    })
+    return nbim, cust
+
+
+def test_duplicate_keys_fail_fast():
+    """Critical: By default duplicate keys stop reconcile with the affected keys listed"""
+    nbim, cust = _feeds_with_duplicates()
+
+    with pytest.raises(DuplicateKeyError) as exc:
+        reconcile(nbim, cust)
+
+    assert exc.value.keys[[*JOIN_KEYS, "cust_rows", "nbim_rows"]].values.tolist() == [["1", "US01", "A", 2, 1]]
+
+
+def test_duplicate_keys_aggregate():
+    """Critical: Aggregating sums partial amounts per key, keeps the first date and reports row counts"""
+    nbim, cust = _feeds_with_duplicates()
+    diagnostics = {}
+
+    report = reconcile(nbim, cust, duplicates="aggregate", diagnostics=diagnostics)
+
+    assert len(report) == 2
+    assert report["RECON_STATUS"].tolist() == ["MATCHED", "MATCHED"]
+    assert report["GROSS_AMOUNT"].tolist() == [100.0, 50.0]
+    assert report["EVENT_PAYMENT_DATE"].iloc[0] == pd.Timestamp("2025-02-14")
+    assert report[["cust_rows", "nbim_rows"]].values.tolist() == [[2, 1], [1, 1]]
+    assert len(diagnostics["duplicate_keys"][0]) == 1
+
+
+def test_duplicate_keys_side_table_and_allow():
+    """Critical: side_table joins the first row and lists the extras; allow keeps the many-to-many merge"""
+    nbim, cust = _feeds_with_duplicates()
+    diagnostics = {}
+
+    report = reconcile(nbim, cust, duplicates="side_table", diagnostics=diagnostics)
+    side = pd.concat(diagnostics["side_table"])
+
+    assert len(report) == 2
+    assert report["GROSS_AMOUNT"].tolist() == [60.0, 50.0]
+    assert side.index.tolist() == [("1", "US01", "A")]
+    assert side[["SIDE", "GROSS_AMOUNT"]].values.tolist() == [["cust", 40.0]]
+
+    assert len(reconcile(nbim, cust, duplicates="allow")) == 3
+
+
+def _orphan_feeds():
+    # Event keys 1/2 differ between the feeds; 3 has no counterpart; 4 is the right ISIN a month late
+    nbim = pd.DataFrame({
+        "COAC_EVENT_KEY": ["1", "2", "4"], "ISIN": ["US01", "US02", "US02"], "BANK_ACCOUNT": ["A", "A", "A"],
+        "PAYMENT_DATE": ["14.02.2025", "20.02.2025", "20.03.2025"], "SETTLEMENT_CURRENCY": ["USD"] * 3,
+        "QUOTATION_CURRENCY": ["USD"] * 3, "GROSS_AMOUNT_QUOTATION": [100.0, 200.0, 200.0],
+        "NET_AMOUNT_SETTLEMENT": [85.0, 170.0, 170.0], "NOMINAL_BASIS": [1000.0, 2000.0, 2000.0],
+    })
+    cust = pd.DataFrame({
+        "COAC_EVENT_KEY": ["91", "92", "3"], "ISIN": ["US01", "US02", "US03"], "CUSTODY": ["A", "B", "A"],
+        "EVENT_PAYMENT_DATE": ["14.02.2025", "23.02.2025", "14.02.2025"], "SETTLED_CURRENCY": ["USD"] * 3,
+        "GROSS_AMOUNT": [100.0, 200.0, 50.0], "NET_AMOUNT_SC": [85.0, 168.0, 42.5],
+        "NOMINAL_BASIS": [1000.0, 2000.0, 500.0],
+    })
+    return nbim, cust
+
+
+def test_orphans_paired_with_identifier_mismatch():
+    """Critical: Orphans close on ISIN, payment date and amounts are paired and flagged IDENTIFIER_MISMATCH"""
+    nbim, cust = _orphan_feeds()
+    stats = {}
+
+    report = pair_orphans(reconcile(nbim, cust, match_orphans=False), stats=stats).set_index("COAC_EVENT_KEY")
+
+    assert sorted(report.index) == ["3", "4", "91", "92"]
+    assert report.loc["91", ["COAC_EVENT_KEY_NBIM", "BANK_ACCOUNT_NBIM", "RECON_STATUS"]].tolist() == ["1", "A", "IDENTIFIER_MISMATCH"]
+    assert set(report.loc["92", "RECON_STATUS"].split(" | ")) == {"IDENTIFIER_MISMATCH", "DATE_MISMATCH", "NET_MISMATCH"}
+    assert report.loc["92", "net_diff"] == pytest.approx(-2.0)
+    assert report.loc["92", "break_mask"] & BREAK_BITS["IDENTIFIER_MISMATCH"]
+    assert report.loc["91", "orphan_score"] == 1.0
+    assert report.loc["3", "RECON_STATUS"] == "MISSING_AT_CUSTODIAN" and report.loc["4", "RECON_STATUS"] == "MISSING_IN_NBIM"
+    assert stats["orphan_pairs"] == 2
+
+
+def test_orphan_pairing_is_one_to_one_and_optional():
+    """Critical: Each orphan joins at most one pair (best score wins); match_orphans=False leaves orphans alone"""
+    nbim, cust = _orphan_feeds()
+    cust = pd.concat([cust, cust.iloc[[0]].assign(COAC_EVENT_KEY="93", GROSS_AMOUNT=101.0)], ignore_index=True)
+
+    report = reconcile(nbim, cust).set_index("COAC_EVENT_KEY")
+    plain = reconcile(nbim, cust, match_orphans=False)
+
+    assert report.loc["91", "COAC_EVENT_KEY_NBIM"] == "1"
+    assert report.loc["93", "RECON_STATUS"] == "MISSING_AT_CUSTODIAN"
+    assert (plain["_merge"] != "both").all() and plain["COAC_EVENT_KEY_NBIM"].isna().all()
@@ -0,0 +1,80 @@
+# tests/test_snapshot.py
+"""
+Minimal critical tests for the normalized NBIM snapshot.
+Tests: same report as reading the CSV, rebuild on content change only, missing source, CLI build and --nbim-snapshot.
+"""
+import os
+from pathlib import Path
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+from recon.cli import app
+from recon.loader import read_custody, read_nbim
+from recon.rules import normalize_nbim, reconcile
+from recon.snapshot import build_snapshot, load_snapshot, snapshot_info
+
+REPO = Path(__file__).resolve().parent.parent
+NBIM_CSV = REPO / "NBIM_Dividend_Bookings 1 (2).csv"
+CUST_CSV = REPO / "CUSTODY_Dividend_Bookings 1 (2).csv"
+
+runner = CliRunner()
+
+
+def test_snapshot_reconciles_like_csv(tmp_path):
+    """Critical: The mapped snapshot is the normalized frame and gives the same report with nbim_normalized"""
+    build_snapshot(NBIM_CSV, tmp_path / "nbim.arrow")
+
+    nbim = load_snapshot(tmp_path / "nbim.arrow")
+
+    pd.testing.assert_frame_equal(nbim, normalize_nbim(read_nbim(NBIM_CSV)))
+    pd.testing.assert_frame_equal(
+        reconcile(nbim, read_custody(CUST_CSV), nbim_normalized=True),
+        reconcile(read_nbim(NBIM_CSV), read_custody(CUST_CSV)),
+    )
+
+
+def test_rebuilt_only_when_content_changes(tmp_path):
+    """Critical: A touched source keeps the snapshot; edited content rebuilds it from the recorded source"""
+    source = tmp_path / "nbim.csv"
+    source.write_bytes(NBIM_CSV.read_bytes())
+    snap = tmp_path / "nbim.arrow"
+    build_snapshot(source, snap)
+    stats = {}
+
+    os.utime(source, ns=(0, 0))
+    load_snapshot(snap, stats=stats)
+    assert stats["rebuilt"] is False
+
+    source.write_bytes(source.read_bytes().replace(b"950123456", b"950123457"))
+    nbim = load_snapshot(snap, stats=stats)
+    assert stats["rebuilt"] is True
+    assert "950123457" in set(nbim["COAC_EVENT_KEY"])
+    assert snapshot_info(snap)["source"] == str(source.resolve())
+
+
+def test_missing_snapshot_and_source(tmp_path):
+    """Critical: With no snapshot and no source there is nothing to map"""
+    with pytest.raises(FileNotFoundError):
+        load_snapshot(tmp_path / "nbim.arrow")
+    with pytest.raises(FileNotFoundError):
+        load_snapshot(tmp_path / "nbim.arrow", tmp_path / "gone.csv")
+
+
+def test_cli_snapshot_build_and_use(tmp_path):
+    """Critical: recon snapshot build, then --nbim-snapshot (in memory and with workers) matches --nbim"""
+    snap = tmp_path / "nbim.arrow"
+    built = runner.invoke(app, ["snapshot", "build", "--nbim", str(NBIM_CSV), "--out", str(snap)])
+    assert built.exit_code == 0, built.output
+
+    runs = {
+        "csv": ["--nbim", str(NBIM_CSV)],
+        "snap": ["--nbim-snapshot", str(snap)],
+        "snap_workers": ["--nbim-snapshot", str(snap), "--workers", "2"],
+    }
+    for name, args in runs.items():
+        result = runner.invoke(app, args + ["--cust", str(CUST_CSV), "--out", str(tmp_path / f"{name}.csv")])
+        assert result.exit_code == 0, result.output
+
+    expected = pd.read_csv(tmp_path / "csv.csv")
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "snap.csv"), expected)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "snap_workers.csv"), expected)
@@ -0,0 +1,108 @@
+# tests/test_stream.py
+"""
+Minimal critical tests for streaming (out-of-core) reconciliation.
+Tests: identical output to the in-memory path, breaks enriched in one call, CLI --stream flag.
+"""
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from typer.testing import CliRunner
+from recon.cli import app
+from recon.loader import read_custody, read_nbim
+from recon.rules import reconcile
+from recon.stream import reconcile_stream
+
+runner = CliRunner()
+KEYS = ["COAC_EVENT_KEY", "ISIN", "BANK_ACCOUNT"]
+
+
+def _write_feeds(tmpdir: Path, n: int = 300):
+    rng = np.random.default_rng(7)
+    events = rng.integers(900_000_000, 900_000_050, n)
+    accounts = rng.integers(500_000_000, 500_000_010, n)
+    gross = rng.uniform(1_000, 50_000, n).round(2)
+
+    nbim = pd.DataFrame({
+        "COAC_EVENT_KEY": events,
+        "ISIN": [f"US{e % 7:010d}" for e in events],
+        "BANK_ACCOUNT": accounts,
+        "PAYMENT_DATE": "14.02.2025",
+        "QUOTATION_CURRENCY": "USD",
+        "GROSS_AMOUNT_QUOTATION": gross,
+        "NET_AMOUNT_SETTLEMENT": (gross * 0.85).round(2),
+    }).drop_duplicates(KEYS)
+    cust = nbim.rename(columns={
+        "BANK_ACCOUNT": "CUSTODY",
+        "PAYMENT_DATE": "EVENT_PAYMENT_DATE",
+        "QUOTATION_CURRENCY": "SETTLED_CURRENCY",
+        "GROSS_AMOUNT_QUOTATION": "GROSS_AMOUNT",
+        "NET_AMOUNT_SETTLEMENT": "NET_AMOUNT_SC",
+    })
+    cust.loc[cust.index[::5], "GROSS_AMOUNT"] += 10  # breaks
+    cust = cust.iloc[10:]                             # orphans on the NBIM side
+    nbim = nbim.iloc[:-10]                            # orphans on the custodian side
+
+    nbim_path, cust_path = tmpdir / "nbim.csv", tmpdir / "cust.csv"
+    nbim.to_csv(nbim_path, sep=";", index=False)
+    cust.to_csv(cust_path, sep=";", index=False)
+    return nbim_path, cust_path
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(KEYS).reset_index(drop=True)
+
+
+def test_stream_matches_in_memory():
+    """Critical: Bucketed reconciliation returns the same rows as reconcile()"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        nbim_path, cust_path = _write_feeds(tmpdir)
+        out_path = tmpdir / "out.csv"
+
+        written = reconcile_stream(nbim_path, cust_path, out_path, chunk_rows=40)
+
+        expected = tmpdir / "expected.csv"
+        reconcile(read_nbim(nbim_path), read_custody(cust_path)).to_csv(expected, index=False)
+
+        streamed = pd.read_csv(out_path)
+        in_memory = pd.read_csv(expected)
+        assert written == len(in_memory)
+        pd.testing.assert_frame_equal(_sorted(streamed), _sorted(in_memory))
+
+
+def test_stream_enriches_all_breaks_in_one_call(tmp_path):
+    """Critical: enrich sees every break of the run at once, so an impact-ranked budget spans buckets"""
+    nbim_path, cust_path = _write_feeds(tmp_path)
+    calls = []
+
+    def enrich(report):
+        calls.append(report["RECON_STATUS"].ne("MATCHED").tolist())
+        return report.assign(enriched=True)
+
+    written = reconcile_stream(nbim_path, cust_path, tmp_path / "out.csv", chunk_rows=40, enrich=enrich)
+
+    expected = reconcile(read_nbim(nbim_path), read_custody(cust_path))
+    with_breaks = [c for c in calls if any(c)]
+    assert len(calls) > 2 and len(with_breaks) == 1 and all(with_breaks[0])
+    assert sum(with_breaks[0]) == (expected["RECON_STATUS"] != "MATCHED").sum()
+    assert written == len(expected) and pd.read_csv(tmp_path / "out.csv")["enriched"].all()
+
+
+def test_cli_stream_flag():
+    """Critical: CLI --stream runs end to end with LLM columns"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        nbim_path, cust_path = _write_feeds(tmpdir, n=60)
+        out_path = tmpdir / "out.csv"
+
+        result = runner.invoke(app, [
+            "--nbim", str(nbim_path), "--cust", str(cust_path), "--out", str(out_path),
+            "--stream", "--chunk-rows", "10", "--use-llm", "--llm-max-calls", "3",
+        ])
+
+        assert result.exit_code == 0
+        output_df = pd.read_csv(out_path)
+        assert "break_code" in output_df.columns
+        assert "LLM requests: 3 / 3" in result.output
+        assert output_df["llm_group"].dropna().nunique() <= 3   # dedupe copies a result to its group
@@ -0,0 +1,43 @@
+# tests/test_view.py
+"""
+Minimal critical tests for report filtering and paging.
+Tests: break-code / custodian / needs_human filters, pages, reports without LLM columns.
+"""
+import numpy as np
+import pandas as pd
+from recon.schemas import BREAK_BITS
+from recon.view import NO_CUSTODIAN, ReportView
+
+
+def _report():
+    net, tax = BREAK_BITS["NET_MISMATCH"], BREAK_BITS["TAX_MISMATCH"]
+    return pd.DataFrame({
+        "COAC_EVENT_KEY": [str(i) for i in range(6)],
+        "CUSTODIAN": pd.Categorical(["CUST/UBSCH", "CUST/UBSCH", "CUST/HSBCKR", None, "CUST/HSBCKR", "CUST/UBSCH"]),
+        "break_mask": np.array([0, net, net | tax, tax, 0, net], dtype=np.int16),
+        "needs_human": [None, True, False, True, None, False],
+    })
+
+
+def test_filters_combine():
+    """Critical: Code, custodian and needs_human filters intersect; MATCHED means no break bits"""
+    view = ReportView(_report())
+
+    assert view.break_codes() == ["MATCHED", "NET_MISMATCH", "TAX_MISMATCH"]
+    assert view.custodians() == ["CUST/HSBCKR", "CUST/UBSCH", NO_CUSTODIAN]
+    assert view.select().tolist() == [0, 1, 2, 3, 4, 5]
+    assert view.select(["TAX_MISMATCH"]).tolist() == [2, 3]
+    assert view.select(["MATCHED", "TAX_MISMATCH"]).tolist() == [0, 2, 3, 4]
+    assert view.select(custodians=[NO_CUSTODIAN, "CUST/HSBCKR"]).tolist() == [2, 3, 4]
+    assert view.select(["NET_MISMATCH"], ["CUST/UBSCH"], needs_human=False).tolist() == [5]
+    assert view.counts() == {"rows": 6, "matched": 2, "breaks": 4, "needs_human": 2}
+
+
+def test_pages_and_rules_only_report():
+    """Critical: Pages slice the selected rows; a report without LLM columns never matches needs_human"""
+    view = ReportView(_report().drop(columns="needs_human"))
+    rows = view.select(["NET_MISMATCH"])
+
+    assert view.page(rows, 0, 2)["COAC_EVENT_KEY"].tolist() == ["1", "2"]
+    assert view.page(rows, 1, 2)["COAC_EVENT_KEY"].tolist() == ["5"]
+    assert view.select(needs_human=True).size == 0 and view.counts()["needs_human"] == 0